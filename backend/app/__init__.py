@@ -5,11 +5,12 @@ from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 import pymysql
 from dotenv import load_dotenv
-import os
-from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
 import logging
+import config
 from app.utils.db import Database
+from app.utils.db_pool import InstrumentedQueuePool
+from app.utils.query_counter import init_query_counter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,20 +28,24 @@ CORS(
             "origins": ["http://localhost:3000"],
             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["X-Next-Cursor", "Link"],
         }
     },
 )
 
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"mysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT', 3306)}/{os.getenv('MYSQL_DATABASE')}"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config.from_object(config)
+if "pool_size" in config.SQLALCHEMY_ENGINE_OPTIONS:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(
+        config.SQLALCHEMY_ENGINE_OPTIONS, poolclass=InstrumentedQueuePool
+    )
 
 db_instance = Database()
 db_instance.init_app(app)
 
 db = db_instance.get_db()
 
+init_query_counter(app)
+
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
@@ -48,46 +53,22 @@ limiter = Limiter(
 )
 
 
-def init_scheduler(notification_service):
-    with app.app_context():
-        try:
-            scheduler = BackgroundScheduler()
-
-            scheduler.add_job(
-                notification_service.check_upcoming_returns,
-                "interval",
-                hours=12,
-                id="check_upcoming_returns",
-                max_instances=1,
-                replace_existing=True,
-            )
-
-            scheduler.add_job(
-                notification_service.check_overdue_returns,
-                "interval",
-                hours=12,
-                id="check_overdue_returns",
-                max_instances=1,
-                replace_existing=True,
-            )
-
-            scheduler.start()
-            logger.info("Scheduler started successfully")
-
-            def cleanup_scheduler():
-                scheduler.shutdown()
-                logger.info("Scheduler shut down successfully")
-
-            atexit.register(cleanup_scheduler)
+def init_scheduler():
+    """
+    Compete for the scheduler lease from this process; safe to call in every
+    worker, only the lease holder runs the jobs
+    """
+    from app.services.scheduler_service import SchedulerService
 
-        except Exception as e:
-            logger.error(f"Error initializing scheduler: {str(e)}")
-            raise
+    scheduler = SchedulerService()
+    scheduler.start()
+    atexit.register(scheduler.stop)
+    logger.info("Scheduler election started")
 
 
 from app import models
-from app.services.notification_service import NotificationService
 
+from app.routes.admin import admin_bp
 from app.routes.auth import auth_bp
 from app.routes.books import books_bp
 from app.routes.samples import samples_bp
@@ -95,8 +76,10 @@ from app.routes.notifications import notifications_bp
 from app.routes.librarians import librarians_bp
 from app.routes.borrows import borrows_bp
 from app.routes.membres import members_bp
+from app.routes.reservations import reservations_bp
 
 
+app.register_blueprint(admin_bp, url_prefix="/admin")
 app.register_blueprint(auth_bp, url_prefix="/auth")
 app.register_blueprint(books_bp, url_prefix="/livres")
 app.register_blueprint(samples_bp, url_prefix="/exemplaires")
@@ -104,10 +87,11 @@ app.register_blueprint(notifications_bp, url_prefix="/notifications")
 app.register_blueprint(librarians_bp, url_prefix="/libraires")
 app.register_blueprint(borrows_bp, url_prefix="/emprunts")
 app.register_blueprint(members_bp, url_prefix="/membres")
+app.register_blueprint(reservations_bp, url_prefix="/reservations")
 
 from app import cli
 
 
 if __name__ == "__main__":
-    init_scheduler(NotificationService)
+    init_scheduler()
     app.run()
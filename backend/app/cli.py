@@ -1,13 +1,18 @@
 from flask.cli import with_appcontext
 from app import app, db
+from app.utils.db_pool import pool_stats
+import config
 import click
 import mysql.connector
 from mysql.connector import Error
 import os
+import re
 from datetime import datetime
-from sqlalchemy import text
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import load_only
 from scripts.generate_models import generate_models
 from scripts.cover_processor import process_book_covers
+from app.services.facet_service import FacetService
 
 def execute_sql_file(cursor, filename):
     """Execute SQL commands from a file"""
@@ -34,10 +39,10 @@ def init_db():
     try:
 
         conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            port=int(os.getenv("MYSQL_PORT", 3306)),
+            host=config.MYSQL_HOST,
+            user=config.MYSQL_USER,
+            password=config.MYSQL_PASSWORD,
+            port=int(config.MYSQL_PORT),
         )
 
         if conn.is_connected():
@@ -45,7 +50,7 @@ def init_db():
 
             cursor.execute("SHOW DATABASES")
             databases = [db[0] for db in cursor]
-            db_name = os.getenv("MYSQL_DATABASE")
+            db_name = config.MYSQL_DATABASE
 
             if db_name in databases:
 
@@ -88,6 +93,15 @@ def init_db():
                 print(f"Error in update_covers: {str(e)}")
                 return
 
+            try:
+                FacetService.rebuild_counters()
+                db.session.commit()
+                print("Availability counters built successfully!")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error building availability counters: {str(e)}")
+                return
+
             print("Database initialization completed successfully!")
 
     except Error as e:
@@ -171,10 +185,9 @@ def check_connections():
     """Check database connections and configuration"""
     print("\nDatabase Configuration:")
     print("-" * 40)
-    print(f"Host: {os.getenv('MYSQL_HOST')}")
-    print(f"Database: {os.getenv('MYSQL_DATABASE')}")
-    print(f"User: {os.getenv('MYSQL_USER')}")
-    print(f"Port: {os.getenv('MYSQL_PORT', 3306)}")
+    print(f"URL: {db.engine.url.render_as_string(hide_password=True)}")
+    print(f"Pool size: {config.DB_POOL_SIZE} (max overflow: {config.DB_MAX_OVERFLOW})")
+    print(f"Pool recycle: {config.DB_POOL_RECYCLE}s, timeout: {config.DB_POOL_TIMEOUT}s, pre-ping: {config.DB_POOL_PRE_PING}")
 
     try:
 
@@ -185,6 +198,11 @@ def check_connections():
             print("Database version:", end=" ")
             version = db.session.execute(text("SELECT VERSION()")).scalar()
             print(version)
+
+            print("\nPool statistics:")
+            print("-" * 40)
+            for name, value in pool_stats(db.engine).items():
+                print(f"{name}: {value}")
     except Exception as e:
         print(f"\nSQLAlchemy connection: FAILED")
         print(f"Error: {str(e)}")
@@ -192,11 +210,11 @@ def check_connections():
     try:
 
         conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database=os.getenv("MYSQL_DATABASE"),
-            port=int(os.getenv("MYSQL_PORT", 3306)),
+            host=config.MYSQL_HOST,
+            user=config.MYSQL_USER,
+            password=config.MYSQL_PASSWORD,
+            database=config.MYSQL_DATABASE,
+            port=int(config.MYSQL_PORT),
         )
         if conn.is_connected():
             print("Direct MySQL connection: SUCCESS")
@@ -204,5 +222,316 @@ def check_connections():
     except Error as e:
         print("Direct MySQL connection: FAILED")
         print(f"Error: {str(e)}")
-        
+
+
+
+@app.cli.command()
+@click.option("--batch-size", default=50, help="Number of books migrated per transaction")
+@with_appcontext
+def migrate_covers(batch_size):
+    """Move base64 covers out of books.cover_image into the cover store"""
+    from app.models import Book
+    from app.services.cover_service import CoverService
+
+    columns = [column["name"] for column in inspect(db.engine).get_columns("books")]
+    if "cover_hash" not in columns:
+        print("Adding column books.cover_hash...")
+        db.session.execute(text("ALTER TABLE books ADD COLUMN cover_hash CHAR(64) NULL"))
+        db.session.commit()
+
+    migrated = 0
+    failed = 0
+    last_id = 0
+
+    print("\nMigrating book covers...")
+    print("-" * 40)
+
+    while True:
+        books = (
+            Book.query.options(load_only(Book.book_id, Book.cover_image, Book.cover_hash))
+            .filter(Book.book_id > last_id, Book.cover_image.isnot(None))
+            .order_by(Book.book_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not books:
+            break
+
+        for book in books:
+            last_id = book.book_id
+            try:
+                data = CoverService.decode_legacy_cover(book.cover_image)
+            except ValueError as e:
+                print(f"Book {book.book_id}: {str(e)}, skipping...")
+                failed += 1
+                continue
+            CoverService.save_cover(book, data)
+            migrated += 1
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error committing batch ending at book {last_id}: {str(e)}")
+            return
+        print(f"{migrated} covers migrated so far (last book ID {last_id})")
+
+    print(f"\nCover migration completed: {migrated} migrated, {failed} failed")
+
+
+@app.cli.command()
+@with_appcontext
+def create_search_index():
+    """Add the FULLTEXT index used by GET /livres/search to an existing database"""
+    indexes = [index["name"] for index in inspect(db.engine).get_indexes("books")]
+    if "ft_books_search" in indexes:
+        print("Search index already exists.")
+        return
+
+    try:
+        print("Creating FULLTEXT index ft_books_search on books...")
+        db.session.execute(text(
+            "ALTER TABLE books ADD FULLTEXT INDEX ft_books_search "
+            "(title, author, genre, category, book_description)"
+        ))
+        db.session.commit()
+        print("Search index created successfully!")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating search index: {str(e)}")
+
+
+@app.cli.command()
+@with_appcontext
+def rebuild_facets():
+    """Recompute the per-book availability counters used by the facets API"""
+    try:
+        FacetService.rebuild_counters()
+        db.session.commit()
+        print("Availability counters rebuilt successfully!")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error rebuilding availability counters: {str(e)}")
+
+
+@app.cli.command()
+@click.option("--workers", default=None, type=int, help="Number of worker processes (default: CPU count)")
+@with_appcontext
+def process_covers(workers):
+    """Store covers from the covers directory and build their thumbnails"""
+    process_book_covers(max_workers=workers)
+
+
+@app.cli.command()
+@click.option("--batch-size", default=1000, help="Number of notifications backfilled per transaction")
+@with_appcontext
+def migrate_notification_links(batch_size):
+    """Link existing notifications to their borrow and add the de-duplication key"""
+    from sqlalchemy import update
+    from app.models import Borrow, Notification
+
+    columns = [column["name"] for column in inspect(db.engine).get_columns("notifications")]
+    for name, definition in (
+        ("borrow_id", "BIGINT NULL"),
+        ("reservation_id", "BIGINT NULL"),
+        ("notification_day", "DATE NULL"),
+    ):
+        if name not in columns:
+            print(f"Adding column notifications.{name}...")
+            db.session.execute(text(f"ALTER TABLE notifications ADD COLUMN {name} {definition}"))
+    db.session.execute(text(
+        "UPDATE notifications SET notification_day = DATE(creation_date) "
+        "WHERE notification_day IS NULL"
+    ))
+    db.session.commit()
+
+    borrow_pattern = re.compile(r"ID emprunt: (\d+)\s*$")
+    linked = 0
+    duplicates = 0
+    last_id = 0
+
+    print("\nBackfilling notification borrow links...")
+    print("-" * 40)
+
+    while True:
+        rows = (
+            db.session.query(
+                Notification.notification_id,
+                Notification.notification_type,
+                Notification.notification_message,
+                Notification.notification_day,
+            )
+            .filter(Notification.notification_id > last_id, Notification.borrow_id.is_(None))
+            .order_by(Notification.notification_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].notification_id
+
+        candidates = {}
+        for row in rows:
+            match = borrow_pattern.search(row.notification_message)
+            if match:
+                candidates[row.notification_id] = (row.notification_type, int(match.group(1)), row.notification_day)
+        borrow_ids = {borrow_id for _, borrow_id, _ in candidates.values()}
+        existing_borrows = {
+            borrow_id for borrow_id, in
+            db.session.query(Borrow.borrow_id).filter(Borrow.borrow_id.in_(borrow_ids))
+        }
+        # Clés déjà prises : seule la première notification du jour est liée
+        taken = set(
+            db.session.query(
+                Notification.notification_type, Notification.borrow_id, Notification.notification_day
+            ).filter(Notification.borrow_id.in_(borrow_ids))
+        )
+
+        updates = []
+        for notification_id, key in candidates.items():
+            if key[1] not in existing_borrows:
+                continue
+            if key in taken:
+                duplicates += 1
+                continue
+            taken.add(key)
+            updates.append({"notification_id": notification_id, "borrow_id": key[1]})
+
+        try:
+            if updates:
+                db.session.execute(update(Notification), updates)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error committing batch ending at notification {last_id}: {str(e)}")
+            return
+        linked += len(updates)
+        print(f"{linked} notifications linked so far (last notification ID {last_id})")
+
+    constraints = [constraint["name"] for constraint in inspect(db.engine).get_unique_constraints("notifications")]
+    if "uq_notifications_type_borrow_day" not in constraints:
+        try:
+            print("Adding foreign keys and unique key uq_notifications_type_borrow_day...")
+            db.session.execute(text(
+                "ALTER TABLE notifications "
+                "ADD CONSTRAINT fk_notifications_borrows FOREIGN KEY (borrow_id) "
+                "REFERENCES borrows(borrow_id) ON DELETE SET NULL ON UPDATE CASCADE, "
+                "ADD CONSTRAINT fk_notifications_reservations FOREIGN KEY (reservation_id) "
+                "REFERENCES reservations(reservation_id) ON DELETE SET NULL ON UPDATE CASCADE, "
+                "ADD UNIQUE KEY uq_notifications_type_borrow_day (notification_type, borrow_id, notification_day)"
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error adding notification constraints: {str(e)}")
+            return
+
+    print(f"\nNotification migration completed: {linked} linked, {duplicates} same-day duplicates left unlinked")
+
+
+@app.cli.command()
+@with_appcontext
+def create_notification_index():
+    """Add the (user_id, viewed, creation_date) index to an existing database"""
+    indexes = [index["name"] for index in inspect(db.engine).get_indexes("notifications")]
+    if "index_notifications_user_viewed_date" in indexes:
+        print("Notification index already exists.")
+        return
+
+    try:
+        print("Creating index index_notifications_user_viewed_date on notifications...")
+        db.session.execute(text(
+            "CREATE INDEX index_notifications_user_viewed_date "
+            "ON notifications (user_id, viewed, creation_date)"
+        ))
+        db.session.commit()
+        print("Notification index created successfully!")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating notification index: {str(e)}")
+
+
+@app.cli.command()
+@with_appcontext
+def create_borrow_dates_index():
+    """Add the (sample_id, begin_date, end_date) index used by the availability engine"""
+    indexes = [index["name"] for index in inspect(db.engine).get_indexes("borrows")]
+    if "index_borrows_sample_dates" in indexes:
+        print("Borrow dates index already exists.")
+        return
+
+    try:
+        print("Creating index index_borrows_sample_dates on borrows...")
+        db.session.execute(text(
+            "CREATE INDEX index_borrows_sample_dates "
+            "ON borrows (sample_id, begin_date, end_date)"
+        ))
+        db.session.commit()
+        print("Borrow dates index created successfully!")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating borrow dates index: {str(e)}")
+
+
+@app.cli.command()
+@click.option("--batch-size", default=config.RETENTION_BATCH_SIZE, help="Number of rows archived per transaction")
+@with_appcontext
+def apply_retention(batch_size):
+    """Archive old viewed notifications and old logs into archive_batches"""
+    from app.services.retention_service import RetentionService
+    try:
+        if "archive_batches" not in inspect(db.engine).get_table_names():
+            from app.models import ArchiveBatch
+            ArchiveBatch.__table__.create(db.engine)
+        stats = RetentionService.apply_retention(batch_size=batch_size)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error applying retention policy: {str(e)}")
+        return
+
+    print("\nRetention policy applied:")
+    print("-" * 40)
+    for notification_type, count in stats["notifications"].items():
+        print(f"Notifications {notification_type}: {count} archived")
+    print(f"Logs: {stats['logs']} archived")
+    print(f"Log partitions: {stats['log_partitions']['added']} added, {stats['log_partitions']['dropped']} dropped")
+
+
+@app.cli.command()
+@click.option("--months-ahead", default=config.LOG_PARTITION_MONTHS_AHEAD, help="Monthly partitions created in advance")
+@with_appcontext
+def partition_logs(months_ahead):
+    """Convert the logs table to monthly range partitions (MySQL)"""
+    from app.services.retention_service import RetentionService
+    try:
+        RetentionService.partition_logs(months_ahead=months_ahead)
+        partitions = RetentionService.log_partitions()
+        print(f"Logs table partitioned: {len(partitions)} partitions")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error partitioning logs: {str(e)}")
+
+
+@app.cli.command()
+def run_scheduler():
+    """Run the scheduled jobs from a dedicated process (leader-elected)"""
+    from app.services.scheduler_service import SchedulerService
+    scheduler = SchedulerService()
+    print(f"Scheduler {scheduler.holder_id} waiting for the lease...")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        print("Scheduler stopped")
+
+
+@app.cli.command()
+@click.option("--host", default="0.0.0.0", help="Interface to listen on")
+@click.option("--port", default=config.NOTIFICATION_SERVER_PORT, type=int, help="Port to listen on")
+def serve_notifications(host, port):
+    """Serve the notification streams from a single asyncio process"""
+    from app.services.notification_stream_server import NotificationStreamServer
+    print(f"Serving notification streams on {host}:{port}")
+    NotificationStreamServer(app).run(host, port)
+
+
 app.cli.add_command(generate_models, name='generate-models')
\ No newline at end of file
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from sqlalchemy import Enum
+from sqlalchemy.dialects.mysql import LONGBLOB
 from app import db
 from werkzeug.security import check_password_hash
 
@@ -32,6 +33,7 @@ class ReservationStatus(str, Enum):
     CONFIRMED = 'confirmée'
     CANCELLED = 'annulée'
     EXPIRED = 'expirée'
+    FULFILLED = 'honorée'
 
 class NotificationType(str, Enum):
     BORROW_REMINDER = 'rappel_emprunt'
@@ -45,23 +47,72 @@ class NotificationType(str, Enum):
 
 
 
+class ArchiveBatch(db.Model):
+    __tablename__ = 'archive_batches'
+    __table_args__ = (
+        db.Index('index_archive_batches_source', 'source_table', 'last_id'),
+    )
+
+    batch_id = db.Column(db.BigInteger, primary_key=True)
+    source_table = db.Column(db.String(64, 'utf8mb4_unicode_ci'), nullable=False)
+    first_id = db.Column(db.BigInteger, nullable=False)
+    last_id = db.Column(db.BigInteger, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    payload = db.Column(db.LargeBinary().with_variant(LONGBLOB(), 'mysql'), nullable=False)
+
+
+
 class Book(db.Model):
     __tablename__ = 'books'
+    __table_args__ = (
+        db.Index('ft_books_search', 'title', 'author', 'genre', 'category', 'book_description', mysql_prefix='FULLTEXT'),
+    )
 
     book_id = db.Column(db.BigInteger, primary_key=True)
     title = db.Column(db.String(255, 'utf8mb4_unicode_ci'), nullable=False, index=True)
     author = db.Column(db.String(255, 'utf8mb4_unicode_ci'), nullable=False, index=True)
-    genre = db.Column(db.String(100, 'utf8mb4_unicode_ci'))
-    category = db.Column(db.String(100, 'utf8mb4_unicode_ci'))
+    genre = db.Column(db.String(100, 'utf8mb4_unicode_ci'), index=True)
+    category = db.Column(db.String(100, 'utf8mb4_unicode_ci'), index=True)
     book_description = db.Column(db.Text(collation='utf8mb4_unicode_ci'))
     release_date = db.Column(db.Date)
     added_at = db.Column(db.DateTime, server_default=db.FetchedValue())
     cover_image = db.Column(db.String(collation='utf8mb4_unicode_ci'))
+    cover_hash = db.Column(db.String(64, 'utf8mb4_unicode_ci'))
+
+
+
+class CoverVariant(db.Model):
+    __tablename__ = 'cover_variants'
+
+    book_id = db.Column(db.ForeignKey('books.book_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True)
+    size_name = db.Column(db.String(20, 'utf8mb4_unicode_ci'), primary_key=True)
+    image_format = db.Column(db.String(10, 'utf8mb4_unicode_ci'), primary_key=True)
+    source_hash = db.Column(db.String(64, 'utf8mb4_unicode_ci'), nullable=False)
+    blob_hash = db.Column(db.String(64, 'utf8mb4_unicode_ci'), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+
+    book = db.relationship('Book', primaryjoin='CoverVariant.book_id == Book.book_id', backref='cover_variants')
+
+
+
+class BookAvailability(db.Model):
+    __tablename__ = 'book_availability'
+
+    book_id = db.Column(db.ForeignKey('books.book_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True)
+    total_samples = db.Column(db.Integer, nullable=False, server_default=db.FetchedValue())
+    available_samples = db.Column(db.Integer, nullable=False, index=True, server_default=db.FetchedValue())
+
+    book = db.relationship('Book', primaryjoin='BookAvailability.book_id == Book.book_id', backref=db.backref('availability', uselist=False))
 
 
 
 class Borrow(db.Model):
     __tablename__ = 'borrows'
+    __table_args__ = (
+        db.Index('index_borrows_sample_dates', 'sample_id', 'begin_date', 'end_date'),
+    )
 
     borrow_id = db.Column(db.BigInteger, primary_key=True)
     user_id = db.Column(db.ForeignKey('users.user_id', ondelete='RESTRICT', onupdate='CASCADE'), index=True)
@@ -79,11 +130,28 @@ class Borrow(db.Model):
 
 
 
+class JobRun(db.Model):
+    __tablename__ = 'scheduler_job_runs'
+    __table_args__ = (
+        db.Index('index_job_runs_name_started', 'job_name', 'started_at'),
+    )
+
+    run_id = db.Column(db.BigInteger, primary_key=True)
+    job_name = db.Column(db.String(100, 'utf8mb4_unicode_ci'), nullable=False)
+    holder = db.Column(db.String(255, 'utf8mb4_unicode_ci'), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    run_status = db.Column(db.Enum('running', 'success', 'failed'), nullable=False)
+    error = db.Column(db.Text(collation='utf8mb4_unicode_ci'))
+
+
+
 class Log(db.Model):
     __tablename__ = 'logs'
 
     log_id = db.Column(db.BigInteger, primary_key=True)
-    user_id = db.Column(db.ForeignKey('users.user_id', ondelete='RESTRICT', onupdate='CASCADE'), index=True)
+    user_id = db.Column(db.ForeignKey('users.user_id', ondelete='SET NULL', onupdate='CASCADE'), index=True)
     log_action = db.Column(db.String(255, 'utf8mb4_unicode_ci'), nullable=False)
     log_details = db.Column(db.Text(collation='utf8mb4_unicode_ci'))
     action_date = db.Column(db.DateTime, server_default=db.FetchedValue())
@@ -94,35 +162,81 @@ class Log(db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.UniqueConstraint('notification_type', 'borrow_id', 'notification_day', name='uq_notifications_type_borrow_day'),
+        db.Index('index_notifications_user_viewed_date', 'user_id', 'viewed', 'creation_date'),
+    )
 
     notification_id = db.Column(db.BigInteger, primary_key=True)
     user_id = db.Column(db.ForeignKey('users.user_id', ondelete='RESTRICT', onupdate='CASCADE'), index=True)
+    borrow_id = db.Column(db.ForeignKey('borrows.borrow_id', ondelete='SET NULL', onupdate='CASCADE'), index=True)
+    reservation_id = db.Column(db.ForeignKey('reservations.reservation_id', ondelete='SET NULL', onupdate='CASCADE'), index=True)
     notification_type = db.Column(db.Enum('rappel_emprunt', 'nouvelle_reservation', 'date_echeance'), nullable=False)
     notification_message = db.Column(db.Text(collation='utf8mb4_unicode_ci'), nullable=False)
     creation_date = db.Column(db.DateTime, server_default=db.FetchedValue())
+    notification_day = db.Column(db.Date)
     viewed = db.Column(db.Integer, server_default=db.FetchedValue())
 
     user = db.relationship('User', primaryjoin='Notification.user_id == User.user_id', backref='notifications')
+    borrow = db.relationship('Borrow', primaryjoin='Notification.borrow_id == Borrow.borrow_id', backref='notifications')
+    reservation = db.relationship('Reservation', primaryjoin='Notification.reservation_id == Reservation.reservation_id', backref='notifications')
+
+
+
+class NotificationBorrow(db.Model):
+    __tablename__ = 'notification_borrows'
+
+    notification_id = db.Column(db.ForeignKey('notifications.notification_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True)
+    borrow_id = db.Column(db.ForeignKey('borrows.borrow_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True, index=True)
 
 
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # File d'attente par livre : position = nombre de réservations actives d'ID inférieur
+        db.Index('index_reservations_queue', 'book_id', 'reservation_status', 'reservation_id'),
+        db.Index('index_reservations_expiration', 'reservation_status', 'expiration_date'),
+    )
 
     reservation_id = db.Column(db.BigInteger, primary_key=True)
     user_id = db.Column(db.ForeignKey('users.user_id', ondelete='RESTRICT', onupdate='CASCADE'), index=True)
     book_id = db.Column(db.ForeignKey('books.book_id', ondelete='RESTRICT', onupdate='CASCADE'), index=True)
+    sample_id = db.Column(db.ForeignKey('samples.sample_id', ondelete='SET NULL', onupdate='CASCADE'), index=True)
     borrowed_at = db.Column(db.DateTime, server_default=db.FetchedValue())
-    reservation_status = db.Column(db.Enum('active', 'confirmée', 'annulée', 'expirée'), nullable=False)
+    reservation_status = db.Column(db.Enum('active', 'confirmée', 'annulée', 'expirée', 'honorée'), nullable=False)
     expiration_date = db.Column(db.DateTime)
 
     book = db.relationship('Book', primaryjoin='Reservation.book_id == Book.book_id', backref='reservations')
+    sample = db.relationship('Sample', primaryjoin='Reservation.sample_id == Sample.sample_id', backref='reservations')
     user = db.relationship('User', primaryjoin='Reservation.user_id == User.user_id', backref='reservations')
 
 
 
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+
+    jti = db.Column(db.String(64, 'utf8mb4_unicode_ci'), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+
+class SchedulerLease(db.Model):
+    __tablename__ = 'scheduler_leases'
+
+    lease_name = db.Column(db.String(100, 'utf8mb4_unicode_ci'), primary_key=True)
+    holder = db.Column(db.String(255, 'utf8mb4_unicode_ci'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+
 class Sample(db.Model):
     __tablename__ = 'samples'
+    __table_args__ = (
+        db.Index('index_samples_book_status', 'book_id', 'sample_status'),
+        db.Index('index_samples_localization', 'localization'),
+    )
 
     sample_id = db.Column(db.BigInteger, primary_key=True)
     book_id = db.Column(db.ForeignKey('books.book_id', ondelete='RESTRICT', onupdate='CASCADE'), index=True)
@@ -135,6 +249,14 @@ class Sample(db.Model):
 
 
 
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(64, 'utf8mb4_unicode_ci'), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -1,15 +1,19 @@
+from .admin import admin_bp
 from .auth import auth_bp
 from .books import books_bp
 from .borrows import borrows_bp
 from .librarians import librarians_bp
 from .notifications import notifications_bp
+from .reservations import reservations_bp
 from .samples import samples_bp
 
 __all__ = [
+    'admin_bp',
     'auth_bp',
     'books_bp',
     'samples_bp',
     'borrows_bp',
     'librarians_bp',
-    'notifications_bp'
+    'notifications_bp',
+    'reservations_bp'
 ]
\ No newline at end of file
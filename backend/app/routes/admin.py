@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify
+from app import db
+from app.services.notification_hub import NotificationHub
+from app.services.scheduler_service import SchedulerService
+from app.utils.audit_log import audit_log
+from app.utils.db_pool import pool_stats
+from app.utils.decorators import require_auth, require_role
+from app.utils.response_cache import response_cache
+from app.utils.interval_cache import interval_cache
+from app.utils.user_status_cache import user_status_cache
+import logging
+
+logger = logging.getLogger(__name__)
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/stats')
+@require_auth()
+@require_role('administrateur')
+def get_stats():
+    return jsonify({
+        "audit_log": audit_log.stats(),
+        "availability_cache": interval_cache.stats(),
+        "db_pool": pool_stats(db.engine),
+        "notification_streams": NotificationHub().subscriber_count(),
+        "response_cache": response_cache.stats(),
+        "user_status_cache": user_status_cache.stats(),
+    })
+
+
+@admin_bp.route('/scheduler')
+@require_auth()
+@require_role('administrateur')
+def get_scheduler_status():
+    try:
+        return jsonify(SchedulerService.status())
+    except Exception as e:
+        logger.error(f"Error fetching scheduler status: {str(e)}")
+        return jsonify({"error": "Database error", "message": str(e)}), 500
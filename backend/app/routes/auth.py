@@ -3,6 +3,7 @@ import os
 from flask import Blueprint, request, jsonify, g
 from app.models import User
 from app.services.token_service import TokenService
+from app.utils.audit_log import audit_log
 from app.utils.decorators import require_auth
 from app.utils.token_blacklist import token_blacklist
 from app.utils.user_factory import UserFactory
@@ -26,14 +27,19 @@ def login():
         user = User.query.filter_by(mail=username).first()
 
         if not user:
+            audit_log.record("auth.login_failed", details={"mail": username})
             return jsonify({"error": "Invalid credentials"}), 401
 
         if user.user_status != "actif":
+            audit_log.record("auth.login_refused", user_id=user.user_id, details={"status": user.user_status})
             return jsonify({"error": "Account is not active"}), 403
 
         if not user.check_password(password):
+            audit_log.record("auth.login_failed", user_id=user.user_id)
             return jsonify({"error": "Invalid credentials"}), 401
 
+        audit_log.record("auth.login", user_id=user.user_id)
+
         access_token = TokenService.generate_token(
             user.user_id, user.user_role, "access"
         )
@@ -88,10 +94,11 @@ def refresh_token():
 
 
 @auth_bp.route("/logout", methods=["POST"])
-@require_auth
+@require_auth()
 def logout():
     token = request.headers.get("Authorization").split(" ")[1]
     token_blacklist.blacklist_token(token)
+    audit_log.record("auth.logout")
 
     return jsonify({"message": "Successfully logged out"}), 200
 
@@ -134,6 +141,11 @@ def register():
         db.session.rollback()
         return jsonify({"error": "Registration failed"}), 500
 
+    audit_log.record(
+        "user.create",
+        details={"user_id": new_user.user_id, "role": new_user.user_role},
+    )
+
     if not hasattr(g, "user_role") or not g.user_role:
         access_token = TokenService.generate_token(
             new_user.user_id, new_user.user_role, "access"
@@ -1,54 +1,209 @@
-from flask import Blueprint, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request, send_file
+from sqlalchemy.orm import load_only
 from app import db
 from app.models import Book, Sample
+from app.services.availability_service import AvailabilityService
+from app.services.cover_service import COVER_FORMATS, COVER_SIZES, CoverService
+from app.services.facet_service import DEFAULT_FACET_LIMIT, FacetService
+from app.services.search_service import SearchService
+from config import AVAILABILITY_DEFAULT_WINDOW_DAYS, AVAILABILITY_MAX_WINDOW_DAYS, COVER_CACHE_MAX_AGE
+from app.utils.table_versions import conditional_get
+from app.utils.response_cache import response_cache
+from app.utils.pagination import (
+    PaginationError,
+    encode_cursor,
+    keyset_paginate,
+    paginated_response,
+    parse_fields,
+    parse_offset_page,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 books_bp = Blueprint('books', __name__)
 
+# Champ exposé -> (colonne, sérialiseur)
+BOOK_FIELDS = {
+    "id": (Book.book_id, lambda book: book.book_id),
+    "title": (Book.title, lambda book: book.title),
+    "author": (Book.author, lambda book: book.author),
+    "genre": (Book.genre, lambda book: book.genre),
+    "category": (Book.category, lambda book: book.category),
+    "release_date": (
+        Book.release_date,
+        lambda book: book.release_date.isoformat() if book.release_date else None,
+    ),
+    "description": (Book.book_description, lambda book: book.book_description),
+    "cover_url": (Book.cover_hash, CoverService.cover_url),
+    "cover_thumbnail_url": (
+        Book.cover_hash,
+        lambda book: CoverService.cover_url(book, size="small"),
+    ),
+}
+# Champs calculés hors de la table books
+COMPUTED_FIELDS = ["availability"]
+ALL_BOOK_FIELDS = list(BOOK_FIELDS) + COMPUTED_FIELDS
+MAX_FACET_SEARCH_HITS = 10000
+MAX_AVAILABILITY_BATCH = 500
+
+# Les colonnes volumineuses ne sont chargées que sur demande explicite
+DEFAULT_LIST_FIELDS = [
+    "id", "title", "author", "genre", "category", "release_date", "cover_url", "cover_thumbnail_url",
+    "availability",
+]
+
+
+def book_load_options(fields):
+    """Build the load_only option matching a fields projection"""
+    columns = {BOOK_FIELDS[field][0] for field in fields if field in BOOK_FIELDS}
+    columns.add(Book.book_id)
+    return load_only(*columns)
+
+
+def format_books(books, fields):
+    """Serialize books; availability is added with one grouped query for all of them"""
+    column_fields = [field for field in fields if field in BOOK_FIELDS]
+    result = [{field: BOOK_FIELDS[field][1](book) for field in column_fields} for book in books]
+    if "availability" in fields:
+        counts = AvailabilityService.get_counts([book.book_id for book in books])
+        for item, book in zip(result, books):
+            item["availability"] = counts[book.book_id]
+    return result
+
+
+def format_book(book, fields):
+    return format_books([book], fields)[0]
+
+
+def accepted_cover_formats():
+    """Cover formats the client accepts; WebP only when explicitly advertised"""
+    explicit = {value for value, quality in request.accept_mimetypes if quality > 0}
+    return [
+        image_format for image_format in COVER_FORMATS
+        if image_format == "jpeg" or f"image/{image_format}" in explicit
+    ]
+
+
 @books_bp.route("/")
+@conditional_get("books", "samples")
+@response_cache.cached("catalog")
 def get_books():
     try:
-        books = Book.query.all()
+        fields = parse_fields(request.args, ALL_BOOK_FIELDS, DEFAULT_LIST_FIELDS)
+        query = Book.query.options(book_load_options(fields))
+        books, next_cursor = keyset_paginate(query, [Book.book_id], request.args)
         logger.debug(f"Nombre de livres trouvés : {len(books)}")
-        result = [
-            {
-                "id": book.book_id,
-                "title": book.title,
-                "author": book.author,
-                "genre": book.genre,
-                "category": book.category,
-                "release_date": book.release_date.isoformat() if book.release_date else None,
-                "description": book.book_description,
-                "cover_image": book.cover_image
-            }
-            for book in books
-        ]
-        return jsonify(result)
+        result = format_books(books, fields)
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({"error": "Validation Error", "message": str(e)}), 400
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des livres: {str(e)}")
         return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
 
+@books_bp.route("/search")
+@conditional_get("books", "samples")
+@response_cache.cached("catalog")
+def search_books():
+    try:
+        query = request.args.get("q", "").strip()
+        if not query:
+            return jsonify({"error": "Validation Error", "message": "Missing required parameter: q"}), 400
+
+        fields = parse_fields(request.args, ALL_BOOK_FIELDS, DEFAULT_LIST_FIELDS)
+        limit, offset = parse_offset_page(request.args)
+
+        hits = SearchService.search(query, limit + 1, offset)
+        next_cursor = encode_cursor([offset + limit]) if len(hits) > limit else None
+        hits = hits[:limit]
+
+        books = {
+            book.book_id: book
+            for book in Book.query.options(book_load_options(fields))
+            .filter(Book.book_id.in_([book_id for book_id, _ in hits]))
+            .all()
+        }
+        hits = [(books[book_id], score) for book_id, score in hits if book_id in books]
+        result = format_books([book for book, _ in hits], fields)
+        for item, (_, score) in zip(result, hits):
+            item["score"] = round(score, 4)
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({"error": "Validation Error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors de la recherche de livres: {str(e)}")
+        return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
+
+@books_bp.route("/availability", methods=["GET", "POST"])
+@response_cache.cached("catalog")
+def get_availability():
+    try:
+        if request.method == "POST":
+            raw_ids = (request.get_json(silent=True) or {}).get("book_ids", [])
+        else:
+            raw_ids = [value for value in request.args.get("ids", "").split(",") if value.strip()]
+
+        try:
+            if not isinstance(raw_ids, list):
+                raise TypeError("book_ids must be a list")
+            book_ids = list(dict.fromkeys(int(book_id) for book_id in raw_ids))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Validation Error", "message": "book ids must be integers"}), 400
+
+        if not book_ids:
+            return jsonify({"error": "Validation Error", "message": "No book ids given"}), 400
+        if len(book_ids) > MAX_AVAILABILITY_BATCH:
+            return jsonify({
+                "error": "Validation Error",
+                "message": f"At most {MAX_AVAILABILITY_BATCH} book ids per request",
+            }), 400
+
+        counts = AvailabilityService.get_counts(book_ids)
+        return jsonify({str(book_id): book_counts for book_id, book_counts in counts.items()})
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des disponibilités: {str(e)}")
+        return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
+
+@books_bp.route("/facets")
+@conditional_get("books", "book_availability")
+@response_cache.cached("catalog")
+def get_facets():
+    try:
+        try:
+            limit = int(request.args.get("limit", DEFAULT_FACET_LIMIT))
+        except ValueError:
+            return jsonify({"error": "Validation Error", "message": "limit must be an integer"}), 400
+
+        book_ids = None
+        query = request.args.get("q", "").strip()
+        if query:
+            # Facettes restreintes aux résultats de la recherche
+            hits = SearchService.search(query, MAX_FACET_SEARCH_HITS)
+            book_ids = [book_id for book_id, _ in hits]
+
+        return jsonify(FacetService.get_facets(book_ids, limit=max(1, limit)))
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des facettes: {str(e)}")
+        return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
+
 @books_bp.route("/<int:id>")
+@conditional_get("books", "samples")
+@response_cache.cached("book:{id}")
 def get_book(id):
     try:
-        livre = Book.query.get_or_404(id)
-        result = {
-            "id": livre.book_id,
-            "title": livre.title,
-            "author": livre.author,
-            "genre": livre.genre,
-            "category": livre.category,
-            "release_date": livre.release_date.isoformat() if livre.release_date else None,
-            "description": livre.book_description,
-            "cover_image": livre.cover_image,
-        }
-        return jsonify(result)
+        fields = parse_fields(request.args, ALL_BOOK_FIELDS, ALL_BOOK_FIELDS)
+        livre = Book.query.options(book_load_options(fields)).filter_by(book_id=id).first_or_404()
+        return jsonify(format_book(livre, fields))
+    except PaginationError as e:
+        return jsonify({"error": "Validation Error", "message": str(e)}), 400
     except Exception as e:
         logger.error(f"Erreur lors de la récupération du livre {id}: {str(e)}")
         return jsonify({"error": "Erreur DB", "message": str(e)}), 500
     
 @books_bp.route("/<int:id>/exemplaires")
+@conditional_get("books", "samples")
+@response_cache.cached("book:{id}")
 def get_samples(id):
     try:
         book = Book.query.get_or_404(id)
@@ -68,4 +223,79 @@ def get_samples(id):
         return jsonify(result)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des samples du livre {id}: {str(e)}")
-        return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
\ No newline at end of file
+        return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
+
+
+@books_bp.route("/<int:id>/disponibilites")
+def get_book_schedule(id):
+    try:
+        start = datetime.fromisoformat(request.args["from"]) if request.args.get("from") else datetime.now()
+        end = (
+            datetime.fromisoformat(request.args["to"]) if request.args.get("to")
+            else start + timedelta(days=AVAILABILITY_DEFAULT_WINDOW_DAYS)
+        )
+    except ValueError:
+        return jsonify({"error": "Validation Error", "message": "from and to must be ISO dates"}), 400
+    if end <= start:
+        return jsonify({"error": "Validation Error", "message": "to must be after from"}), 400
+    if end - start > timedelta(days=AVAILABILITY_MAX_WINDOW_DAYS):
+        return jsonify({
+            "error": "Validation Error",
+            "message": f"The window cannot exceed {AVAILABILITY_MAX_WINDOW_DAYS} days",
+        }), 400
+
+    try:
+        book = Book.query.options(load_only(Book.book_id)).filter_by(book_id=id).first()
+        if not book:
+            return jsonify({"error": "Not Found", "message": "Livre introuvable"}), 404
+        return jsonify(AvailabilityService.book_availability(id, start, end))
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des disponibilités du livre {id}: {str(e)}")
+        return jsonify({"error": "Erreur DB", "message": str(e), "type": type(e).__name__}), 500
+
+
+@books_bp.route("/<int:id>/cover")
+def get_book_cover(id):
+    try:
+        book = (
+            Book.query.options(load_only(Book.book_id, Book.cover_hash))
+            .filter_by(book_id=id)
+            .first()
+        )
+        if not book or not book.cover_hash:
+            return jsonify({"error": "Not Found", "message": "Aucune couverture pour ce livre"}), 404
+
+        size = request.args.get("size", "original")
+        if size != "original" and size not in COVER_SIZES:
+            return jsonify({
+                "error": "Validation Error",
+                "message": f"size must be one of: original, {', '.join(COVER_SIZES)}",
+            }), 400
+
+        blob_hash = book.cover_hash
+        if size != "original":
+            variant = CoverService.find_variant(book, size, accepted_cover_formats())
+            # Sans déclinaison générée, on retombe sur l'original
+            if variant:
+                blob_hash = variant.blob_hash
+
+        cover, mimetype = CoverService.open_cover(blob_hash)
+        if cover is None:
+            logger.error(f"Couverture {book.cover_hash} absente du stockage pour le livre {id}")
+            return jsonify({"error": "Not Found", "message": "Aucune couverture pour ce livre"}), 404
+
+        # Le contenu est adressé par son hash : l'ETag ne change jamais pour une URL versionnée
+        response = send_file(
+            cover,
+            mimetype=mimetype,
+            etag=blob_hash,
+            conditional=True,
+            max_age=COVER_CACHE_MAX_AGE,
+        )
+        response.headers["Cache-Control"] = f"public, max-age={COVER_CACHE_MAX_AGE}, immutable"
+        if size != "original":
+            response.vary.add("Accept")
+        return response
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de la couverture du livre {id}: {str(e)}")
+        return jsonify({"error": "Erreur DB", "message": str(e)}), 500
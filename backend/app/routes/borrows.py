@@ -1,12 +1,27 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models import Borrow, User, Book, Sample
+from app.services.availability_service import AvailabilityService
+from app.services.circulation_service import CirculationService
+from app.services.cover_service import CoverService
+from app.services.facet_service import FacetService
+from app.services.reservation_service import ReservationService
+from app.utils.audit_log import audit_log
+from app.utils.interval_cache import interval_cache
+from app.utils.pagination import PaginationError, keyset_paginate, paginated_response
+from app.utils.query_counter import query_budget
+from app.utils.response_cache import response_cache
+from app.utils.table_versions import conditional_get
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 borrows_bp = Blueprint("borrows", __name__)
 
+MAX_CIRCULATION_BATCH = 200
+
 
 def format_book_data(sample):
     book = sample.book
@@ -18,7 +33,7 @@ def format_book_data(sample):
         "category": book.category,
         "release_date": book.release_date.isoformat() if book.release_date else None,
         "description": book.book_description,
-        "cover_image": book.cover_image
+        "cover_url": CoverService.cover_url(book)
     }
 def format_sample_data(sample):
     return {
@@ -47,14 +62,70 @@ def format_borrow_data(borrow):
     }
 
 
+def borrow_query():
+    """Borrow query eagerly loading everything format_borrow_data reads"""
+    return Borrow.query.options(
+        joinedload(Borrow.user1).load_only(User.user_id, User.lastname, User.firstname),
+        joinedload(Borrow.sample).joinedload(Sample.book).defer(Book.cover_image),
+    )
+
+
+def invalidate_sample_caches(*samples):
+    """Drop the cached availability and responses showing the (book_id, sample_id) samples"""
+    tags = {"catalog"}
+    for book_id, sample_id in samples:
+        interval_cache.invalidate(book_id)
+        tags.update((f"book:{book_id}", f"sample:{sample_id}"))
+    response_cache.invalidate(*sorted(tags))
+
+
+def parse_unique_codes(data):
+    """Scanned codes of a circulation request, de-duplicated in scan order"""
+    codes = data.get("unique_codes")
+    if not isinstance(codes, list) or not codes:
+        raise ValueError("unique_codes must be a non-empty list")
+    if len(codes) > MAX_CIRCULATION_BATCH:
+        raise ValueError(f"At most {MAX_CIRCULATION_BATCH} codes per request")
+    if not all(isinstance(code, str) and code.strip() for code in codes):
+        raise ValueError("unique_codes must be non-empty strings")
+    return list(dict.fromkeys(code.strip() for code in codes))
+
+
+def circulation_response(results):
+    succeeded = sum(1 for item in results if item["result"] in ("checked_out", "returned"))
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+
+def decide_borrow(borrow, approved_by, status):
+    """
+    Record the librarian's decision on a pending borrow request, unless
+    another one was recorded first; False when the request was already handled
+    """
+    result = db.session.execute(
+        update(Borrow)
+        .where(Borrow.borrow_id == borrow.borrow_id, Borrow.approved_by.is_(None))
+        .values(approved_by=approved_by, borrow_status=status)
+    )
+    return result.rowcount == 1
+
+
 @borrows_bp.route("/")
+@conditional_get("borrows", "samples", "books", "users")
+@query_budget(1)
 def get_borrows():
     try:
-        borrows = Borrow.query.order_by(Borrow.begin_date.desc()).all()
+        borrows, next_cursor = keyset_paginate(
+            borrow_query(),
+            [Borrow.begin_date, Borrow.borrow_id],
+            request.args,
+            descending=True,
+        )
         logger.debug(f"Number of borrows found: {len(borrows)}")
 
         result = [format_borrow_data(borrow) for borrow in borrows]
-        return jsonify(result)
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({"error": "Validation Error", "message": str(e)}), 400
     except Exception as e:
         logger.error(f"Error while retrieving borrows: {str(e)}")
         return (
@@ -66,9 +137,11 @@ def get_borrows():
 
 
 @borrows_bp.route("/<int:id>")
+@conditional_get("borrows", "samples", "books", "users")
+@query_budget(1)
 def get_borrow(id):
     try:
-        borrow = Borrow.query.get_or_404(id)
+        borrow = borrow_query().filter_by(borrow_id=id).first_or_404()
         return jsonify(format_borrow_data(borrow))
     except Exception as e:
         logger.error(f"Error while retrieving borrow {id}: {str(e)}")
@@ -92,17 +165,33 @@ def create_borrow():
                     400,
                 )
 
-        sample = Sample.query.get_or_404(data["sample_id"])
-        existing_active_borrows = Borrow.query.filter_by(
-            sample_id=data["sample_id"], borrow_status="en cours"
-        ).first()
+        try:
+            begin_date = datetime.fromisoformat(data["begin_date"])
+            end_date = datetime.fromisoformat(data["end_date"])
+        except ValueError:
+            return (
+                jsonify({"error": "Validation Error", "message": "Dates must be ISO formatted"}),
+                400,
+            )
+        if end_date <= begin_date:
+            return (
+                jsonify({"error": "Validation Error", "message": "end_date must be after begin_date"}),
+                400,
+            )
 
-        if existing_active_borrows:
+        # Verrouille l'exemplaire : les créations concurrentes attendent ce commit
+        sample = Sample.query.filter_by(sample_id=data["sample_id"]).with_for_update().first_or_404()
+        conflicts = AvailabilityService.sample_conflicts(
+            sample, begin_date, end_date, user_id=data["user_id"]
+        )
+        if conflicts:
+            db.session.rollback()
             return (
                 jsonify(
                     {
                         "error": "Validation Error",
-                        "message": "This sample is already borrowed",
+                        "message": "This sample is not available between these dates",
+                        "conflicts": conflicts,
                     }
                 ),
                 400,
@@ -111,8 +200,8 @@ def create_borrow():
         new_borrow = Borrow(
             user_id=data["user_id"],
             sample_id=data["sample_id"],
-            begin_date=datetime.fromisoformat(data["begin_date"]),
-            end_date=datetime.fromisoformat(data["end_date"]),
+            begin_date=begin_date,
+            end_date=end_date,
             borrowed_at=datetime.now(),
             borrow_status="en cours",
             approved_by=data.get("approved_by"),
@@ -120,6 +209,12 @@ def create_borrow():
 
         db.session.add(new_borrow)
         db.session.commit()
+        invalidate_sample_caches((sample.book_id, sample.sample_id))
+        audit_log.record(
+            "borrow.create",
+            user_id=new_borrow.user_id,
+            details={"borrow_id": new_borrow.borrow_id, "sample_id": new_borrow.sample_id},
+        )
 
         return jsonify(format_borrow_data(new_borrow)), 201
     except Exception as e:
@@ -128,23 +223,128 @@ def create_borrow():
         return jsonify({"error": "Database Error", "message": str(e)}), 500
 
 
+@borrows_bp.route("/checkout", methods=["POST"])
+def checkout_samples():
+    try:
+        data = request.get_json()
+        for field in ["user_id", "approved_by", "unique_codes"]:
+            if field not in data:
+                return (
+                    jsonify(
+                        {
+                            "error": "Validation Error",
+                            "message": f"Missing required field: {field}",
+                        }
+                    ),
+                    400,
+                )
+        try:
+            codes = parse_unique_codes(data)
+            end_date = datetime.fromisoformat(data["end_date"]) if data.get("end_date") else None
+        except ValueError as e:
+            return jsonify({"error": "Validation Error", "message": str(e)}), 400
+        if end_date is not None and end_date <= datetime.now():
+            return (
+                jsonify({"error": "Validation Error", "message": "end_date must be in the future"}),
+                400,
+            )
+
+        User.query.get_or_404(data["user_id"])
+        results = CirculationService.checkout(data["user_id"], codes, data["approved_by"], end_date)
+        db.session.commit()
+
+        checked_out = [item for item in results if item["result"] == "checked_out"]
+        invalidate_sample_caches(*[(item["book_id"], item["sample_id"]) for item in checked_out])
+        if checked_out:
+            audit_log.record(
+                "borrow.checkout",
+                user_id=data["approved_by"],
+                details={
+                    "member_id": data["user_id"],
+                    "borrow_ids": [item["borrow_id"] for item in checked_out],
+                },
+            )
+        return jsonify(circulation_response(results))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error during batch checkout: {str(e)}")
+        return jsonify({"error": "Database Error", "message": str(e)}), 500
+
+
+@borrows_bp.route("/return", methods=["POST"])
+def return_samples():
+    try:
+        data = request.get_json() or {}
+        try:
+            codes = parse_unique_codes(data)
+        except ValueError as e:
+            return jsonify({"error": "Validation Error", "message": str(e)}), 400
+
+        results = CirculationService.return_samples(codes, data.get("user_id"))
+        db.session.commit()
+
+        returned = [item for item in results if item["result"] == "returned"]
+        invalidate_sample_caches(*[(item["book_id"], item["sample_id"]) for item in returned])
+        if returned:
+            audit_log.record(
+                "borrow.return",
+                details={
+                    "member_id": data.get("user_id"),
+                    "borrow_ids": [item["borrow_id"] for item in returned],
+                },
+            )
+        return jsonify(circulation_response(results))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error during batch return: {str(e)}")
+        return jsonify({"error": "Database Error", "message": str(e)}), 500
+
 @borrows_bp.route("/<int:id>", methods=["PUT"])
 def update_borrow(id):
     try:
         borrow = Borrow.query.get_or_404(id)
         data = request.get_json()
-        sample = Sample.query.get(borrow.sample_id)
+        sample = Sample.query.filter_by(sample_id=borrow.sample_id).with_for_update().first()
+        # Seul l'emprunt qui détient l'exemplaire le libère, une seule fois : pas
+        # une réservation à venir ni une demande en attente sur le même exemplaire
+        holds_sample = (
+            borrow.borrow_status in ["en cours", "en retard"]
+            and borrow.approved_by is not None
+            and borrow.begin_date <= datetime.now()
+            and sample is not None
+            and sample.sample_status == "emprunté"
+        )
 
         if "begin_date" in data:
             borrow.begin_date = datetime.fromisoformat(data["begin_date"])
         if "end_date" in data:
             borrow.end_date = datetime.fromisoformat(data["end_date"])
+        if ("begin_date" in data or "end_date" in data) and borrow.borrow_status in ["en cours", "en retard"]:
+            if borrow.end_date <= borrow.begin_date:
+                db.session.rollback()
+                return (
+                    jsonify({"error": "Validation Error", "message": "end_date must be after begin_date"}),
+                    400,
+                )
+            conflicts = AvailabilityService.sample_conflicts(
+                sample, borrow.begin_date, borrow.end_date,
+                user_id=borrow.user_id, exclude_borrow_id=borrow.borrow_id,
+            ) if sample else []
+            if conflicts:
+                db.session.rollback()
+                return (
+                    jsonify(
+                        {
+                            "error": "Validation Error",
+                            "message": "This sample is not available between these dates",
+                            "conflicts": conflicts,
+                        }
+                    ),
+                    400,
+                )
         if "status" in data:
             if data["status"] in ["en cours", "terminé", "en retard", "annulé"]:
                 borrow.borrow_status = data["status"]
-
-                if data["status"] == "annulé" and sample:
-                    sample.sample_status = "disponible"
             else:
                 return (
                     jsonify(
@@ -155,10 +355,17 @@ def update_borrow(id):
         if "return_date" in data and data["return_date"]:
             borrow.returned_at = datetime.fromisoformat(data["return_date"])
             borrow.borrow_status = "terminé"
-            if sample:
-                sample.sample_status = "disponible"
+        if holds_sample and (data.get("status") == "annulé" or data.get("return_date")):
+            # Le prochain membre en file récupère l'exemplaire, sinon il redevient disponible
+            ReservationService.release_sample(sample)
 
         db.session.commit()
+        if sample:
+            invalidate_sample_caches((sample.book_id, sample.sample_id))
+        audit_log.record(
+            "borrow.return" if data.get("return_date") else "borrow.update",
+            details={"borrow_id": borrow.borrow_id, "changes": data},
+        )
         return jsonify(format_borrow_data(borrow))
     except Exception as e:
         db.session.rollback()
@@ -171,8 +378,9 @@ def approve_borrow(id):
     try:
         borrow = Borrow.query.get_or_404(id)
 
-        # Vérifier si l'emprunt n'a pas déjà été approuvé ou rejeté
-        if borrow.approved_by is not None:
+        # Vérifier si l'emprunt n'a pas déjà été approuvé ou rejeté, en une
+        # mise à jour conditionnelle : une seule décision concurrente l'emporte
+        if not decide_borrow(borrow, request.get_json()['approved_by'], "en cours"):
             return (
                 jsonify(
                     {
@@ -184,7 +392,15 @@ def approve_borrow(id):
             )
 
         sample = Sample.query.get(borrow.sample_id)
-        if sample.sample_status != "disponible":
+        # Un emprunt à venir garde seulement sa période : l'exemplaire passe
+        # en 'emprunté' à la date de début (tâche start_booked_borrows)
+        taken = borrow.begin_date > datetime.now()
+        if not taken:
+            taken = FacetService.transition_sample_status(sample, "disponible", "emprunté")
+        if not taken and ReservationService.claim_for_borrow(sample, borrow.user_id):
+            taken = FacetService.transition_sample_status(sample, "réservé", "emprunté")
+        if not taken:
+            db.session.rollback()
             return (
                 jsonify(
                     {
@@ -195,14 +411,13 @@ def approve_borrow(id):
                 400,
             )
 
-        borrow.approved_by = (
-            request.get_json()['approved_by']
-        )
-        borrow.borrow_status = "en cours"
-
-        sample.sample_status = "emprunté"
-
         db.session.commit()
+        invalidate_sample_caches((sample.book_id, sample.sample_id))
+        audit_log.record(
+            "borrow.approve",
+            user_id=borrow.approved_by,
+            details={"borrow_id": borrow.borrow_id, "member_id": borrow.user_id},
+        )
 
         return jsonify(format_borrow_data(borrow))
 
@@ -218,7 +433,7 @@ def reject_borrow(id):
         borrow = Borrow.query.get_or_404(id)
 
         # Vérifier si l'emprunt n'a pas déjà été approuvé ou rejeté
-        if borrow.approved_by is not None:
+        if not decide_borrow(borrow, request.get_json()['approved_by'], "annulé"):
             return (
                 jsonify(
                     {
@@ -229,13 +444,13 @@ def reject_borrow(id):
                 400,
             )
 
-        # Mettre à jour le statut de l'emprunt
-        borrow.borrow_status = "annulé"
-        borrow.approved_by = (
-            request.get_json()['approved_by']
-        )
-
         db.session.commit()
+        invalidate_sample_caches((borrow.sample.book_id, borrow.sample_id))
+        audit_log.record(
+            "borrow.reject",
+            user_id=borrow.approved_by,
+            details={"borrow_id": borrow.borrow_id, "member_id": borrow.user_id},
+        )
 
         return jsonify(format_borrow_data(borrow))
 
@@ -251,6 +466,8 @@ def delete_borrow(id):
         borrow = Borrow.query.get_or_404(id)
         borrow.borrow_status = "annulé"
         db.session.commit()
+        invalidate_sample_caches((borrow.sample.book_id, borrow.sample_id))
+        audit_log.record("borrow.cancel", details={"borrow_id": id})
 
         return jsonify({"message": "Borrow cancelled successfully", "id": id})
     except Exception as e:
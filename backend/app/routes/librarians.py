@@ -1,5 +1,8 @@
 from app import app, db
 from app.models import User
+from app.utils.audit_log import audit_log
+from app.utils.user_status_cache import user_status_cache
+from app.utils.pagination import PaginationError, keyset_paginate, paginated_response
 from flask import jsonify, request, Blueprint
 import logging
 
@@ -9,7 +12,9 @@ librarians_bp = Blueprint('libraires', __name__)
 @librarians_bp.route("/")
 def get_librarians():
     try:
-        librarians = User.query.filter_by(user_role='bibliothecaire').all()
+        librarians, next_cursor = keyset_paginate(
+            User.query.filter_by(user_role='bibliothecaire'), [User.user_id], request.args
+        )
         logger.debug(f"Number of librarians found: {len(librarians)}")
 
         result = [{
@@ -21,7 +26,12 @@ def get_librarians():
             "creation_date": librarian.creation_date.isoformat() if librarian.creation_date else None
         } for librarian in librarians]
 
-        return jsonify(result)
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({
+            "error": "Validation Error",
+            "message": str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error while retrieving librarians: {str(e)}")
         return jsonify({
@@ -76,6 +86,12 @@ def update_librarian(id):
                 }), 400
 
         db.session.commit()
+        if 'status' in data:
+            user_status_cache.invalidate(librarian.user_id)
+        audit_log.record("user.update", details={
+            "user_id": librarian.user_id,
+            "changes": {field: data[field] for field in ('lastname', 'firstname', 'email', 'status') if field in data},
+        })
 
         return jsonify({
             "message": "Librarian updated successfully",
@@ -97,6 +113,8 @@ def delete_librarian(id):
 
         db.session.delete(librarian)
         db.session.commit()
+        user_status_cache.invalidate(id)
+        audit_log.record("user.delete", details={"user_id": id, "role": "bibliothecaire"})
 
         return jsonify({
             "message": "Librarian deleted successfully",
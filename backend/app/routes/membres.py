@@ -3,6 +3,9 @@ from flask import jsonify, request, Blueprint
 import logging
 from app import app, db
 from app.models import User
+from app.utils.audit_log import audit_log
+from app.utils.user_status_cache import user_status_cache
+from app.utils.pagination import PaginationError, keyset_paginate, paginated_response
 import jwt
 from datetime import datetime
 import os
@@ -30,7 +33,9 @@ def get_members():
             }
             return jsonify(result)
             
-        members = User.query.filter_by(user_role='membre').all()
+        members, next_cursor = keyset_paginate(
+            User.query.filter_by(user_role='membre'), [User.user_id], request.args
+        )
         logger.debug(f"Number of members found: {len(members)}")
 
         result = [{
@@ -42,7 +47,12 @@ def get_members():
             "creation_date": member.creation_date.isoformat() if member.creation_date else None
         } for member in members]
 
-        return jsonify(result)
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({
+            "error": "Validation Error",
+            "message": str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error while retrieving members: {str(e)}")
         return jsonify({
@@ -95,6 +105,12 @@ def update_member(id):
                 }), 400
 
         db.session.commit()
+        if 'status' in data:
+            user_status_cache.invalidate(member.user_id)
+        audit_log.record("user.update", details={
+            "user_id": member.user_id,
+            "changes": {field: data[field] for field in ('lastname', 'firstname', 'email', 'status') if field in data},
+        })
 
         return jsonify({
             "message": "Member updated successfully",
@@ -115,6 +131,8 @@ def delete_member(id):
 
         db.session.delete(member)
         db.session.commit()
+        user_status_cache.invalidate(id)
+        audit_log.record("user.delete", details={"user_id": id, "role": "membre"})
 
         return jsonify({
             "message": "Member deleted successfully",
@@ -1,49 +1,83 @@
-from flask import Blueprint, jsonify, Response
+from flask import Blueprint, jsonify, Response, request, stream_with_context
 from app import db
 from app.models import Notification
+from app.services.notification_hub import NotificationHub
+from app.services.notification_service import NotificationService
+from config import NOTIFICATION_HEARTBEAT_INTERVAL
 import logging
-import time
 import json
 
 logger = logging.getLogger(__name__)
 notifications_bp = Blueprint('notifications', __name__)
 
-def format_sse(data: str, event=None) -> str:
+CATCH_UP_LIMIT = 100
+SSE_RETRY_MS = 5000
+
+def format_sse(data: str, event=None, event_id=None) -> str:
     msg = f'data: {data}\n'
     if event is not None:
         msg = f'event: {event}\n{msg}'
+    if event_id is not None:
+        msg = f'id: {event_id}\n{msg}'
     return f'{msg}\n'
 
+def parse_last_event_id(value):
+    """Last-Event-ID header sent by EventSource on reconnect (or ?last_event_id=)"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
 @notifications_bp.route('/stream/<int:user_id>')
 def stream_notifications(user_id):
-    def event_stream(user_id):
-        last_check = time.time()
-        while True:
-            notifications = Notification.query.filter(
-                Notification.user_id == user_id,
-                Notification.viewed == False,
-                Notification.creation_date >= db.func.from_unixtime(last_check)
-            ).all()
-            
-            if notifications:
-                data = [{
-                    'id': notif.notification_id,
-                    'type': notif.notification_type,
-                    'message': notif.notification_message,
-                    'creation_date': notif.creation_date.isoformat(),
-                    'viewed': bool(notif.viewed)
-                } for notif in notifications]
-                yield format_sse(json.dumps(data), event='notification')
-            
-            last_check = time.time()
-            time.sleep(3)
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+
+    def event_stream(user_id, last_event_id):
+        subscription = NotificationHub().subscribe(user_id)
+        try:
+            yield f'retry: {SSE_RETRY_MS}\n\n'
+
+            if last_event_id is None:
+                last_event_id = NotificationService.latest_notification_id(user_id)
+                catch_up = False
+            else:
+                catch_up = True
+
+            while True:
+                if catch_up or subscription.overflowed:
+                    subscription.overflowed = False
+                    subscription.drain()
+                    missed = NotificationService.missed_notifications(user_id, last_event_id, CATCH_UP_LIMIT)
+                    catch_up = len(missed) == CATCH_UP_LIMIT
+                    if missed:
+                        last_event_id = missed[-1]['id']
+                        yield format_sse(json.dumps(missed), event='notification', event_id=last_event_id)
+                    continue
+
+                event = subscription.get(timeout=NOTIFICATION_HEARTBEAT_INTERVAL)
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+
+                events = [
+                    queued for queued in [event] + subscription.drain()
+                    if queued['id'] > last_event_id
+                ]
+                if events:
+                    last_event_id = events[-1]['id']
+                    yield format_sse(json.dumps(events), event='notification', event_id=last_event_id)
+        finally:
+            subscription.close()
 
     return Response(
-        event_stream(user_id),
+        stream_with_context(event_stream(user_id, last_event_id)),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
             'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no',
             'Access-Control-Allow-Origin': 'http://localhost:3000',
             'Access-Control-Allow-Headers': 'Content-Type',
             'Content-Type': 'text/event-stream'
@@ -58,13 +92,7 @@ def get_user_notifications(user_id):
             viewed=False
         ).order_by(Notification.creation_date.desc()).all()
 
-        result = [{
-            'id': notif.notification_id,
-            'type': notif.notification_type,
-            'message': notif.notification_message,
-            'creation_date': notif.creation_date.isoformat(),
-            'viewed': bool(notif.viewed)
-        } for notif in notifications]
+        result = [NotificationService.serialize(notif) for notif in notifications]
 
         return jsonify(result)
     except Exception as e:
@@ -81,4 +109,20 @@ def mark_notification_read(notification_id):
     except Exception as e:
         logger.error(f"Error marking notification as read: {str(e)}")
         db.session.rollback()
-        return jsonify({'error': 'Database error', 'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Database error', 'message': str(e)}), 500
+
+
+@notifications_bp.route('/<int:user_id>/mark-all-read', methods=['POST'])
+def mark_all_notifications_read(user_id):
+    data = request.get_json(silent=True) or {}
+    up_to_id = data.get('up_to_id')
+    if up_to_id is not None and not isinstance(up_to_id, int):
+        return jsonify({'error': 'up_to_id must be an integer'}), 400
+
+    try:
+        updated = NotificationService.mark_all_read(user_id, up_to_id)
+        return jsonify({'message': 'Notifications marked as read', 'updated': updated})
+    except Exception as e:
+        logger.error(f"Error marking notifications as read: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'Database error', 'message': str(e)}), 500
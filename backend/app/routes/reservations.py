@@ -0,0 +1,166 @@
+from flask import Blueprint, jsonify, request
+from app import db
+from app.models import Book, Reservation, User
+from app.services.reservation_service import ReservationService
+from app.utils.audit_log import audit_log
+from app.utils.interval_cache import interval_cache
+from app.utils.response_cache import response_cache
+from app.utils.pagination import PaginationError, keyset_paginate, paginated_response
+import logging
+
+logger = logging.getLogger(__name__)
+reservations_bp = Blueprint("reservations", __name__)
+
+RESERVATION_STATUSES = ["active", "confirmée", "annulée", "expirée", "honorée"]
+
+
+def format_reservation_data(reservation, queue_position=None):
+    return {
+        "id": reservation.reservation_id,
+        "user_id": reservation.user_id,
+        "book_id": reservation.book_id,
+        "sample_id": reservation.sample_id,
+        "status": reservation.reservation_status,
+        "reserved_at": (
+            reservation.borrowed_at.isoformat() if reservation.borrowed_at else None
+        ),
+        "expiration_date": (
+            reservation.expiration_date.isoformat() if reservation.expiration_date else None
+        ),
+        "queue_position": queue_position,
+    }
+
+
+@reservations_bp.route("/")
+def get_reservations():
+    try:
+        query = Reservation.query
+        for arg, column in (("user_id", Reservation.user_id), ("book_id", Reservation.book_id)):
+            if arg in request.args:
+                query = query.filter(column == request.args.get(arg, type=int))
+        status = request.args.get("status")
+        if status:
+            if status not in RESERVATION_STATUSES:
+                return jsonify({"error": "Validation Error", "message": "Invalid status value"}), 400
+            query = query.filter(Reservation.reservation_status == status)
+
+        reservations, next_cursor = keyset_paginate(
+            query, [Reservation.reservation_id], request.args
+        )
+
+        # File d'un livre : seule la position du premier élément de la page est calculée
+        whole_queue = "book_id" in request.args and status == "active"
+        result = []
+        position = None
+        for reservation in reservations:
+            if reservation.reservation_status != "active":
+                result.append(format_reservation_data(reservation))
+                continue
+            if whole_queue and position is not None:
+                position += 1
+            else:
+                position = ReservationService.queue_position(reservation)
+            result.append(format_reservation_data(reservation, position))
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({"error": "Validation Error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error while retrieving reservations: {str(e)}")
+        return jsonify({"error": "Database Error", "message": str(e)}), 500
+
+
+@reservations_bp.route("/<int:id>")
+def get_reservation(id):
+    try:
+        reservation = Reservation.query.get_or_404(id)
+        return jsonify(
+            format_reservation_data(reservation, ReservationService.queue_position(reservation))
+        )
+    except Exception as e:
+        logger.error(f"Error while retrieving reservation {id}: {str(e)}")
+        return jsonify({"error": "Database Error", "message": str(e)}), 500
+
+
+@reservations_bp.route("/", methods=["POST"])
+def create_reservation():
+    try:
+        data = request.get_json()
+        for field in ["user_id", "book_id"]:
+            if field not in data:
+                return (
+                    jsonify(
+                        {
+                            "error": "Validation Error",
+                            "message": f"Missing required field: {field}",
+                        }
+                    ),
+                    400,
+                )
+
+        User.query.get_or_404(data["user_id"])
+        Book.query.get_or_404(data["book_id"])
+
+        existing = Reservation.query.filter(
+            Reservation.user_id == data["user_id"],
+            Reservation.book_id == data["book_id"],
+            Reservation.reservation_status.in_(["active", "confirmée"]),
+        ).first()
+        if existing:
+            return (
+                jsonify(
+                    {
+                        "error": "Validation Error",
+                        "message": "Ce livre est déjà réservé par ce membre",
+                    }
+                ),
+                409,
+            )
+
+        reservation = ReservationService.create_reservation(data["user_id"], data["book_id"])
+        db.session.commit()
+        interval_cache.invalidate(reservation.book_id)
+        response_cache.invalidate("catalog", f"book:{reservation.book_id}")
+        audit_log.record(
+            "reservation.create",
+            user_id=reservation.user_id,
+            details={"reservation_id": reservation.reservation_id, "book_id": reservation.book_id},
+        )
+
+        return (
+            jsonify(
+                format_reservation_data(reservation, ReservationService.queue_position(reservation))
+            ),
+            201,
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error while creating reservation: {str(e)}")
+        return jsonify({"error": "Database Error", "message": str(e)}), 500
+
+
+@reservations_bp.route("/<int:id>", methods=["DELETE"])
+def cancel_reservation(id):
+    try:
+        reservation = Reservation.query.get_or_404(id)
+        if reservation.reservation_status not in ["active", "confirmée"]:
+            return (
+                jsonify(
+                    {
+                        "error": "Validation Error",
+                        "message": "Cette réservation n'est plus en cours",
+                    }
+                ),
+                400,
+            )
+
+        ReservationService.cancel_reservation(reservation)
+        db.session.commit()
+        interval_cache.invalidate(reservation.book_id)
+        response_cache.invalidate("catalog", f"book:{reservation.book_id}")
+        audit_log.record("reservation.cancel", details={"reservation_id": id})
+
+        return jsonify({"message": "Reservation cancelled successfully", "id": id})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error while cancelling reservation {id}: {str(e)}")
+        return jsonify({"error": "Database Error", "message": str(e)}), 500
@@ -1,6 +1,14 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, g, jsonify, request
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Borrow, Sample
+from app.models import Borrow, Sample, User
+from app.services.inventory_service import InventoryService
+from app.utils.audit_log import audit_log
+from app.utils.decorators import require_auth, require_role
+from app.utils.pagination import PaginationError, keyset_paginate, paginated_response
+from app.utils.query_counter import query_budget
+from app.utils.response_cache import response_cache
+from app.utils.table_versions import conditional_get
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,10 +16,16 @@ samples_bp = Blueprint("samples", __name__)
 
 
 @samples_bp.route("/<int:id>/emprunts")
+@conditional_get("borrows", "users")
+@response_cache.cached("sample:{id}")
+@query_budget(1)
 def get_borrowed_sample(id):
     try:
         borrows = (
-            Borrow.query.filter_by(sample_id=id)
+            Borrow.query.options(
+                joinedload(Borrow.user).load_only(User.user_id, User.lastname, User.firstname)
+            )
+            .filter_by(sample_id=id)
             .order_by(Borrow.begin_date.desc())
             .all()
         )
@@ -41,10 +55,14 @@ def get_borrowed_sample(id):
 
 
 @samples_bp.route("/")
+@conditional_get("samples")
+@response_cache.cached("catalog")
 def get_samples():
     try:
-        samples = Sample.query.all()
-        
+        samples, next_cursor = keyset_paginate(
+            Sample.query, [Sample.sample_id], request.args
+        )
+
         result = [
             {
                 "sample_id": sample.sample_id,
@@ -56,9 +74,39 @@ def get_samples():
             }
             for sample in samples
         ]
-        return jsonify(result)
+        return paginated_response(result, next_cursor)
+    except PaginationError as e:
+        return jsonify({"error": "Validation Error", "message": str(e)}), 400
     except Exception as e:
         logger.error(
             f"Erreur lors de la récupération des exemplaires de tout les livres ==> {str(e)}"
         )
         return jsonify({"error": "Erreur de DB:", "message": str(e)}), 500
+
+
+@samples_bp.route("/inventaire", methods=["POST"])
+@require_auth()
+@require_role("bibliothecaire")
+def stocktake():
+    # Corps : codes lus dans le rayon, un par ligne, lus au fil de l'envoi
+    localization = request.args.get("localization", "").strip()
+    if not localization:
+        return jsonify({"error": "Validation Error", "message": "localization is required"}), 400
+    apply = request.args.get("apply") == "1"
+
+    try:
+        scanned = InventoryService.read_codes(request.stream)
+        report = InventoryService.stocktake(localization, scanned, apply=apply)
+        if apply:
+            audit_log.record(
+                "inventory.apply",
+                user_id=g.user_id,
+                details={"localization": localization, "marked_unavailable": report["marked_unavailable"]},
+            )
+        return jsonify(report)
+    except UnicodeDecodeError:
+        return jsonify({"error": "Validation Error", "message": "Codes must be UTF-8 text"}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de l'inventaire de {localization}: {str(e)}")
+        return jsonify({"error": "Erreur de DB:", "message": str(e)}), 500
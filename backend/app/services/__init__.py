@@ -1,5 +1,13 @@
+from .availability_service import AvailabilityService
+from .cover_service import CoverService
+from .facet_service import FacetService
 from .notification_service import NotificationService
+from .search_service import SearchService
 
 __all__ = [
-    'NotificationService'
+    'AvailabilityService',
+    'CoverService',
+    'FacetService',
+    'NotificationService',
+    'SearchService'
 ]
\ No newline at end of file
@@ -0,0 +1,239 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, or_, select
+from app import db
+from app.models import Borrow, Reservation, Sample
+from app.utils.interval_cache import interval_cache
+
+SAMPLE_STATUSES = ('disponible', 'emprunté', 'réservé', 'indisponible')
+ACTIVE_BORROW_STATUSES = ('en cours', 'en retard')
+# Fin d'un emprunt en retard : l'exemplaire reste occupé jusqu'à son retour
+OPEN_END = datetime.max
+
+
+def _isoformat(moment):
+    return None if moment == OPEN_END else moment.isoformat()
+
+
+def _merge(intervals) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class AvailabilityService:
+    @staticmethod
+    def empty_counts() -> dict:
+        return {
+            "total": 0,
+            "available": 0,
+            "by_status": {status: 0 for status in SAMPLE_STATUSES},
+        }
+
+    @staticmethod
+    def get_counts(book_ids) -> dict:
+        """
+        Sample counts per status for each book, from a single grouped query
+        served by the (book_id, sample_status) index
+
+        Returns a dict book_id -> {"total", "available", "by_status"}; books
+        without samples get zero counts.
+        """
+        book_ids = list(book_ids)
+        counts = {book_id: AvailabilityService.empty_counts() for book_id in book_ids}
+        if not book_ids:
+            return counts
+
+        rows = (
+            db.session.query(Sample.book_id, Sample.sample_status, func.count(Sample.sample_id))
+            .filter(Sample.book_id.in_(book_ids))
+            .group_by(Sample.book_id, Sample.sample_status)
+            .all()
+        )
+        for book_id, status, count in rows:
+            book_counts = counts[book_id]
+            book_counts["total"] += count
+            book_counts["by_status"][status] = count
+            if status == 'disponible':
+                book_counts["available"] = count
+        return counts
+
+    @staticmethod
+    def _busy_intervals(sample_filter, start=None, end=None, user_id=None, exclude_borrow_ids=()) -> list:
+        """
+        (start, end, (sample_id, kind, id)) intervals during which samples are
+        taken: active borrows, including pending requests, and reservation
+        holds. Approved borrows past their end date stay open-ended until
+        returned; pending requests whose period is over are ignored.
+        Without a window, every current and future interval is returned.
+        """
+        now = datetime.now()
+        borrow_filters = [
+            sample_filter(Borrow.sample_id),
+            Borrow.borrow_status.in_(ACTIVE_BORROW_STATUSES),
+            # Une demande jamais traitée ne bloque pas l'exemplaire après sa période
+            or_(Borrow.end_date > now, Borrow.approved_by.isnot(None)),
+        ]
+        hold_filters = [
+            sample_filter(Reservation.sample_id),
+            Reservation.reservation_status == 'confirmée',
+            Reservation.expiration_date > now,
+        ]
+        if start is not None:
+            # Parcours de l'index (sample_id, begin_date, end_date)
+            borrow_filters += [
+                Borrow.begin_date < end,
+                or_(Borrow.end_date > start, Borrow.end_date <= now),
+            ]
+            hold_filters.append(Reservation.expiration_date > start)
+        if exclude_borrow_ids:
+            borrow_filters.append(Borrow.borrow_id.notin_(exclude_borrow_ids))
+        if user_id is not None:
+            # Le membre pour qui l'exemplaire est mis de côté peut l'emprunter
+            hold_filters.append(Reservation.user_id != user_id)
+
+        intervals = [
+            (begin_date, end_date if end_date > now else OPEN_END, (sample_id, 'emprunt', borrow_id))
+            for sample_id, borrow_id, begin_date, end_date in db.session.query(
+                Borrow.sample_id, Borrow.borrow_id, Borrow.begin_date, Borrow.end_date
+            ).filter(*borrow_filters)
+        ]
+        intervals += [
+            (now, expiration_date, (sample_id, 'réservation', reservation_id))
+            for sample_id, reservation_id, expiration_date in db.session.query(
+                Reservation.sample_id, Reservation.reservation_id, Reservation.expiration_date
+            ).filter(*hold_filters)
+        ]
+        return intervals
+
+    @staticmethod
+    def booked_samples(sample_ids, until: datetime) -> set:
+        """
+        Ids of the samples an approved borrow takes before until: a hold
+        placed on them now would keep the copy from its booked member
+        """
+        sample_ids = list(sample_ids)
+        if not sample_ids:
+            return set()
+        return {
+            sample_id for sample_id, in db.session.query(Borrow.sample_id).filter(
+                Borrow.sample_id.in_(sample_ids),
+                Borrow.approved_by.isnot(None),
+                Borrow.borrow_status.in_(ACTIVE_BORROW_STATUSES),
+                Borrow.begin_date < until
+            ).distinct()
+        }
+
+    @staticmethod
+    def _book_intervals(book_id) -> list:
+        book_samples = select(Sample.sample_id).where(Sample.book_id == book_id)
+        return AvailabilityService._busy_intervals(lambda column: column.in_(book_samples))
+
+    @staticmethod
+    def free_slots(busy, start, end) -> list:
+        """(start, end) gaps of [start, end) left by the busy (start, end) intervals"""
+        slots = []
+        cursor = start
+        for busy_start, busy_end in _merge(busy):
+            if busy_start >= end:
+                break
+            if busy_start > cursor:
+                slots.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if cursor < end:
+            slots.append((cursor, end))
+        return slots
+
+    @staticmethod
+    def samples_conflicts(samples, start: datetime, end: datetime,
+                          user_id=None, exclude_borrow_ids=()) -> dict:
+        """
+        What keeps each sample from being borrowed over [start, end), read
+        from the database in one query per interval kind: sample_id -> list,
+        empty when the sample is free. Holds of user_id and the borrows
+        exclude_borrow_ids are ignored.
+        """
+        conflicts = {sample.sample_id: [] for sample in samples}
+        open_ids = []
+        for sample in samples:
+            if sample.sample_status == 'indisponible':
+                conflicts[sample.sample_id].append({"kind": "indisponible", "id": None, "begin": None, "end": None})
+            else:
+                open_ids.append(sample.sample_id)
+        if not open_ids:
+            return conflicts
+
+        intervals = AvailabilityService._busy_intervals(
+            lambda column: column.in_(open_ids), start, end,
+            user_id=user_id, exclude_borrow_ids=exclude_borrow_ids,
+        )
+        for busy_start, busy_end, (sample_id, kind, ref_id) in sorted(intervals, key=lambda item: item[0]):
+            conflicts[sample_id].append(
+                {"kind": kind, "id": ref_id, "begin": busy_start.isoformat(), "end": _isoformat(busy_end)}
+            )
+        return conflicts
+
+    @staticmethod
+    def sample_conflicts(sample: Sample, start: datetime, end: datetime,
+                         user_id=None, exclude_borrow_id=None) -> list:
+        """Conflicts of a single sample, see samples_conflicts; empty when it is free"""
+        exclude_borrow_ids = [exclude_borrow_id] if exclude_borrow_id is not None else ()
+        return AvailabilityService.samples_conflicts(
+            [sample], start, end, user_id=user_id, exclude_borrow_ids=exclude_borrow_ids
+        )[sample.sample_id]
+
+    @staticmethod
+    def book_availability(book_id: int, start: datetime, end: datetime) -> dict:
+        """
+        Busy intervals and free slots over [start, end) of each sample of the
+        book, and the slots where at least one sample is free; the intervals
+        come from the book's cached interval tree
+        """
+        samples = (
+            db.session.query(Sample.sample_id, Sample.unique_code, Sample.sample_status)
+            .filter(Sample.book_id == book_id)
+            .order_by(Sample.sample_id)
+            .all()
+        )
+        tree = interval_cache.get_tree(book_id, AvailabilityService._book_intervals)
+        busy = defaultdict(list)
+        for busy_start, busy_end, (sample_id, kind, ref_id) in tree.overlapping(start, end):
+            busy[sample_id].append((busy_start, busy_end, kind, ref_id))
+
+        result = []
+        book_free = []
+        for sample_id, unique_code, status in samples:
+            if status == 'indisponible':
+                free = []
+            else:
+                free = AvailabilityService.free_slots(
+                    [(busy_start, busy_end) for busy_start, busy_end, _, _ in busy[sample_id]], start, end
+                )
+                book_free += free
+            result.append({
+                "id": sample_id,
+                "unique_code": unique_code,
+                "status": status,
+                "available": free == [(start, end)],
+                "busy": [
+                    {"kind": kind, "id": ref_id, "begin": busy_start.isoformat(), "end": _isoformat(busy_end)}
+                    for busy_start, busy_end, kind, ref_id in busy[sample_id]
+                ],
+                "free": [{"begin": slot_start.isoformat(), "end": slot_end.isoformat()} for slot_start, slot_end in free],
+            })
+
+        return {
+            "book_id": book_id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "available": any(sample["available"] for sample in result),
+            "free": [
+                {"begin": slot_start.isoformat(), "end": slot_end.isoformat()}
+                for slot_start, slot_end in _merge(book_free)
+            ],
+            "samples": result,
+        }
@@ -0,0 +1,258 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import db
+from app.models import Borrow, Reservation, Sample
+from app.services.availability_service import ACTIVE_BORROW_STATUSES, AvailabilityService
+from app.services.facet_service import FacetService
+from app.services.reservation_service import ReservationService
+from app.utils.interval_cache import interval_cache
+from app.utils.response_cache import response_cache
+from config import BORROW_DEFAULT_DAYS
+
+logger = logging.getLogger(__name__)
+
+START_BATCH_SIZE = 500
+
+
+class CirculationService:
+    """
+    Desk checkout and return of scanned samples, identified by unique_code
+
+    A batch resolves its codes with one IN query on the unique index, loads
+    the borrows and holds it needs with one query each, and applies every
+    change in the caller's transaction. Each code gets its own result: a
+    code that cannot be processed does not block the others.
+    """
+
+    @staticmethod
+    def _lock_samples(codes) -> dict:
+        # Verrous pris dans l'ordre des sample_id : deux guichets ne peuvent pas s'interbloquer
+        samples = (
+            Sample.query.filter(Sample.unique_code.in_(codes))
+            .order_by(Sample.sample_id)
+            .with_for_update()
+            .all()
+        )
+        return {sample.unique_code: sample for sample in samples}
+
+    @staticmethod
+    def _take_samples(samples) -> None:
+        """Mark the samples 'emprunté' with one UPDATE and the counters once per book"""
+        moved = Counter((sample.book_id, sample.sample_status) for sample in samples)
+        db.session.execute(
+            update(Sample)
+            .where(Sample.sample_id.in_([sample.sample_id for sample in samples]))
+            .values(sample_status='emprunté')
+        )
+        for (book_id, status), count in moved.items():
+            FacetService.record_status_change(book_id, status, 'emprunté', count)
+
+    @staticmethod
+    def checkout(user_id: int, codes, approved_by: int, end_date=None) -> list:
+        """
+        Lend the scanned samples to a member until end_date. A pending
+        request or future booking of the member for a sample is handed over
+        instead of creating a new borrow, and a sample held for the member
+        ends the hold.
+        """
+        now = datetime.now()
+        end_date = end_date or now + timedelta(days=BORROW_DEFAULT_DAYS)
+        samples = CirculationService._lock_samples(codes)
+        sample_ids = [sample.sample_id for sample in samples.values()]
+
+        own_borrows = {}
+        own_borrow_ids = []
+        for borrow in (
+            Borrow.query.filter(
+                Borrow.user_id == user_id,
+                Borrow.sample_id.in_(sample_ids),
+                Borrow.borrow_status.in_(ACTIVE_BORROW_STATUSES),
+                Borrow.begin_date < end_date
+            )
+            .order_by(Borrow.begin_date)
+            .with_for_update()
+        ):
+            own_borrows.setdefault(borrow.sample_id, borrow)
+            own_borrow_ids.append(borrow.borrow_id)
+
+        holds = {
+            reservation.sample_id: reservation
+            for reservation in Reservation.query.filter(
+                Reservation.sample_id.in_(sample_ids),
+                Reservation.user_id == user_id,
+                Reservation.reservation_status == 'confirmée'
+            ).with_for_update()
+        }
+        conflicts = AvailabilityService.samples_conflicts(
+            list(samples.values()), now, end_date, user_id=user_id, exclude_borrow_ids=own_borrow_ids
+        )
+
+        results = []
+        taken = []
+        for code in codes:
+            sample = samples.get(code)
+            if sample is None:
+                results.append({"unique_code": code, "result": "not_found"})
+                continue
+            item = {"unique_code": code, "sample_id": sample.sample_id, "book_id": sample.book_id}
+            results.append(item)
+
+            borrow = own_borrows.get(sample.sample_id)
+            if (sample.sample_status == 'emprunté' and borrow is not None
+                    and borrow.approved_by is not None and borrow.begin_date <= now):
+                item.update(result="already_borrowed", borrow_id=borrow.borrow_id)
+                continue
+            hold = holds.get(sample.sample_id)
+            expected_status = 'réservé' if hold is not None else 'disponible'
+            if conflicts[sample.sample_id] or sample.sample_status != expected_status:
+                item.update(result="unavailable", status=sample.sample_status, conflicts=conflicts[sample.sample_id])
+                continue
+
+            if hold is not None:
+                hold.reservation_status = 'honorée'
+            if borrow is None:
+                borrow = Borrow(
+                    user_id=user_id,
+                    sample_id=sample.sample_id,
+                    begin_date=now,
+                    end_date=end_date,
+                    borrowed_at=now,
+                    borrow_status='en cours',
+                    approved_by=approved_by,
+                )
+                db.session.add(borrow)
+            else:
+                # Retrait anticipé d'un emprunt à venir ou d'une demande en attente
+                borrow.begin_date = min(borrow.begin_date, now)
+                if borrow.approved_by is None:
+                    borrow.approved_by = approved_by
+            taken.append((item, sample, borrow))
+
+        if taken:
+            CirculationService._take_samples([sample for _, sample, _ in taken])
+            db.session.flush()
+            for item, _, borrow in taken:
+                item.update(result="checked_out", borrow_id=borrow.borrow_id, end_date=borrow.end_date.isoformat())
+        return results
+
+    @staticmethod
+    def return_samples(codes, user_id=None) -> list:
+        """
+        Close the ongoing borrows of the scanned samples, which then go to
+        the next members in their books' queues or back to 'disponible'.
+        With user_id, samples lent to another member are refused.
+        """
+        now = datetime.now()
+        samples = CirculationService._lock_samples(codes)
+
+        borrows = {}
+        for borrow in (
+            Borrow.query.filter(
+                Borrow.sample_id.in_([sample.sample_id for sample in samples.values()]),
+                Borrow.borrow_status.in_(ACTIVE_BORROW_STATUSES),
+                Borrow.begin_date <= now
+            )
+            .order_by(Borrow.begin_date)
+            .with_for_update()
+        ):
+            borrows.setdefault(borrow.sample_id, borrow)
+
+        results = []
+        returned = []
+        for code in codes:
+            sample = samples.get(code)
+            if sample is None:
+                results.append({"unique_code": code, "result": "not_found"})
+                continue
+            item = {"unique_code": code, "sample_id": sample.sample_id, "book_id": sample.book_id}
+            results.append(item)
+
+            borrow = borrows.get(sample.sample_id)
+            if borrow is None or sample.sample_status != 'emprunté':
+                item.update(result="not_borrowed", status=sample.sample_status)
+            elif user_id is not None and borrow.user_id != user_id:
+                item.update(result="borrowed_by_another_member")
+            else:
+                returned.append((item, sample, borrow))
+
+        if returned:
+            db.session.execute(
+                update(Borrow)
+                .where(Borrow.borrow_id.in_([borrow.borrow_id for _, _, borrow in returned]))
+                .values(returned_at=now, borrow_status='terminé')
+            )
+            holds = ReservationService.release_samples([sample for _, sample, _ in returned])
+            for item, sample, borrow in returned:
+                hold = holds.get(sample.sample_id)
+                item.update(
+                    result="returned",
+                    borrow_id=borrow.borrow_id,
+                    late=borrow.end_date < now,
+                    held_for_reservation=hold.reservation_id if hold is not None else None,
+                )
+        return results
+
+    @staticmethod
+    def start_booked_borrows(batch_size=START_BATCH_SIZE) -> dict:
+        """
+        Hand over the approved bookings whose begin_date has come: their
+        samples, left 'disponible' (or held for the member) at approval, become
+        'emprunté'. A sample held for another member or taken out of service
+        stays as it is and the booking is counted as blocked.
+        """
+        started = time.monotonic()
+        now = datetime.now()
+        rows = (
+            db.session.query(Borrow.borrow_id, Borrow.sample_id, Borrow.user_id)
+            .join(Sample, Sample.sample_id == Borrow.sample_id)
+            .filter(
+                Borrow.approved_by.isnot(None),
+                Borrow.borrow_status.in_(ACTIVE_BORROW_STATUSES),
+                Borrow.begin_date <= now,
+                Sample.sample_status != 'emprunté'
+            )
+            .order_by(Borrow.sample_id)
+            .all()
+        )
+
+        stats = {"started": 0, "blocked": 0}
+        try:
+            for start in range(0, len(rows), batch_size):
+                chunk = rows[start:start + batch_size]
+                samples = {
+                    sample.sample_id: sample
+                    for sample in Sample.query.filter(Sample.sample_id.in_([row.sample_id for row in chunk]))
+                    .order_by(Sample.sample_id)
+                    .with_for_update()
+                }
+                changed = set()
+                for row in chunk:
+                    sample = samples[row.sample_id]
+                    taken = FacetService.transition_sample_status(sample, 'disponible', 'emprunté')
+                    if not taken and ReservationService.claim_for_borrow(sample, row.user_id):
+                        taken = FacetService.transition_sample_status(sample, 'réservé', 'emprunté')
+                    if taken:
+                        changed.add((sample.book_id, sample.sample_id))
+                        stats["started"] += 1
+                    else:
+                        logger.warning(
+                            f"Borrow {row.borrow_id} could not start: sample {row.sample_id} is {sample.sample_status}"
+                        )
+                        stats["blocked"] += 1
+                db.session.commit()
+                for book_id in {book_id for book_id, _ in changed}:
+                    interval_cache.invalidate(book_id)
+                response_cache.invalidate(
+                    *(f"book:{book_id}" for book_id, _ in changed),
+                    *(f"sample:{sample_id}" for _, sample_id in changed)
+                )
+        except Exception as e:
+            logger.error(f"Error starting booked borrows: {str(e)}")
+            db.session.rollback()
+            raise
+        finally:
+            logger.info(f"start_booked_borrows: {stats} in {time.monotonic() - started:.2f}s")
+        return stats
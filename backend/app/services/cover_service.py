@@ -0,0 +1,148 @@
+import base64
+import binascii
+import io
+from flask import url_for
+from config import COVER_STORE_DIR
+from app import db
+from app.models import CoverVariant
+from app.utils.blob_store import FileSystemBlobStore
+from app.utils.response_cache import response_cache
+
+# Largeur maximale (px) de chaque déclinaison de couverture
+COVER_SIZES = {
+    'small': 160,
+    'medium': 320,
+    'large': 640,
+}
+# Formats générés, par ordre de préférence
+COVER_FORMATS = ('webp', 'jpeg')
+
+# Signatures des formats d'image acceptés
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+)
+
+
+def guess_image_mimetype(header: bytes) -> str:
+    """Guess an image MIME type from the first bytes of its content"""
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return mimetype
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+class CoverService:
+    _store = None
+
+    @classmethod
+    def get_store(cls):
+        """Return the configured blob backend for covers"""
+        if cls._store is None:
+            cls._store = FileSystemBlobStore(COVER_STORE_DIR)
+        return cls._store
+
+    @classmethod
+    def set_store(cls, store):
+        """Swap the blob backend (e.g. a MemoryBlobStore in tests)"""
+        cls._store = store
+
+    @staticmethod
+    def save_cover(book, data: bytes) -> str:
+        """Store raw image bytes for a book and point the book at them"""
+        key = CoverService.get_store().put(data)
+        book.cover_hash = key
+        book.cover_image = None
+        response_cache.invalidate_on_commit(db.session, "catalog", f"book:{book.book_id}")
+        return key
+
+    @staticmethod
+    def decode_legacy_cover(value: str) -> bytes:
+        """
+        Decode a base64 cover as stored in books.cover_image
+
+        Raises:
+            ValueError: If the value is not valid base64
+        """
+        if value.startswith('data:'):
+            value = value.split(',', 1)[-1]
+        try:
+            return base64.b64decode(value, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 cover: {str(e)}")
+
+    @staticmethod
+    def replace_variants(book, source_hash: str, variants) -> None:
+        """
+        Store the resized variants of a book cover and replace the previous ones
+
+        Args:
+            variants: iterable of (size_name, image_format, data, width, height)
+        """
+        store = CoverService.get_store()
+        CoverVariant.query.filter_by(book_id=book.book_id).delete(synchronize_session=False)
+        for size_name, image_format, data, width, height in variants:
+            db.session.add(CoverVariant(
+                book_id=book.book_id,
+                size_name=size_name,
+                image_format=image_format,
+                source_hash=source_hash,
+                blob_hash=store.put(data),
+                width=width,
+                height=height,
+            ))
+        response_cache.invalidate_on_commit(db.session, "catalog", f"book:{book.book_id}")
+
+    @staticmethod
+    def find_variant(book, size_name: str, formats):
+        """
+        Return the best variant of the book's current cover for the given size,
+        trying formats in order, or None if none was generated
+        """
+        variants = CoverVariant.query.filter(
+            CoverVariant.book_id == book.book_id,
+            CoverVariant.size_name == size_name,
+            CoverVariant.source_hash == book.cover_hash,
+            CoverVariant.image_format.in_(formats),
+        ).all()
+        by_format = {variant.image_format: variant for variant in variants}
+        for image_format in formats:
+            if image_format in by_format:
+                return by_format[image_format]
+        return None
+
+    @staticmethod
+    def open_cover(key: str):
+        """
+        Return (file, mimetype) for a stored cover, where file is a filesystem
+        path when the backend has one (served with sendfile) or a byte stream.
+        Returns (None, None) when the blob is missing.
+        """
+        store = CoverService.get_store()
+        path = store.local_path(key)
+        if path:
+            with open(path, 'rb') as cover_file:
+                header = cover_file.read(16)
+            return path, guess_image_mimetype(header)
+
+        data = store.get(key)
+        if data is None:
+            return None, None
+        return io.BytesIO(data), guess_image_mimetype(data[:16])
+
+    @staticmethod
+    def cover_url(book, size=None):
+        """Versioned URL of a book cover, or None if the book has no cover"""
+        if not book.cover_hash:
+            return None
+        params = {'size': size} if size else {}
+        return url_for(
+            'books.get_book_cover',
+            id=book.book_id,
+            v=book.cover_hash[:16],
+            _external=True,
+            **params,
+        )
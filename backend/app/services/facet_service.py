@@ -0,0 +1,127 @@
+from sqlalchemy import case, func, insert, select, update
+from app import db
+from app.models import Book, BookAvailability, Sample
+
+AVAILABLE_STATUS = 'disponible'
+DEFAULT_FACET_LIMIT = 20
+
+
+class FacetService:
+    @staticmethod
+    def set_sample_status(sample: Sample, status: str) -> None:
+        """Change a sample status and keep the availability counters in step"""
+        previous = sample.sample_status
+        if previous == status:
+            return
+        sample.sample_status = status
+        FacetService.record_status_change(sample.book_id, previous, status)
+
+    @staticmethod
+    def transition_sample_status(sample: Sample, old_status: str, new_status: str) -> bool:
+        """
+        Move a sample from old_status to new_status with a conditional UPDATE,
+        so that among concurrent transactions only one can win. Returns False,
+        changing nothing, when the sample is no longer in old_status.
+        """
+        result = db.session.execute(
+            update(Sample)
+            .where(Sample.sample_id == sample.sample_id, Sample.sample_status == old_status)
+            .values(sample_status=new_status)
+        )
+        if result.rowcount != 1:
+            return False
+        FacetService.record_status_change(sample.book_id, old_status, new_status)
+        return True
+
+    @staticmethod
+    def record_status_change(book_id: int, old_status: str, new_status: str, count: int = 1) -> None:
+        """
+        Apply the availability delta of `count` samples of a book moving from
+        old_status to new_status, in the caller's transaction
+        """
+        delta = 0
+        if old_status == AVAILABLE_STATUS:
+            delta -= count
+        if new_status == AVAILABLE_STATUS:
+            delta += count
+        if delta == 0 or book_id is None:
+            return
+
+        result = db.session.execute(
+            update(BookAvailability)
+            .where(BookAvailability.book_id == book_id)
+            .values(available_samples=BookAvailability.available_samples + delta)
+        )
+        if result.rowcount == 0:
+            # Pas encore de compteur pour ce livre : on le calcule depuis samples
+            FacetService.rebuild_counters([book_id])
+
+    @staticmethod
+    def rebuild_counters(book_ids=None) -> None:
+        """Recompute the availability counters from the samples table"""
+        delete_query = BookAvailability.query
+        if book_ids is not None:
+            delete_query = delete_query.filter(BookAvailability.book_id.in_(book_ids))
+        delete_query.delete(synchronize_session=False)
+
+        counts = (
+            select(
+                Book.book_id,
+                func.count(Sample.sample_id),
+                func.coalesce(
+                    func.sum(case((Sample.sample_status == AVAILABLE_STATUS, 1), else_=0)), 0
+                ),
+            )
+            .select_from(Book)
+            .outerjoin(Sample, Sample.book_id == Book.book_id)
+            .group_by(Book.book_id)
+        )
+        if book_ids is not None:
+            counts = counts.where(Book.book_id.in_(book_ids))
+
+        db.session.execute(
+            insert(BookAvailability).from_select(
+                ['book_id', 'total_samples', 'available_samples'], counts
+            )
+        )
+
+    @staticmethod
+    def _value_counts(column, book_ids, limit):
+        query = db.session.query(column, func.count(Book.book_id)).filter(column.isnot(None))
+        if book_ids is not None:
+            query = query.filter(Book.book_id.in_(book_ids))
+        rows = (
+            query.group_by(column)
+            .order_by(func.count(Book.book_id).desc(), column)
+            .limit(limit)
+            .all()
+        )
+        return [{"value": value, "count": count} for value, count in rows]
+
+    @staticmethod
+    def get_facets(book_ids=None, limit: int = DEFAULT_FACET_LIMIT) -> dict:
+        """
+        Facet counts for genre, category, author and availability, over the
+        whole catalog or restricted to book_ids
+        """
+        total_query = db.session.query(func.count(Book.book_id))
+        available_query = db.session.query(func.count(BookAvailability.book_id)).filter(
+            BookAvailability.available_samples > 0
+        )
+        if book_ids is not None:
+            total_query = total_query.filter(Book.book_id.in_(book_ids))
+            available_query = available_query.filter(BookAvailability.book_id.in_(book_ids))
+
+        total = total_query.scalar()
+        available = available_query.scalar()
+
+        return {
+            "total": total,
+            "genre": FacetService._value_counts(Book.genre, book_ids, limit),
+            "category": FacetService._value_counts(Book.category, book_ids, limit),
+            "author": FacetService._value_counts(Book.author, book_ids, limit),
+            "availability": {
+                "available": available,
+                "unavailable": total - available,
+            },
+        }
@@ -0,0 +1,129 @@
+import logging
+import time
+from sqlalchemy import select, update
+from app import db
+from app.models import Sample
+from app.services.facet_service import FacetService
+from app.utils.interval_cache import interval_cache
+from app.utils.response_cache import response_cache
+from config import INVENTORY_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class InventoryService:
+    """
+    Shelf stocktake of one localization against the codes scanned there
+
+    The localization's samples are read once as column tuples and compared
+    with the scanned codes as sets; nothing is loaded as ORM objects, so a
+    stocktake of the whole library stays a few sets of strings.
+    """
+
+    @staticmethod
+    def read_codes(stream, chunk_size=READ_CHUNK_SIZE) -> set:
+        """Scanned codes of an upload, one per line, read chunk by chunk"""
+        codes = set()
+        pending = b''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            codes.update(line.decode('utf-8').strip() for line in lines)
+        codes.add(pending.decode('utf-8').strip())
+        codes.discard('')
+        return codes
+
+    @staticmethod
+    def stocktake(localization: str, scanned: set, apply=False, batch_size=INVENTORY_BATCH_SIZE) -> dict:
+        """
+        Compare the scanned codes with the samples recorded at localization:
+
+        - missing: 'disponible' samples of the localization that were not scanned
+        - misplaced: scanned samples recorded at another localization
+        - unknown: scanned codes matching no sample
+        - borrowed_on_shelf / recovered: scanned samples recorded as
+          'emprunté' / 'indisponible'
+
+        With apply, missing samples become 'indisponible', batch_size per
+        transaction.
+        """
+        started = time.monotonic()
+        expected = {}
+        rows = db.session.execute(
+            select(Sample.unique_code, Sample.sample_id, Sample.book_id, Sample.sample_status)
+            .where(Sample.localization == localization)
+            .execution_options(yield_per=batch_size)
+        )
+        for unique_code, sample_id, book_id, status in rows:
+            expected[unique_code] = (sample_id, book_id, status)
+
+        found = scanned & expected.keys()
+        missing = sorted(
+            code for code in expected.keys() - scanned if expected[code][2] == 'disponible'
+        )
+
+        misplaced = []
+        unexpected = sorted(scanned - expected.keys())
+        known = set()
+        for chunk in _chunks(unexpected, batch_size):
+            for unique_code, recorded_at in db.session.execute(
+                select(Sample.unique_code, Sample.localization).where(Sample.unique_code.in_(chunk))
+            ):
+                known.add(unique_code)
+                misplaced.append({"unique_code": unique_code, "localization": recorded_at})
+
+        marked = None
+        if apply:
+            marked = 0
+            for chunk in _chunks(missing, batch_size):
+                sample_ids = [expected[code][0] for code in chunk]
+                result = db.session.execute(
+                    update(Sample)
+                    .where(
+                        Sample.sample_id.in_(sample_ids),
+                        Sample.localization == localization,
+                        Sample.sample_status == 'disponible'
+                    )
+                    .values(sample_status='indisponible')
+                    .execution_options(synchronize_session=False)
+                )
+                # Recalcul depuis samples : les exemplaires empruntés entre-temps sont ignorés
+                book_ids = sorted({expected[code][1] for code in chunk})
+                FacetService.rebuild_counters(book_ids)
+                db.session.commit()
+                marked += result.rowcount
+                for book_id in book_ids:
+                    interval_cache.invalidate(book_id)
+                response_cache.invalidate(
+                    *(f"book:{book_id}" for book_id in book_ids),
+                    *(f"sample:{expected[code][0]}" for code in chunk)
+                )
+
+        report = {
+            "localization": localization,
+            "expected": len(expected),
+            "scanned": len(scanned),
+            "found": len(found),
+            "missing": missing,
+            "misplaced": sorted(misplaced, key=lambda item: item["unique_code"]),
+            "unknown": [code for code in unexpected if code not in known],
+            "borrowed_on_shelf": sorted(code for code in found if expected[code][2] == 'emprunté'),
+            "recovered": sorted(code for code in found if expected[code][2] == 'indisponible'),
+            "marked_unavailable": marked,
+        }
+        logger.info(
+            f"Stocktake of {localization}: {len(found)}/{len(expected)} found, {len(missing)} missing, "
+            f"{len(misplaced)} misplaced, {len(report['unknown'])} unknown, "
+            f"{marked} marked unavailable in {time.monotonic() - started:.2f}s"
+        )
+        return report
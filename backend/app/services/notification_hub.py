@@ -0,0 +1,156 @@
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+from app.utils.singleton import SingletonMeta
+from config import NOTIFICATION_HUB_BACKEND, NOTIFICATION_QUEUE_SIZE, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Bounded queue of events for one stream. When the client is too slow the
+    oldest events are dropped and `overflowed` is set, so the stream can catch
+    up from the database.
+    """
+    def __init__(self, hub, user_id, max_size):
+        self.hub = hub
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def offer(self, event):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.overflowed = True
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """Wait for the next event; None when the timeout expires"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Return the events already queued, without waiting"""
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LocalHubBackend:
+    """Delivers published events within the current process only"""
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+
+class RedisHubBackend:
+    """
+    Fans events out to every process through a Redis pub/sub channel. Works
+    with any client exposing publish() and pubsub()
+    """
+    CHANNEL = 'libma:notifications'
+
+    def __init__(self, client):
+        self.client = client
+        self._thread = None
+
+    def start(self, deliver):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.CHANNEL)
+
+        def listen():
+            for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                try:
+                    payload = json.loads(message['data'])
+                    deliver(payload['user_id'], payload['event'])
+                except Exception as e:
+                    logger.error(f"Invalid notification message: {str(e)}")
+
+        self._thread = threading.Thread(target=listen, name='notification-hub', daemon=True)
+        self._thread.start()
+
+    def publish(self, user_id, event):
+        self.client.publish(self.CHANNEL, json.dumps({'user_id': user_id, 'event': event}))
+
+
+class NotificationHub(metaclass=SingletonMeta):
+    """In-process pub/sub of notification events, keyed by user"""
+
+    def __init__(self, backend=None, max_queue_size=NOTIFICATION_QUEUE_SIZE):
+        self.max_queue_size = max_queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._backend = None
+        self.use_backend(backend or self._create_backend())
+
+    @staticmethod
+    def _create_backend():
+        if NOTIFICATION_HUB_BACKEND == 'redis':
+            import redis
+            return RedisHubBackend(redis.Redis.from_url(REDIS_URL))
+        return LocalHubBackend()
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def use_backend(self, backend):
+        backend.start(self.deliver)
+        self._backend = backend
+
+    def subscribe(self, user_id) -> Subscription:
+        return self.attach(Subscription(self, user_id, self.max_queue_size))
+
+    def attach(self, subscription):
+        """Register any object exposing user_id and offer(event)"""
+        with self._lock:
+            self._subscribers[subscription.user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """Publish an event to every stream of a user, in all processes"""
+        try:
+            self._backend.publish(user_id, event)
+        except Exception as e:
+            logger.error(f"Error publishing notification for user {user_id}: {str(e)}")
+
+    def deliver(self, user_id, event):
+        """Hand an event to the streams of this process"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
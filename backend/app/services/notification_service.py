@@ -1,20 +1,81 @@
-from datetime import datetime, timedelta
-from app.models import Borrow, Notification
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, insert, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+from app.models import Borrow, Notification, NotificationBorrow
+from app.services.notification_hub import NotificationHub
 from app import db
+from config import NOTIFICATION_DIGEST
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_BATCH_SIZE = 1000
 
 class NotificationService:
     @staticmethod
-    def create_notification(user_id: int, message: str, notification_type: str) -> Notification:
-        """Create a new notification"""
+    def serialize(notification: Notification) -> dict:
+        """JSON representation shared by the REST and SSE endpoints"""
+        return {
+            'id': notification.notification_id,
+            'type': notification.notification_type,
+            'message': notification.notification_message,
+            'creation_date': notification.creation_date.isoformat() if notification.creation_date else None,
+            'viewed': bool(notification.viewed)
+        }
+
+    @staticmethod
+    def latest_notification_id(user_id: int = None) -> int:
+        """Id of the most recent notification (of a user when given), 0 if none"""
+        query = db.session.query(db.func.max(Notification.notification_id))
+        if user_id is not None:
+            query = query.filter(Notification.user_id == user_id)
+        latest = query.scalar()
+        # Rend la connexion au pool : les flux SSE restent ouverts des heures
+        db.session.close()
+        return latest or 0
+
+    @staticmethod
+    def missed_notifications(user_id: int, last_event_id: int, limit: int) -> list:
+        """Serialized unread notifications created after last_event_id, oldest first"""
+        notifications = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.viewed == False,
+            Notification.notification_id > last_event_id
+        ).order_by(Notification.notification_id).limit(limit).all()
+        result = [NotificationService.serialize(notif) for notif in notifications]
+        db.session.close()
+        return result
+
+    @staticmethod
+    def notifications_after(last_id: int, limit: int) -> list:
+        """(user_id, serialized notification) for all users, after last_id"""
+        notifications = Notification.query.filter(
+            Notification.notification_id > last_id
+        ).order_by(Notification.notification_id).limit(limit).all()
+        result = [(notif.user_id, NotificationService.serialize(notif)) for notif in notifications]
+        db.session.close()
+        return result
+
+    @staticmethod
+    def create_notification(user_id: int, message: str, notification_type: str,
+                            borrow_id: int = None, reservation_id: int = None) -> Notification:
+        """Create a new notification and push it to the user's open streams"""
         try:
             notification = Notification(
                 user_id=user_id,
+                borrow_id=borrow_id,
+                reservation_id=reservation_id,
                 notification_type=notification_type,
                 notification_message=message,
+                notification_day=date.today(),
                 viewed=False
             )
             db.session.add(notification)
             db.session.commit()
+            NotificationHub().publish(user_id, NotificationService.serialize(notification))
             return notification
         except Exception as e:
             print(f"Error creating notification: {str(e)}")
@@ -22,55 +83,298 @@ class NotificationService:
             raise
 
     @staticmethod
-    def check_upcoming_returns():
-        """Check for books due in the next 3 days and create notifications"""
+    def add_notification(user_id: int, message: str, notification_type: str,
+                         borrow_id: int = None, reservation_id: int = None) -> Notification:
+        """
+        Add a notification to the caller's transaction; it is pushed to the
+        user's open streams once the transaction commits
+        """
+        notification = Notification(
+            user_id=user_id,
+            borrow_id=borrow_id,
+            reservation_id=reservation_id,
+            notification_type=notification_type,
+            notification_message=message,
+            creation_date=datetime.now(),
+            notification_day=date.today(),
+            viewed=False
+        )
+        db.session.add(notification)
+        db.session.info.setdefault('pending_notifications', []).append(notification)
+        return notification
+
+    @staticmethod
+    def insert_notifications(rows: list) -> list:
+        """
+        Bulk insert notification dicts in the caller's transaction. Rows that
+        would repeat a (type, borrow_id, notification_day) are skipped, so
+        reminders can be created again safely. Returns the ids of the rows
+        this call inserted.
+        """
+        if not rows:
+            return []
+        # Lu dans la transaction avant l'insertion : les lignes au-delà sont les nôtres
+        last_id = db.session.query(db.func.max(Notification.notification_id)).scalar() or 0
+        dialect = db.engine.dialect.name
+        if dialect == 'mysql':
+            statement = mysql.insert(Notification)
+            statement = statement.on_duplicate_key_update(notification_id=Notification.notification_id)
+        elif dialect == 'sqlite':
+            statement = sqlite.insert(Notification).on_conflict_do_nothing()
+        else:
+            statement = insert(Notification)
+        db.session.execute(statement, rows)
+        return [
+            notification_id for notification_id, in
+            db.session.query(Notification.notification_id).filter(
+                Notification.notification_id > last_id,
+                Notification.user_id.in_({row['user_id'] for row in rows}),
+                Notification.notification_type.in_({row['notification_type'] for row in rows})
+            ).order_by(Notification.notification_id)
+        ]
+
+    @staticmethod
+    def publish(notification_ids: list) -> None:
+        """Push the given notifications to their users' open streams"""
+        hub = NotificationHub()
+        for start in range(0, len(notification_ids), NOTIFICATION_BATCH_SIZE):
+            batch = Notification.query.filter(
+                Notification.notification_id.in_(notification_ids[start:start + NOTIFICATION_BATCH_SIZE])
+            ).order_by(Notification.notification_id).all()
+            for notification in batch:
+                hub.publish(notification.user_id, NotificationService.serialize(notification))
+        db.session.close()
+
+    @staticmethod
+    def _chunks_by_user(rows: list):
+        """Split rows sorted by user_id into batches that never split a user"""
+        chunk = []
+        for row in rows:
+            if len(chunk) >= NOTIFICATION_BATCH_SIZE and row.user_id != chunk[-1].user_id:
+                yield chunk
+                chunk = []
+            chunk.append(row)
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _group_by_user(rows: list) -> dict:
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row.user_id].append(row)
+        return grouped
+
+    @staticmethod
+    def _link_digest_borrows(notification_ids: list, chunk: list) -> None:
+        """Record the borrows each new digest covers, so they are not reminded again"""
+        digests = dict(
+            db.session.query(Notification.user_id, Notification.notification_id).filter(
+                Notification.notification_id.in_(notification_ids),
+                Notification.borrow_id.is_(None)
+            )
+        )
+        links = [
+            {'notification_id': digests[row.user_id], 'borrow_id': row.borrow_id}
+            for row in chunk if row.user_id in digests
+        ]
+        if links:
+            db.session.execute(insert(NotificationBorrow), links)
+
+    @staticmethod
+    def _upcoming_notifications(chunk: list, today: datetime, digest: bool) -> list:
+        groups = NotificationService._group_by_user(chunk) if digest else {
+            row.borrow_id: [row] for row in chunk
+        }
+        notifications = []
+        for borrows in groups.values():
+            first = borrows[0]
+            if len(borrows) == 1:
+                message = f"Le livre emprunté doit être retourné dans {(first.end_date - today).days} jours. ID emprunt: {first.borrow_id}"
+            else:
+                details = ', '.join(
+                    f"ID emprunt: {row.borrow_id} dans {(row.end_date - today).days} jours" for row in borrows
+                )
+                message = f"{len(borrows)} livres empruntés doivent être retournés prochainement ({details})"
+            notifications.append({
+                'user_id': first.user_id,
+                'borrow_id': first.borrow_id if len(borrows) == 1 else None,
+                'notification_type': 'date_echeance',
+                'notification_message': message,
+                'notification_day': today.date(),
+                'viewed': False,
+            })
+        return notifications
+
+    @staticmethod
+    def _overdue_notifications(chunk: list, today: datetime, digest: bool) -> list:
+        groups = NotificationService._group_by_user(chunk) if digest else {
+            row.borrow_id: [row] for row in chunk
+        }
+        notifications = []
+        for borrows in groups.values():
+            first = borrows[0]
+            if len(borrows) == 1:
+                message = f"Le livre emprunté est en retard! Veuillez le retourner dès que possible. ID emprunt: {first.borrow_id}"
+            else:
+                borrow_ids = ', '.join(str(row.borrow_id) for row in borrows)
+                message = f"{len(borrows)} livres empruntés sont en retard! Veuillez les retourner dès que possible. ID emprunts: {borrow_ids}"
+            notifications.append({
+                'user_id': first.user_id,
+                'borrow_id': first.borrow_id if len(borrows) == 1 else None,
+                'notification_type': 'rappel_emprunt',
+                'notification_message': message,
+                'notification_day': today.date(),
+                'viewed': False,
+            })
+        return notifications
+
+    @staticmethod
+    def check_upcoming_returns(digest: bool = NOTIFICATION_DIGEST):
+        """
+        Check for books due in the next 3 days and create notifications. In
+        digest mode, a member with several such loans gets a single one, which
+        records the loans it covers so the next runs skip them while unread.
+        """
+        started = time.monotonic()
         today = datetime.now()
         three_days_from_now = today + timedelta(days=3)
-        
-        upcoming_returns = Borrow.query.filter(
+
+        # Anti-jointure : emprunts sans rappel non lu
+        reminder_exists = (
+            db.session.query(Notification.notification_id)
+            .filter(
+                Notification.borrow_id == Borrow.borrow_id,
+                Notification.notification_type == 'date_echeance',
+                Notification.viewed == False,
+            )
+            .exists()
+        )
+        # Emprunts déjà couverts par un digest non lu
+        digest_exists = (
+            db.session.query(NotificationBorrow.notification_id)
+            .join(Notification, Notification.notification_id == NotificationBorrow.notification_id)
+            .filter(
+                NotificationBorrow.borrow_id == Borrow.borrow_id,
+                Notification.notification_type == 'date_echeance',
+                Notification.viewed == False,
+            )
+            .exists()
+        )
+        filters = [
             Borrow.end_date <= three_days_from_now,
             Borrow.end_date > today,
-            Borrow.borrow_status == 'en cours'
-        ).all()
-        
-        for borrow in upcoming_returns:
-            existing_notification = Notification.query.filter(
-                Notification.user_id == borrow.user_id,
-                Notification.notification_type == 'date_echeance',
-                db.cast(Notification.notification_message, db.String).like(f"%{borrow.borrow_id}%"),
-                Notification.viewed == False
-            ).first()
-            
-            if not existing_notification:
-                days_remaining = (borrow.end_date - today).days
-                NotificationService.create_notification(
-                    user_id=borrow.user_id,
-                    notification_type='date_echeance',
-                    message=f"Le livre emprunté doit être retourné dans {days_remaining} jours. ID emprunt: {borrow.borrow_id}"
+            Borrow.borrow_status == 'en cours',
+            ~reminder_exists,
+            ~digest_exists,
+        ]
+        upcoming_returns = db.session.query(
+            Borrow.borrow_id, Borrow.user_id, Borrow.end_date
+        ).filter(*filters).order_by(Borrow.user_id, Borrow.borrow_id).all()
+
+        created = []
+        try:
+            for chunk in NotificationService._chunks_by_user(upcoming_returns):
+                inserted = NotificationService.insert_notifications(
+                    NotificationService._upcoming_notifications(chunk, today, digest)
                 )
+                if digest and inserted:
+                    NotificationService._link_digest_borrows(inserted, chunk)
+                db.session.commit()
+                created.extend(inserted)
+        except Exception as e:
+            logger.error(f"Error creating due date reminders: {str(e)}")
+            db.session.rollback()
+            raise
+        finally:
+            if created:
+                NotificationService.publish(created)
+            logger.info(
+                f"check_upcoming_returns: {len(created)} reminders created for "
+                f"{len(upcoming_returns)} borrows in {time.monotonic() - started:.2f}s"
+            )
 
     @staticmethod
-    def check_overdue_returns():
-        """Check for overdue books and create notifications"""
+    def check_overdue_returns(digest: bool = NOTIFICATION_DIGEST):
+        """
+        Check for overdue books and create notifications. In digest mode, a
+        member with several newly overdue loans gets a single one.
+        """
+        started = time.monotonic()
         today = datetime.now()
-        
-        overdue_returns = Borrow.query.filter(
+
+        overdue_returns = db.session.query(Borrow.borrow_id, Borrow.user_id).filter(
             Borrow.end_date < today,
             Borrow.borrow_status == 'en cours'
-        ).all()
-        
-        for borrow in overdue_returns:
-            if borrow.borrow_status != 'en retard':
-                borrow.borrow_status = 'en retard'
-                
-                NotificationService.create_notification(
-                    user_id=borrow.user_id,
-                    notification_type='rappel_emprunt',
-                    message=f"Le livre emprunté est en retard! Veuillez le retourner dès que possible. ID emprunt: {borrow.borrow_id}"
+        ).order_by(Borrow.user_id, Borrow.borrow_id).all()
+
+        updated = 0
+        created = []
+        try:
+            # Un lot par transaction : les verrous restent courts
+            for chunk in NotificationService._chunks_by_user(overdue_returns):
+                result = db.session.execute(
+                    update(Borrow)
+                    .where(
+                        Borrow.borrow_id.in_([row.borrow_id for row in chunk]),
+                        Borrow.borrow_status == 'en cours'
+                    )
+                    .values(borrow_status='en retard')
+                )
+                inserted = NotificationService.insert_notifications(
+                    NotificationService._overdue_notifications(chunk, today, digest)
                 )
-                
-                try:
-                    db.session.commit()
-                except Exception as e:
-                    print(f"Error updating borrow status: {str(e)}")
-                    db.session.rollback()
\ No newline at end of file
+                db.session.commit()
+                updated += result.rowcount
+                created.extend(inserted)
+        except Exception as e:
+            logger.error(f"Error updating borrow status: {str(e)}")
+            db.session.rollback()
+            raise
+        finally:
+            if created:
+                NotificationService.publish(created)
+            logger.info(
+                f"check_overdue_returns: {updated} borrows marked overdue, "
+                f"{len(created)} notifications created in {time.monotonic() - started:.2f}s"
+            )
+
+    @staticmethod
+    def mark_all_read(user_id: int, up_to_id: int = None) -> int:
+        """
+        Mark the user's unread notifications as read with a single UPDATE,
+        optionally only those up to up_to_id (the last one the client saw)
+        """
+        query = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.viewed == False
+        )
+        if up_to_id is not None:
+            query = query.filter(Notification.notification_id <= up_to_id)
+        updated = query.update({Notification.viewed: True}, synchronize_session=False)
+        db.session.commit()
+        return updated
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _serialize_pending_notifications(session, flush_context):
+    pending = session.info.pop('pending_notifications', None)
+    if pending:
+        session.info.setdefault('notifications_to_publish', []).extend(
+            (notification.user_id, NotificationService.serialize(notification))
+            for notification in pending
+        )
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_notifications(session):
+    events = session.info.pop('notifications_to_publish', None)
+    if events:
+        hub = NotificationHub()
+        for user_id, notification in events:
+            hub.publish(user_id, notification)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notifications(session):
+    session.info.pop('pending_notifications', None)
+    session.info.pop('notifications_to_publish', None)
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs, urlsplit
+from app.routes.notifications import CATCH_UP_LIMIT, SSE_RETRY_MS, format_sse, parse_last_event_id
+from app.services.notification_hub import LocalHubBackend, NotificationHub
+from app.services.notification_service import NotificationService
+from config import (
+    NOTIFICATION_HEARTBEAT_INTERVAL,
+    NOTIFICATION_POLL_INTERVAL,
+    NOTIFICATION_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = re.compile(r'^/notifications/stream/(\d+)/?$')
+ALLOWED_ORIGIN = 'http://localhost:3000'
+REQUEST_TIMEOUT = 10
+MAX_HEADER_COUNT = 100
+POLL_BATCH_SIZE = 1000
+
+
+class AsyncSubscription:
+    """
+    asyncio counterpart of Subscription: the hub may offer events from any
+    thread, they are queued on the server's event loop
+    """
+    def __init__(self, hub, user_id, max_size, loop):
+        self.hub = hub
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+        self._loop = loop
+
+    def offer(self, event):
+        self._loop.call_soon_threadsafe(self._offer, event)
+
+    def _offer(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.overflowed = True
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """Wait for the next event; None when the timeout expires"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self):
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class NotificationStreamServer:
+    """
+    Serves /notifications/stream/<user_id> from a single asyncio event loop
+
+    An idle stream costs a socket and a small queue instead of a worker thread,
+    so one process holds thousands of connections. The stream protocol (retry,
+    Last-Event-ID resume, catch-up, keepalive) is the blueprint's; database
+    calls run in the default executor. With the local hub backend, events
+    committed by the Flask workers are picked up by polling the notifications
+    table every poll_interval seconds.
+    """
+
+    def __init__(self, app, hub=None, poll_interval=NOTIFICATION_POLL_INTERVAL,
+                 heartbeat_interval=NOTIFICATION_HEARTBEAT_INTERVAL):
+        self.app = app
+        self.hub = hub or NotificationHub()
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.connections = 0
+
+    def run(self, host, port):
+        asyncio.run(self.serve(host, port))
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        poller = None
+        if isinstance(self.hub.backend, LocalHubBackend):
+            poller = asyncio.create_task(self._poll_notifications())
+        logger.info(f"Notification streams served on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if poller is not None:
+                poller.cancel()
+
+    async def _db(self, func, *args):
+        def call():
+            with self.app.app_context():
+                return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, call)
+
+    async def _poll_notifications(self):
+        last_id = await self._db(NotificationService.latest_notification_id)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await self._db(NotificationService.notifications_after, last_id, POLL_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Error polling notifications: {str(e)}")
+                continue
+            for user_id, event in rows:
+                self.hub.deliver(user_id, event)
+            if rows:
+                last_id = rows[-1][1]['id']
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            return None
+        headers = {}
+        for _ in range(MAX_HEADER_COUNT):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return parts[0], parts[1], headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return None
+
+    @staticmethod
+    def _response_head(status, headers):
+        lines = [f'HTTP/1.1 {status}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            except (asyncio.TimeoutError, ValueError):
+                request = None
+            if request is None:
+                writer.write(self._response_head('400 Bad Request', {'Connection': 'close'}))
+                return
+
+            method, target, headers = request
+            url = urlsplit(target)
+            match = STREAM_PATH.match(url.path)
+            cors = {
+                'Access-Control-Allow-Origin': ALLOWED_ORIGIN,
+                'Access-Control-Allow-Headers': 'Content-Type, Last-Event-ID',
+            }
+            if method == 'OPTIONS':
+                writer.write(self._response_head('204 No Content', {
+                    **cors, 'Access-Control-Allow-Methods': 'GET', 'Connection': 'close',
+                }))
+                return
+            if method != 'GET' or match is None:
+                writer.write(self._response_head('404 Not Found', {
+                    **cors, 'Content-Length': '0', 'Connection': 'close',
+                }))
+                return
+
+            query_last_id = parse_qs(url.query).get('last_event_id', [None])[0]
+            last_event_id = parse_last_event_id(headers.get('last-event-id') or query_last_id)
+            writer.write(self._response_head('200 OK', {
+                **cors,
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive',
+                'X-Accel-Buffering': 'no',
+            }))
+            await self._stream(writer, int(match.group(1)), last_event_id)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"Error in notification stream: {str(e)}")
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _stream(self, writer, user_id, last_event_id):
+        subscription = self.hub.attach(
+            AsyncSubscription(self.hub, user_id, NOTIFICATION_QUEUE_SIZE, asyncio.get_running_loop())
+        )
+        try:
+            writer.write(f'retry: {SSE_RETRY_MS}\n\n'.encode('utf-8'))
+            await writer.drain()
+
+            if last_event_id is None:
+                last_event_id = await self._db(NotificationService.latest_notification_id, user_id)
+                catch_up = False
+            else:
+                catch_up = True
+
+            while True:
+                if catch_up or subscription.overflowed:
+                    subscription.overflowed = False
+                    subscription.drain()
+                    missed = await self._db(
+                        NotificationService.missed_notifications, user_id, last_event_id, CATCH_UP_LIMIT
+                    )
+                    catch_up = len(missed) == CATCH_UP_LIMIT
+                    if missed:
+                        last_event_id = missed[-1]['id']
+                        writer.write(format_sse(
+                            json.dumps(missed), event='notification', event_id=last_event_id
+                        ).encode('utf-8'))
+                        await writer.drain()
+                    continue
+
+                event = await subscription.get(timeout=self.heartbeat_interval)
+                if event is None:
+                    # Détecte aussi les clients partis sans fermer la connexion
+                    writer.write(b': keepalive\n\n')
+                    await writer.drain()
+                    continue
+
+                events = [
+                    queued for queued in [event] + subscription.drain()
+                    if queued['id'] > last_event_id
+                ]
+                if events:
+                    last_event_id = events[-1]['id']
+                    writer.write(format_sse(
+                        json.dumps(events), event='notification', event_id=last_event_id
+                    ).encode('utf-8'))
+                    await writer.drain()
+        finally:
+            subscription.close()
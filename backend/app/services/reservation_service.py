@@ -0,0 +1,294 @@
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, update
+from app import db
+from app.models import Reservation, Sample
+from app.services.availability_service import AvailabilityService
+from app.services.facet_service import FacetService
+from app.services.notification_service import NotificationService
+from app.utils.interval_cache import interval_cache
+from app.utils.response_cache import response_cache
+from config import RESERVATION_HOLD_DAYS
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_BATCH_SIZE = 1000
+
+
+def _hold_message(reservation_id: int, expiration_date: datetime) -> str:
+    return (
+        f"Un exemplaire du livre réservé vous attend jusqu'au {expiration_date:%d/%m/%Y}. "
+        f"ID réservation: {reservation_id}"
+    )
+
+
+class ReservationService:
+    """
+    FIFO waiting list of members per book
+
+    Active reservations are served in reservation_id order. When a sample is
+    freed it is held ('réservé') for the head of the queue, whose reservation
+    becomes 'confirmée' until expiration_date, then 'honorée' once the member
+    borrows the sample or 'expirée' when the hold runs out. A sample booked
+    by an approved borrow starting within the hold is never held: it stays
+    'disponible' for the booking.
+    """
+
+    @staticmethod
+    def queue_position(reservation: Reservation):
+        """1-based position in the book's queue, None when not waiting"""
+        if reservation.reservation_status != 'active':
+            return None
+        # Parcours de l'index (book_id, reservation_status, reservation_id)
+        ahead = db.session.query(func.count(Reservation.reservation_id)).filter(
+            Reservation.book_id == reservation.book_id,
+            Reservation.reservation_status == 'active',
+            Reservation.reservation_id < reservation.reservation_id
+        ).scalar()
+        return ahead + 1
+
+    @staticmethod
+    def _hold_end() -> datetime:
+        return datetime.now() + timedelta(days=RESERVATION_HOLD_DAYS)
+
+    @staticmethod
+    def _confirm(reservation: Reservation, sample: Sample) -> None:
+        reservation.reservation_status = 'confirmée'
+        reservation.sample_id = sample.sample_id
+        reservation.expiration_date = ReservationService._hold_end()
+        NotificationService.add_notification(
+            user_id=reservation.user_id,
+            notification_type='nouvelle_reservation',
+            reservation_id=reservation.reservation_id,
+            message=_hold_message(reservation.reservation_id, reservation.expiration_date),
+        )
+
+    @staticmethod
+    def release_sample(sample: Sample):
+        """
+        Hand a freed sample to the head of its book's queue, or make it
+        available when nobody waits. Runs in the caller's transaction and
+        returns the confirmed reservation, if any.
+        """
+        return ReservationService.release_samples([sample]).get(sample.sample_id)
+
+    @staticmethod
+    def release_samples(samples) -> dict:
+        """
+        release_sample for several samples, with one queue query for all
+        their books; returns sample_id -> confirmed reservation for the
+        samples handed to a waiting member
+        """
+        by_book = defaultdict(list)
+        for sample in sorted(samples, key=lambda sample: sample.sample_id):
+            by_book[sample.book_id].append(sample)
+        if not by_book:
+            return {}
+
+        waiting = defaultdict(list)
+        for reservation in (
+            Reservation.query.filter(
+                Reservation.book_id.in_(list(by_book)),
+                Reservation.reservation_status == 'active'
+            )
+            .order_by(Reservation.reservation_id)
+            .with_for_update()
+        ):
+            waiting[reservation.book_id].append(reservation)
+
+        booked = AvailabilityService.booked_samples(
+            [sample.sample_id for sample in samples], ReservationService._hold_end()
+        )
+        confirmed = {}
+        for book_id, book_samples in by_book.items():
+            holdable = [sample for sample in book_samples if sample.sample_id not in booked]
+            for sample, reservation in zip(holdable, waiting[book_id]):
+                FacetService.set_sample_status(sample, 'réservé')
+                ReservationService._confirm(reservation, sample)
+                confirmed[sample.sample_id] = reservation
+            # Compteurs de disponibilité mis à jour une fois par livre
+            released = [sample for sample in book_samples if sample.sample_id not in confirmed]
+            previous = Counter(sample.sample_status for sample in released if sample.sample_status != 'disponible')
+            for sample in released:
+                sample.sample_status = 'disponible'
+            for status, count in previous.items():
+                FacetService.record_status_change(book_id, status, 'disponible', count)
+        return confirmed
+
+    @staticmethod
+    def create_reservation(user_id: int, book_id: int) -> Reservation:
+        """
+        Queue a reservation; when nobody is ahead and a sample is available
+        it is held right away. Runs in the caller's transaction.
+        """
+        reservation = Reservation(
+            user_id=user_id,
+            book_id=book_id,
+            borrowed_at=datetime.now(),
+            reservation_status='active'
+        )
+        db.session.add(reservation)
+        db.session.flush()
+
+        if ReservationService.queue_position(reservation) == 1:
+            samples = (
+                Sample.query.filter(
+                    Sample.book_id == book_id,
+                    Sample.sample_status == 'disponible'
+                )
+                .order_by(Sample.sample_id)
+                .with_for_update()
+                .all()
+            )
+            booked = AvailabilityService.booked_samples(
+                [sample.sample_id for sample in samples], ReservationService._hold_end()
+            )
+            sample = next((sample for sample in samples if sample.sample_id not in booked), None)
+            if sample is not None:
+                FacetService.set_sample_status(sample, 'réservé')
+                ReservationService._confirm(reservation, sample)
+        return reservation
+
+    @staticmethod
+    def cancel_reservation(reservation: Reservation) -> None:
+        """Cancel a reservation, passing a sample it held to the next member"""
+        held = None
+        if reservation.reservation_status == 'confirmée':
+            held = reservation.sample
+        reservation.reservation_status = 'annulée'
+        if held is not None and held.sample_status == 'réservé':
+            ReservationService.release_sample(held)
+
+    @staticmethod
+    def claim_for_borrow(sample: Sample, user_id: int) -> bool:
+        """
+        True when the sample is held for this member; the hold then ends and
+        the sample can be borrowed
+        """
+        reservation = (
+            Reservation.query.filter(
+                Reservation.sample_id == sample.sample_id,
+                Reservation.user_id == user_id,
+                Reservation.reservation_status == 'confirmée'
+            )
+            .with_for_update()
+            .first()
+        )
+        if reservation is None:
+            return False
+        reservation.reservation_status = 'honorée'
+        return True
+
+    @staticmethod
+    def expire_reservations() -> dict:
+        """
+        Expire confirmed reservations whose hold has run out, in batches: the
+        statuses change with one UPDATE per batch, freed samples go to the
+        next members in line (one queue query per book) or back to
+        'disponible' with one UPDATE per book
+        """
+        started = time.monotonic()
+        now = datetime.now()
+        expired_rows = db.session.query(
+            Reservation.reservation_id, Reservation.book_id, Reservation.sample_id
+        ).filter(
+            Reservation.reservation_status == 'confirmée',
+            Reservation.expiration_date < now
+        ).order_by(Reservation.reservation_id).all()
+
+        stats = {"expired": 0, "promoted": 0, "released": 0}
+        published = []
+        try:
+            for start in range(0, len(expired_rows), EXPIRY_BATCH_SIZE):
+                chunk = expired_rows[start:start + EXPIRY_BATCH_SIZE]
+                result = db.session.execute(
+                    update(Reservation)
+                    .where(
+                        Reservation.reservation_id.in_([row.reservation_id for row in chunk]),
+                        Reservation.reservation_status == 'confirmée',
+                        Reservation.expiration_date < now
+                    )
+                    .values(reservation_status='expirée')
+                )
+                stats["expired"] += result.rowcount
+
+                held_ids = [row.sample_id for row in chunk if row.sample_id is not None]
+                still_held = {
+                    sample_id for sample_id, in
+                    db.session.query(Sample.sample_id).filter(
+                        Sample.sample_id.in_(held_ids),
+                        Sample.sample_status == 'réservé'
+                    )
+                }
+                expiration_date = now + timedelta(days=RESERVATION_HOLD_DAYS)
+                booked = AvailabilityService.booked_samples(still_held, expiration_date)
+                freed = defaultdict(list)
+                for row in chunk:
+                    if row.sample_id in still_held:
+                        freed[row.book_id].append(row.sample_id)
+
+                confirmations = []
+                notifications = []
+                for book_id, sample_ids in freed.items():
+                    # Les exemplaires réservés par un emprunt approuvé ne sont pas remis de côté
+                    released = [sample_id for sample_id in sample_ids if sample_id in booked]
+                    sample_ids = [sample_id for sample_id in sample_ids if sample_id not in booked]
+                    waiting = (
+                        db.session.query(Reservation.reservation_id, Reservation.user_id)
+                        .filter(
+                            Reservation.book_id == book_id,
+                            Reservation.reservation_status == 'active'
+                        )
+                        .order_by(Reservation.reservation_id)
+                        .limit(len(sample_ids))
+                        .with_for_update()
+                        .all()
+                    )
+                    for (reservation_id, user_id), sample_id in zip(waiting, sample_ids):
+                        confirmations.append({
+                            'reservation_id': reservation_id,
+                            'reservation_status': 'confirmée',
+                            'sample_id': sample_id,
+                            'expiration_date': expiration_date,
+                        })
+                        notifications.append({
+                            'user_id': user_id,
+                            'reservation_id': reservation_id,
+                            'notification_type': 'nouvelle_reservation',
+                            'notification_message': _hold_message(reservation_id, expiration_date),
+                            'notification_day': date.today(),
+                            'viewed': False,
+                        })
+
+                    released += sample_ids[len(waiting):]
+                    if released:
+                        result = db.session.execute(
+                            update(Sample)
+                            .where(Sample.sample_id.in_(released), Sample.sample_status == 'réservé')
+                            .values(sample_status='disponible')
+                        )
+                        FacetService.record_status_change(book_id, 'réservé', 'disponible', result.rowcount)
+                        stats["released"] += result.rowcount
+
+                inserted = []
+                if confirmations:
+                    db.session.execute(update(Reservation), confirmations)
+                    inserted = NotificationService.insert_notifications(notifications)
+                    stats["promoted"] += len(confirmations)
+                db.session.commit()
+                published.extend(inserted)
+                book_ids = {row.book_id for row in chunk}
+                for book_id in book_ids:
+                    interval_cache.invalidate(book_id)
+                response_cache.invalidate(*(f"book:{book_id}" for book_id in book_ids))
+        except Exception as e:
+            logger.error(f"Error expiring reservations: {str(e)}")
+            db.session.rollback()
+            raise
+        finally:
+            if published:
+                NotificationService.publish(published)
+            logger.info(f"expire_reservations: {stats} in {time.monotonic() - started:.2f}s")
+        return stats
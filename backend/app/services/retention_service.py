@@ -0,0 +1,184 @@
+import json
+import logging
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import delete, select, text
+from app import db
+from app.models import ArchiveBatch, Log, Notification
+from config import (
+    LOG_PARTITION_MONTHS_AHEAD,
+    LOG_RETENTION_DAYS,
+    NOTIFICATION_RETENTION_DAYS,
+    RETENTION_BATCH_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+class RetentionService:
+    """
+    Moves old rows out of notifications and logs into archive_batches: each
+    batch is one row holding the archived rows as zlib-compressed JSON lines
+    """
+
+    @staticmethod
+    def _archive(table, primary_key, filters, batch_size) -> int:
+        archived = 0
+        while True:
+            rows = db.session.execute(
+                select(table).where(*filters).order_by(primary_key).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                return archived
+
+            ids = [row[primary_key.name] for row in rows]
+            payload = '\n'.join(json.dumps(dict(row), default=str) for row in rows)
+            db.session.add(ArchiveBatch(
+                source_table=table.name,
+                first_id=ids[0],
+                last_id=ids[-1],
+                row_count=len(rows),
+                archived_at=_utcnow(),
+                payload=zlib.compress(payload.encode('utf-8')),
+            ))
+            db.session.execute(delete(table).where(primary_key.in_(ids)))
+            db.session.commit()
+            archived += len(rows)
+
+    @staticmethod
+    def read_batch(batch: ArchiveBatch) -> list:
+        """Rows of an archive batch, as dicts"""
+        return [json.loads(line) for line in zlib.decompress(batch.payload).decode('utf-8').splitlines()]
+
+    @staticmethod
+    def archive_notifications(retention_days=None, batch_size=RETENTION_BATCH_SIZE) -> dict:
+        """Archive viewed notifications older than the retention age of their type"""
+        retention_days = retention_days or NOTIFICATION_RETENTION_DAYS
+        now = datetime.now()
+        archived = {}
+        for notification_type, days in retention_days.items():
+            archived[notification_type] = RetentionService._archive(
+                Notification.__table__,
+                Notification.notification_id,
+                [
+                    Notification.notification_type == notification_type,
+                    Notification.viewed == True,
+                    Notification.creation_date < now - timedelta(days=days),
+                ],
+                batch_size,
+            )
+        return archived
+
+    @staticmethod
+    def archive_logs(retention_days=LOG_RETENTION_DAYS, batch_size=RETENTION_BATCH_SIZE) -> int:
+        return RetentionService._archive(
+            Log.__table__,
+            Log.log_id,
+            [Log.action_date < datetime.now() - timedelta(days=retention_days)],
+            batch_size,
+        )
+
+    @staticmethod
+    def log_partitions() -> list:
+        """(name, upper bound as a UNIX timestamp or None for MAXVALUE) of the logs partitions"""
+        if db.engine.dialect.name != 'mysql':
+            return []
+        rows = db.session.execute(text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'logs' AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        )).all()
+        return [
+            (name, None if description == 'MAXVALUE' else int(description))
+            for name, description in rows
+        ]
+
+    @staticmethod
+    def _month_partitions(first_month: date, count: int) -> list:
+        partitions = []
+        for offset in range(count):
+            month = _add_months(first_month, offset)
+            bound = _add_months(month, 1)
+            partitions.append(
+                f"PARTITION p{month:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{bound:%Y-%m-%d} 00:00:00'))"
+            )
+        return partitions
+
+    @staticmethod
+    def partition_logs(months_ahead=LOG_PARTITION_MONTHS_AHEAD) -> None:
+        """
+        Convert logs to monthly RANGE partitions (MySQL only). Partitioned
+        InnoDB tables cannot have foreign keys and every unique key must
+        include the partitioning column, so fk_logs_users is dropped and the
+        primary key becomes (log_id, action_date).
+        """
+        if db.engine.dialect.name != 'mysql':
+            raise RuntimeError("Log partitioning requires MySQL")
+        if RetentionService.log_partitions():
+            return
+
+        oldest = db.session.execute(text("SELECT MIN(action_date) FROM logs")).scalar()
+        today = date.today()
+        first_month = date((oldest or today).year, (oldest or today).month, 1)
+        month_count = (today.year - first_month.year) * 12 + today.month - first_month.month + 1 + months_ahead
+        partitions = RetentionService._month_partitions(first_month, month_count)
+        partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+        db.session.execute(text("ALTER TABLE logs DROP FOREIGN KEY fk_logs_users"))
+        db.session.execute(text(
+            "ALTER TABLE logs MODIFY action_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (log_id, action_date)"
+        ))
+        db.session.execute(text(
+            f"ALTER TABLE logs PARTITION BY RANGE (UNIX_TIMESTAMP(action_date)) ({', '.join(partitions)})"
+        ))
+        db.session.commit()
+
+    @staticmethod
+    def maintain_log_partitions(months_ahead=LOG_PARTITION_MONTHS_AHEAD,
+                                retention_days=LOG_RETENTION_DAYS) -> dict:
+        """Add the coming monthly partitions and drop those past the retention age"""
+        partitions = RetentionService.log_partitions()
+        if not partitions:
+            return {"added": 0, "dropped": 0}
+
+        bounded = [(name, bound) for name, bound in partitions if bound is not None]
+        last_bound = date.fromtimestamp(bounded[-1][1]) if bounded else date.today().replace(day=1)
+        wanted_bound = _add_months(date.today().replace(day=1), months_ahead + 1)
+        missing = (wanted_bound.year - last_bound.year) * 12 + wanted_bound.month - last_bound.month
+        if missing > 0:
+            new_partitions = RetentionService._month_partitions(last_bound, missing)
+            new_partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+            db.session.execute(text(
+                f"ALTER TABLE logs REORGANIZE PARTITION pmax INTO ({', '.join(new_partitions)})"
+            ))
+
+        # Les lignes plus anciennes que la rétention ont déjà été archivées
+        cutoff = (datetime.now() - timedelta(days=retention_days)).timestamp()
+        expired = [name for name, bound in bounded if bound <= cutoff]
+        if expired:
+            db.session.execute(text(f"ALTER TABLE logs DROP PARTITION {', '.join(expired)}"))
+        db.session.commit()
+        return {"added": max(missing, 0), "dropped": len(expired)}
+
+    @staticmethod
+    def apply_retention(batch_size=RETENTION_BATCH_SIZE) -> dict:
+        """Run the whole retention policy; used by the scheduler and `flask apply-retention`"""
+        started = time.monotonic()
+        stats = {
+            "notifications": RetentionService.archive_notifications(batch_size=batch_size),
+            "logs": RetentionService.archive_logs(batch_size=batch_size),
+            "log_partitions": RetentionService.maintain_log_partitions(),
+        }
+        logger.info(f"Retention applied in {time.monotonic() - started:.2f}s: {stats}")
+        return stats
@@ -0,0 +1,229 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from app.models import JobRun, SchedulerLease
+from app.services.circulation_service import CirculationService
+from app.services.notification_service import NotificationService
+from app.services.reservation_service import ReservationService
+from app.services.retention_service import RetentionService
+from app.utils.singleton import SingletonMeta
+from config import (
+    SCHEDULER_LEASE_TTL,
+    SCHEDULER_MISFIRE_GRACE_TIME,
+    SCHEDULER_RENEW_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'scheduler'
+JOB_TABLE = 'apscheduler_jobs'
+
+# Tâches planifiées : nom -> (fonction, intervalle)
+JOBS = {
+    'check_upcoming_returns': (NotificationService.check_upcoming_returns, {'hours': 12}),
+    'check_overdue_returns': (NotificationService.check_overdue_returns, {'hours': 12}),
+    'expire_reservations': (ReservationService.expire_reservations, {'hours': 1}),
+    'start_booked_borrows': (CirculationService.start_booked_borrows, {'minutes': 15}),
+    'apply_retention': (RetentionService.apply_retention, {'hours': 24}),
+}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def run_job(job_name):
+    """Entry point stored in the job store: runs a job and records its run"""
+    SchedulerService().execute(job_name)
+
+
+class SchedulerService(metaclass=SingletonMeta):
+    """
+    Runs the JOBS in exactly one process among all web workers and
+    `flask run-scheduler` processes
+
+    Every process competes for a lease row in scheduler_leases; the holder
+    renews it every renew_interval seconds and is the only one running an
+    APScheduler instance. Jobs and their next run times live in the
+    apscheduler_jobs table, so runs missed while no process held the lease
+    are executed (once, coalesced) by the next leader.
+    """
+
+    def __init__(self, lease_ttl=SCHEDULER_LEASE_TTL, renew_interval=SCHEDULER_RENEW_INTERVAL):
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval
+        self.holder_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._scheduler = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return self._scheduler is not None
+
+    def acquire_lease(self) -> bool:
+        """Take or renew the lease; True when this process holds it"""
+        now = _utcnow()
+        expires_at = now + timedelta(seconds=self.lease_ttl)
+        try:
+            result = db.session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.lease_name == LEASE_NAME,
+                    (SchedulerLease.holder == self.holder_id) | (SchedulerLease.expires_at < now)
+                )
+                .values(holder=self.holder_id, expires_at=expires_at)
+            )
+            if result.rowcount == 0:
+                if db.session.get(SchedulerLease, LEASE_NAME) is not None:
+                    db.session.rollback()
+                    return False
+                db.session.add(SchedulerLease(lease_name=LEASE_NAME, holder=self.holder_id, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Un autre processus a créé le bail en même temps
+            db.session.rollback()
+            return False
+
+    def release_lease(self) -> None:
+        db.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.lease_name == LEASE_NAME, SchedulerLease.holder == self.holder_id)
+            .values(expires_at=_utcnow())
+        )
+        db.session.commit()
+
+    def _start_scheduler(self):
+        scheduler = BackgroundScheduler(
+            jobstores={'default': SQLAlchemyJobStore(engine=db.engine, tablename=JOB_TABLE)},
+            job_defaults={
+                'coalesce': True,
+                'max_instances': 1,
+                'misfire_grace_time': SCHEDULER_MISFIRE_GRACE_TIME,
+            },
+        )
+        scheduler.start(paused=True)
+        for name, (_, interval) in JOBS.items():
+            job = scheduler.get_job(name)
+            if job is None:
+                scheduler.add_job(run_job, 'interval', args=[name], id=name, **interval)
+            elif job.trigger.interval != timedelta(**interval):
+                job.reschedule('interval', **interval)
+        # Les tâches persistées gardent leur prochaine échéance : celles
+        # manquées pendant l'absence de leader s'exécutent à la reprise
+        scheduler.resume()
+        self._scheduler = scheduler
+        logger.info(f"Scheduler leadership acquired by {self.holder_id}")
+
+    def _stop_scheduler(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=True)
+            self._scheduler = None
+            logger.info(f"Scheduler leadership released by {self.holder_id}")
+
+    def _elect(self):
+        with app.app_context():
+            try:
+                leader = self.acquire_lease()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error renewing scheduler lease: {str(e)}")
+                leader = False
+            if leader and self._scheduler is None:
+                self._start_scheduler()
+            elif not leader and self._scheduler is not None:
+                self._stop_scheduler()
+
+    def run_forever(self):
+        """Compete for the lease until stop() is called"""
+        try:
+            while True:
+                self._elect()
+                if self._stop.wait(self.renew_interval):
+                    break
+        finally:
+            self._stop_scheduler()
+            with app.app_context():
+                try:
+                    self.release_lease()
+                except Exception as e:
+                    logger.error(f"Error releasing scheduler lease: {str(e)}")
+
+    def start(self):
+        """Compete for the lease from a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name='scheduler-election', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def execute(self, job_name):
+        func, _ = JOBS[job_name]
+        with app.app_context():
+            # Confirme le bail : un ancien leader isolé ne doit plus exécuter
+            if not self.acquire_lease():
+                logger.warning(f"Skipping {job_name}: scheduler lease lost")
+                return
+
+            run = JobRun(job_name=job_name, holder=self.holder_id, started_at=_utcnow(), run_status='running')
+            db.session.add(run)
+            db.session.commit()
+            run_id = run.run_id
+
+            started = time.monotonic()
+            status, error = 'success', None
+            try:
+                func()
+            except Exception as e:
+                db.session.rollback()
+                status, error = 'failed', str(e)
+                logger.error(f"Scheduled job {job_name} failed: {str(e)}")
+
+            db.session.execute(
+                update(JobRun)
+                .where(JobRun.run_id == run_id)
+                .values(
+                    finished_at=_utcnow(),
+                    duration_ms=int((time.monotonic() - started) * 1000),
+                    run_status=status,
+                    error=error,
+                )
+            )
+            db.session.commit()
+
+    @staticmethod
+    def status(limit=50) -> dict:
+        """Current lease holder and the most recent job runs"""
+        lease = db.session.get(SchedulerLease, LEASE_NAME)
+        runs = JobRun.query.order_by(JobRun.started_at.desc()).limit(limit).all()
+        return {
+            "leader": lease.holder if lease and lease.expires_at > _utcnow() else None,
+            "lease_expires_at": lease.expires_at.isoformat() if lease else None,
+            "runs": [
+                {
+                    "id": run.run_id,
+                    "job": run.job_name,
+                    "holder": run.holder,
+                    "started_at": run.started_at.isoformat(),
+                    "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+                    "duration_ms": run.duration_ms,
+                    "status": run.run_status,
+                    "error": run.error,
+                }
+                for run in runs
+            ],
+        }
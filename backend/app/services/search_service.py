@@ -0,0 +1,256 @@
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session, load_only
+from app import db
+from app.models import Book
+
+logger = logging.getLogger(__name__)
+
+# Colonne indexée -> poids dans le score de pertinence
+SEARCH_FIELDS = {
+    'title': 3.0,
+    'author': 2.0,
+    'genre': 1.0,
+    'category': 1.0,
+    'book_description': 0.5,
+}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def fold_text(value: str) -> str:
+    """Lowercase and strip accents ("Misérables" -> "miserables")"""
+    normalized = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in normalized if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(value) -> list:
+    if not value:
+        return []
+    return TOKEN_PATTERN.findall(fold_text(value))
+
+
+class SearchEngine:
+    """Ranked catalog search over SEARCH_FIELDS"""
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list:
+        """Return up to `limit` (book_id, score) pairs, best match first"""
+        raise NotImplementedError
+
+    def mark_stale(self, book_ids) -> None:
+        """Notify the engine that these books were inserted, updated or deleted"""
+
+
+class MySQLFullTextSearchEngine(SearchEngine):
+    """
+    Uses the ft_books_search FULLTEXT index in boolean mode. InnoDB maintains
+    the index on write and the utf8mb4_unicode_ci collation folds accents.
+    """
+    MATCH_CLAUSE = (
+        "MATCH (title, author, genre, category, book_description) "
+        "AGAINST (:query IN BOOLEAN MODE)"
+    )
+
+    def search(self, query, limit, offset=0):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Chaque terme est obligatoire et recherché par préfixe
+        boolean_query = ' '.join(f'+{term}*' for term in terms)
+        rows = db.session.execute(
+            text(
+                f"SELECT book_id, {self.MATCH_CLAUSE} AS score FROM books "
+                f"WHERE {self.MATCH_CLAUSE} "
+                "ORDER BY score DESC, book_id LIMIT :limit OFFSET :offset"
+            ),
+            {'query': boolean_query, 'limit': limit, 'offset': offset},
+        )
+        return [(row.book_id, float(row.score)) for row in rows]
+
+
+class InvertedIndexSearchEngine(SearchEngine):
+    """
+    Pure-Python inverted index, for databases without FULLTEXT support (SQLite
+    in tests). Built lazily from the books table, then kept up to date from
+    the book IDs reported by mark_stale.
+    """
+    LOAD_BATCH_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)   # token -> {book_id: weight}
+        self._documents = {}                 # book_id -> set of tokens
+        self._vocabulary = []                # sorted tokens, for prefix lookups
+        self._stale = set()
+        self._loaded = False
+
+    def mark_stale(self, book_ids):
+        with self._lock:
+            self._stale.update(book_ids)
+
+    def index_book(self, book) -> None:
+        weights = defaultdict(float)
+        for field, weight in SEARCH_FIELDS.items():
+            for token in tokenize(getattr(book, field)):
+                weights[token] += weight
+
+        with self._lock:
+            self.remove_book(book.book_id)
+            for token, weight in weights.items():
+                postings = self._postings[token]
+                if not postings:
+                    bisect.insort(self._vocabulary, token)
+                postings[book.book_id] = weight
+            self._documents[book.book_id] = set(weights)
+
+    def remove_book(self, book_id) -> None:
+        with self._lock:
+            for token in self._documents.pop(book_id, ()):
+                postings = self._postings[token]
+                postings.pop(book_id, None)
+                if not postings:
+                    del self._postings[token]
+                    index = bisect.bisect_left(self._vocabulary, token)
+                    del self._vocabulary[index]
+
+    def _load_books(self, book_ids=None):
+        query = Book.query.options(
+            load_only(Book.book_id, *[getattr(Book, field) for field in SEARCH_FIELDS])
+        )
+        if book_ids is not None:
+            books = query.filter(Book.book_id.in_(book_ids)).all()
+            for book in books:
+                self.index_book(book)
+            for book_id in set(book_ids) - {book.book_id for book in books}:
+                self.remove_book(book_id)
+            return
+
+        last_id = 0
+        while True:
+            books = (
+                query.filter(Book.book_id > last_id)
+                .order_by(Book.book_id)
+                .limit(self.LOAD_BATCH_SIZE)
+                .all()
+            )
+            if not books:
+                break
+            for book in books:
+                self.index_book(book)
+            last_id = books[-1].book_id
+
+    def _refresh(self):
+        with self._lock:
+            if not self._loaded:
+                self._stale.clear()
+                self._load_books()
+                self._loaded = True
+                logger.info(f"Search index built with {len(self._documents)} books")
+            elif self._stale:
+                stale, self._stale = list(self._stale), set()
+                self._load_books(stale)
+
+    def _expand(self, term):
+        """Indexed tokens starting with `term`"""
+        start = bisect.bisect_left(self._vocabulary, term)
+        tokens = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            tokens.append(token)
+        return tokens
+
+    def search(self, query, limit, offset=0):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        self._refresh()
+        with self._lock:
+            document_count = len(self._documents)
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for token in self._expand(term):
+                    postings = self._postings[token]
+                    idf = math.log(1 + document_count / len(postings))
+                    for book_id, weight in postings.items():
+                        term_scores[book_id] += weight * idf
+
+                # Tous les termes doivent correspondre
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        book_id: score + term_scores[book_id]
+                        for book_id, score in scores.items()
+                        if book_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[offset:offset + limit]
+
+
+class SearchService:
+    _engine = None
+
+    @classmethod
+    def get_engine(cls):
+        """
+        Return the search engine for the current database: FULLTEXT on MySQL,
+        the inverted index elsewhere. SEARCH_ENGINE=mysql|memory overrides it.
+        """
+        if cls._engine is None:
+            engine_name = os.getenv('SEARCH_ENGINE') or (
+                'mysql' if db.engine.dialect.name == 'mysql' else 'memory'
+            )
+            if engine_name == 'mysql':
+                cls._engine = MySQLFullTextSearchEngine()
+            else:
+                cls._engine = InvertedIndexSearchEngine()
+        return cls._engine
+
+    @classmethod
+    def set_engine(cls, engine):
+        cls._engine = engine
+
+    @staticmethod
+    def search(query: str, limit: int, offset: int = 0) -> list:
+        return SearchService.get_engine().search(query, limit, offset)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_books(session, flush_context):
+    changed = session.info.setdefault('search_changed_books', set())
+    for book in session.new:
+        if isinstance(book, Book):
+            changed.add(book.book_id)
+    for book in session.deleted:
+        if isinstance(book, Book):
+            changed.add(book.book_id)
+    for book in session.dirty:
+        if isinstance(book, Book) and any(
+            inspect(book).attrs[field].history.has_changes() for field in SEARCH_FIELDS
+        ):
+            changed.add(book.book_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _reindex_changed_books(session):
+    changed = session.info.pop('search_changed_books', None)
+    if changed and SearchService._engine is not None:
+        SearchService._engine.mark_stale(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_books(session):
+    session.info.pop('search_changed_books', None)
@@ -1,4 +1,5 @@
 import os
+import uuid
 import jwt
 from datetime import datetime, timezone
 from flask import current_app
@@ -22,7 +23,8 @@ class TokenService:
             'role': role,
             'type': token_type,
             'exp': expiration,
-            'iat': datetime.now(timezone.utc)
+            'iat': datetime.now(timezone.utc),
+            'jti': uuid.uuid4().hex
         }
 
         return jwt.encode(payload, os.getenv('SECRET_KEY'), algorithm='HS256')
\ No newline at end of file
@@ -0,0 +1,131 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import g, has_request_context
+from sqlalchemy import insert
+from app import app, db
+from app.models import Log
+from config import (
+    AUDIT_LOG_BATCH_SIZE,
+    AUDIT_LOG_ENQUEUE_TIMEOUT_MS,
+    AUDIT_LOG_FLUSH_INTERVAL_MS,
+    AUDIT_LOG_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditLog:
+    """
+    Audit trail written to the logs table off the request path
+
+    record() only enqueues; a background thread bulk-inserts the queue every
+    batch_size records or flush_interval_ms milliseconds. When the queue is
+    full, record() waits up to enqueue_timeout_ms for the writer, then drops
+    the record and counts it, so a slow database never stalls requests.
+    Pending records are written when the process exits.
+    """
+
+    def __init__(self, max_queue_size=AUDIT_LOG_QUEUE_SIZE, batch_size=AUDIT_LOG_BATCH_SIZE,
+                 flush_interval_ms=AUDIT_LOG_FLUSH_INTERVAL_MS,
+                 enqueue_timeout_ms=AUDIT_LOG_ENQUEUE_TIMEOUT_MS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def record(self, action: str, user_id=None, details=None) -> bool:
+        """
+        Queue an audit record; user_id defaults to the authenticated user.
+        Returns False when the record was dropped because the queue stayed full.
+        """
+        if user_id is None and has_request_context():
+            user_id = g.get('user_id')
+        entry = {
+            'user_id': user_id,
+            'log_action': action,
+            'log_details': json.dumps(details, default=str, ensure_ascii=False) if details is not None else None,
+            'action_date': datetime.now(),
+        }
+
+        self._ensure_writer()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Audit log queue full, {self.dropped} records dropped so far")
+            return False
+
+    def _write(self, batch):
+        try:
+            with app.app_context():
+                db.session.execute(insert(Log), batch)
+                db.session.commit()
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error writing {len(batch)} audit records: {str(e)}")
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                entry = None
+
+            if entry is _STOP:
+                if batch:
+                    self._write(batch)
+                return
+            if entry is not None:
+                batch.append(entry)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._write(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def stop(self, timeout=10):
+        """Write the pending records and stop the writer"""
+        thread = self._thread
+        if thread is None:
+            return
+        # Bloquant : le signal d'arrêt doit passer même si la file est pleine
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+audit_log = AuditLog()
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import tempfile
+
+
+class BlobStore:
+    """
+    Content-addressed blob storage interface
+    Blobs are immutable and keyed by the SHA-256 hex digest of their content.
+    """
+
+    @staticmethod
+    def compute_key(data: bytes) -> str:
+        """Return the content address of the given bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    def put(self, data: bytes) -> str:
+        """Store the blob if it is not already present and return its key"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes:
+        """Return the blob content, or None if it does not exist"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def local_path(self, key: str):
+        """
+        Return a filesystem path for the blob when the backend has one, so it
+        can be served with sendfile; None otherwise
+        """
+        return None
+
+
+class FileSystemBlobStore(BlobStore):
+    """Stores blobs on disk under root/ab/cd/<sha256>"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        if len(key) != 64 or not all(c in '0123456789abcdef' for c in key):
+            raise ValueError(f"Invalid blob key: {key}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data: bytes) -> str:
+        key = self.compute_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def get(self, key: str) -> bytes:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as blob_file:
+            return blob_file.read()
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def local_path(self, key: str):
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+
+class MemoryBlobStore(BlobStore):
+    """In-memory backend, useful for tests and throwaway environments"""
+
+    def __init__(self):
+        self.blobs = {}
+
+    def put(self, data: bytes) -> str:
+        key = self.compute_key(data)
+        self.blobs.setdefault(key, bytes(data))
+        return key
+
+    def get(self, key: str) -> bytes:
+        return self.blobs.get(key)
+
+    def exists(self, key: str) -> bool:
+        return key in self.blobs
+
+    def delete(self, key: str) -> None:
+        self.blobs.pop(key, None)
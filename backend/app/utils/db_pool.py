@@ -0,0 +1,68 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool counting checkouts, new connections, waits and timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.connections_created = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self.connections_created += 1
+        return super()._create_connection()
+
+    def _do_get(self):
+        # Pool saturé à l'entrée : la demande devra attendre une connexion libérée
+        saturated = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+
+        with self._stats_lock:
+            self.checkouts += 1
+            if saturated:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+        return connection
+
+    def counters(self):
+        with self._stats_lock:
+            return {
+                "checkouts": self.checkouts,
+                "connections_created": self.connections_created,
+                "waits": self.waits,
+                "wait_time_seconds": round(self.wait_time, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+def pool_stats(engine):
+    """Current state of an engine's connection pool"""
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.counters())
+    return stats
@@ -3,8 +3,8 @@ from functools import wraps
 from flask import request, jsonify, g
 import jwt
 from app import db
-from app.models import User
-from app.utils.token_blacklist import token_blacklist
+from app.utils.token_blacklist import token_blacklist, token_key
+from app.utils.user_status_cache import user_status_cache
 from flask import current_app
 
 def require_auth(optional=False):
@@ -27,9 +27,6 @@ def require_auth(optional=False):
 
             token = auth_header.split(' ')[1]
 
-            if token_blacklist.is_blacklisted(token):
-                return jsonify({'error': 'Token has been revoked'}), 401
-
             try:
                 payload = jwt.decode(
                     token,
@@ -49,8 +46,10 @@ def require_auth(optional=False):
                     return f(*args, **kwargs)
                 return jsonify({'error': 'Invalid token'}), 401
 
-            user = User.query.get(payload['user_id'])
-            if not user or user.user_status != 'actif':
+            if token_blacklist.is_revoked(token_key(token, payload)):
+                return jsonify({'error': 'Token has been revoked'}), 401
+
+            if user_status_cache.get_status(payload['user_id']) != 'actif':
                 if optional:
                     g.user_id = None
                     g.user_role = None
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+from app.utils.interval_tree import IntervalTree
+from config import AVAILABILITY_CACHE_SIZE, AVAILABILITY_CACHE_TTL
+
+_MISSING = object()
+
+
+class IntervalCache:
+    """
+    Interval trees of the most requested books, used by the availability engine
+
+    The least recently used books are evicted beyond `max_size`, so the cache
+    holds the hot books. Entries expire after `ttl` seconds and are dropped
+    explicitly when a borrow or a hold of the book changes in this process;
+    other workers see the change once their entry expires. Borrow creation
+    never reads the cache: it checks overlaps against the database.
+    """
+    def __init__(self, ttl=AVAILABILITY_CACHE_TTL, max_size=AVAILABILITY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_tree(self, book_id, load) -> IntervalTree:
+        """Cached tree of the book, built from load(book_id) on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(book_id, _MISSING)
+            if entry is not _MISSING and entry[1] > now:
+                self._entries.move_to_end(book_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        tree = IntervalTree(load(book_id))
+
+        with self._lock:
+            self._entries[book_id] = (tree, now + self.ttl)
+            self._entries.move_to_end(book_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return tree
+
+    def invalidate(self, book_id):
+        with self._lock:
+            self._entries.pop(book_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "size": len(self._entries),
+                "ttl": self.ttl,
+            }
+
+interval_cache = IntervalCache()
@@ -0,0 +1,49 @@
+class IntervalTree:
+    """
+    Static interval tree over half-open [start, end) intervals
+
+    The intervals are sorted by start and the sorted list is read as a
+    balanced binary search tree (the middle of each range is the node), each
+    node keeping the largest end of its subtree, so overlap queries skip
+    every subtree that ends before the queried range.
+    """
+
+    def __init__(self, intervals):
+        self._items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._max_end = [None] * len(self._items)
+        self._build(0, len(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def _build(self, left, right):
+        if left >= right:
+            return None
+        mid = (left + right) // 2
+        max_end = self._items[mid][1]
+        for child in (self._build(left, mid), self._build(mid + 1, right)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[mid] = max_end
+        return max_end
+
+    def overlapping(self, start, end) -> list:
+        """(start, end, value) items overlapping [start, end), ordered by start"""
+        found = []
+        self._query(0, len(self._items), start, end, found)
+        return found
+
+    def _query(self, left, right, start, end, found):
+        if left >= right:
+            return
+        mid = (left + right) // 2
+        if self._max_end[mid] <= start:
+            return
+        self._query(left, mid, start, end, found)
+        item = self._items[mid]
+        # Les nœuds suivants commencent au plus tôt ici
+        if item[0] >= end:
+            return
+        if item[1] > start:
+            found.append(item)
+        self._query(mid + 1, right, start, end, found)
@@ -0,0 +1,156 @@
+import base64
+import json
+from datetime import date, datetime
+from urllib.parse import urlencode
+from flask import jsonify, request
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    """Raised when the paging parameters of a request are invalid"""
+
+
+def encode_cursor(values):
+    """Encode the keyset values of the last row into an opaque cursor token"""
+    serialized = [
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in values
+    ]
+    raw = json.dumps(serialized, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list):
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+def decode_cursor(token, columns):
+    """
+    Decode a cursor token back into keyset values typed after the given columns
+
+    Raises:
+        PaginationError: If the token is malformed or does not match the keyset
+    """
+    values = _decode_token(token)
+    if len(values) != len(columns):
+        raise PaginationError("Invalid cursor")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            else:
+                value = python_type(value)
+        except (ValueError, TypeError):
+            raise PaginationError("Invalid cursor")
+        decoded.append(value)
+    return decoded
+
+
+def parse_limit(args):
+    """Read the `limit` query parameter, clamped to MAX_PAGE_SIZE"""
+    raw = args.get('limit')
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(args, allowed, default):
+    """
+    Read the `fields` query parameter as a projection over `allowed`
+
+    Returns the requested field names in the order of `allowed`, or `default`
+    when the parameter is absent.
+    """
+    raw = args.get('fields')
+    if not raw:
+        return list(default)
+    requested = {field.strip() for field in raw.split(',') if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in allowed if field in requested]
+
+
+def keyset_paginate(query, columns, args, descending=False):
+    """
+    Apply keyset pagination over `columns` to a query
+
+    The columns must form a unique, totally ordered key (the primary key last).
+    Returns the rows of the page and the cursor of the next page, or None when
+    the page is the last one.
+    """
+    limit = parse_limit(args)
+    cursor = args.get('cursor')
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        clauses = []
+        for i, column in enumerate(columns):
+            equal = [columns[j] == values[j] for j in range(i)]
+            step = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*equal, step))
+        query = query.filter(or_(*clauses))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return rows, next_cursor
+
+
+def parse_offset_page(args):
+    """
+    Read `limit` and an offset-based `cursor`, for results ordered by a computed
+    value (e.g. relevance) that cannot be used as a keyset
+
+    Returns (limit, offset).
+    """
+    limit = parse_limit(args)
+    cursor = args.get('cursor')
+    if not cursor:
+        return limit, 0
+    values = _decode_token(cursor)
+    if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+        raise PaginationError("Invalid cursor")
+    return limit, values[0]
+
+
+def paginated_response(items, next_cursor):
+    """
+    Build a JSON list response carrying the next page cursor in the headers
+
+    The body stays a plain list so existing clients keep working; the cursor is
+    exposed through `X-Next-Cursor` and a `Link: rel="next"` header.
+    """
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
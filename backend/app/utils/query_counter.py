@@ -0,0 +1,84 @@
+import logging
+import threading
+from functools import wraps
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in testing mode when an endpoint issues more queries than declared"""
+
+
+class QueryCounter:
+    """
+    Count the SQL statements executed by the current thread
+    Usable as a context manager; counters can be nested.
+    """
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __enter__(self):
+        if not hasattr(_state, 'counters'):
+            _state.counters = []
+        _state.counters.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _state.counters.remove(self)
+        return False
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_state, 'counters', ()):
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+def init_query_counter(app):
+    """Count the queries of every request and expose them in debug/testing"""
+
+    @app.before_request
+    def start_query_counter():
+        g.query_counter = QueryCounter().__enter__()
+
+    @app.after_request
+    def add_query_count_header(response):
+        counter = g.get('query_counter')
+        if counter is not None and (app.debug or app.testing):
+            response.headers['X-Query-Count'] = str(counter.count)
+        return response
+
+    @app.teardown_request
+    def stop_query_counter(exc):
+        counter = g.pop('query_counter', None)
+        if counter is not None:
+            counter.__exit__(None, None, None)
+
+
+def query_budget(max_queries):
+    """
+    Decorator declaring the maximum number of SQL queries an endpoint may issue
+    Exceeding it is logged, and raises QueryBudgetExceeded when TESTING is on.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with QueryCounter() as counter:
+                response = f(*args, **kwargs)
+
+            if counter.count > max_queries:
+                message = f"{f.__name__} issued {counter.count} queries, budget is {max_queries}"
+                if current_app.testing:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        decorated.query_budget = max_queries
+        return decorated
+    return decorator
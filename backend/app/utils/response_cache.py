@@ -0,0 +1,386 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import jwt
+from flask import current_app, g, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config import (
+    REDIS_URL,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_LOCK_TIMEOUT,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+# En-têtes recalculés à chaque réponse, jamais mis en cache
+SKIPPED_HEADERS = {'content-length', 'etag', 'cache-control', 'set-cookie'}
+# Tables dont une écriture change les réponses étiquetées 'catalog'
+CATALOG_TABLES = frozenset({'book_availability', 'books', 'borrows', 'reservations', 'samples'})
+LOCK_POLL_INTERVAL = 0.05
+
+
+def request_role():
+    """Role of the request's bearer token, None when anonymous or invalid"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        payload = jwt.decode(auth_header.split(' ')[1], os.getenv('SECRET_KEY'), algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    return payload.get('role')
+
+
+def _encode(response) -> bytes:
+    headers = [
+        (name, value) for name, value in response.headers.items()
+        if name.lower() not in SKIPPED_HEADERS
+    ]
+    return json.dumps(headers).encode('utf-8') + b'\n' + response.get_data()
+
+
+def _decode(value: bytes):
+    headers, body = value.split(b'\n', 1)
+    return current_app.response_class(body, status=200, headers=json.loads(headers))
+
+
+class ResponseCacheBackend:
+    """Storage of serialized responses, each indexed under its tags"""
+    is_shared = False
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float, tags) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store the value only if the key is absent; True when stored"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def invalidate(self, tags) -> int:
+        """Drop every entry stored under one of the tags, returning how many"""
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return 0
+
+
+class LocalResponseCacheBackend(ResponseCacheBackend):
+    """In-process LRU bounded by the total size of the stored responses"""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        value, _, tags = self._entries.pop(key)
+        self._bytes -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl, tags):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tuple(tags))
+            self._bytes += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return False
+        self.set(key, value, ttl, ())
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisResponseCacheBackend(ResponseCacheBackend):
+    """
+    Responses shared by all workers in Redis, each tag being a set of keys.
+    Works with any client exposing get(), set(name, value, ex=..., nx=...),
+    delete(), sadd(), smembers() and expire(), so tests can pass a local
+    stand-in.
+    """
+    is_shared = True
+
+    def __init__(self, client, prefix='response_cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(f'{self.prefix}{key}')
+
+    def set(self, key, value, ttl, tags):
+        seconds = max(int(ttl), 1)
+        self.client.set(f'{self.prefix}{key}', value, ex=seconds)
+        for tag in tags:
+            tag_key = f'{self.prefix}tag:{tag}'
+            self.client.sadd(tag_key, key)
+            # Un index de tag ne survit pas aux entrées qu'il référence
+            self.client.expire(tag_key, seconds)
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(f'{self.prefix}{key}', value, ex=max(int(ttl), 1), nx=True))
+
+    def delete(self, key):
+        self.client.delete(f'{self.prefix}{key}')
+
+    def invalidate(self, tags):
+        dropped = 0
+        for tag in tags:
+            tag_key = f'{self.prefix}tag:{tag}'
+            keys = [key.decode('utf-8') if isinstance(key, bytes) else key for key in self.client.smembers(tag_key)]
+            if keys:
+                # Un tag garde les clés déjà supprimées par un autre tag ou expirées
+                dropped += self.client.delete(*[f'{self.prefix}{key}' for key in keys])
+            self.client.delete(tag_key)
+        return dropped
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class ResponseCache:
+    """
+    Cache of GET responses, keyed by path, query string, the caller's role
+    and the table versions read by conditional_get for the request
+
+    Behind conditional_get, a committed write in any process changes the
+    key, so a cached body always matches the ETag it is served with. Entries
+    are also stored under tags (e.g. 'book:12', 'catalog') and dropped by
+    invalidate(); for endpoints without versions, ttl bounds the staleness
+    left by writes of other processes. Concurrent misses for
+    a key compute it once: other requests of the process wait for the first
+    one, and with a shared backend a lock key does the same across workers.
+    """
+
+    def __init__(self, backend=None, ttl=RESPONSE_CACHE_TTL, lock_timeout=RESPONSE_CACHE_LOCK_TIMEOUT):
+        self._backend = backend
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidated = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._create_backend()
+        return self._backend
+
+    @staticmethod
+    def _create_backend():
+        if RESPONSE_CACHE_BACKEND == 'redis':
+            import redis
+            return RedisResponseCacheBackend(redis.Redis.from_url(REDIS_URL))
+        return LocalResponseCacheBackend()
+
+    @staticmethod
+    def request_key() -> str:
+        key = json.dumps(
+            [request.path, sorted(request.args.items(multi=True)), request_role(), g.get('table_versions')],
+            sort_keys=True
+        )
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _wait_for_worker(self, key):
+        """With a shared backend, wait while another worker computes the key"""
+        lock_key = f'lock:{key}'
+        if self.backend.add(lock_key, b'1', self.lock_timeout):
+            return None, lock_key
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = self.backend.get(key)
+            if value is not None:
+                return value, None
+        return None, None
+
+    def get_or_compute(self, key, tags, compute):
+        """
+        Cached value of key, or compute() stored under tags. compute returns
+        the bytes to cache, or None for a result that must not be cached.
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            generation = self._generation
+        if not leader:
+            if flight.done.wait(self.lock_timeout) and flight.value is not None:
+                self.coalesced += 1
+                return flight.value
+            return compute()
+
+        lock_key = None
+        try:
+            if self.backend.is_shared:
+                value, lock_key = self._wait_for_worker(key)
+                if value is not None:
+                    self.coalesced += 1
+                    flight.value = value
+                    return value
+            value = compute()
+            # Une invalidation pendant le calcul rend la valeur potentiellement périmée
+            if value is not None and generation == self._generation:
+                self.backend.set(key, value, self.ttl, tags)
+            flight.value = value
+            return value
+        finally:
+            if lock_key is not None:
+                self.backend.delete(lock_key)
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self, *tags) -> None:
+        """Drop the entries stored under the tags; errors are logged, not raised"""
+        with self._lock:
+            self._generation += 1
+        try:
+            self.invalidated += self.backend.invalidate(tags)
+        except Exception as e:
+            logger.error(f"Error invalidating cached responses {list(tags)}: {str(e)}")
+
+    @staticmethod
+    def invalidate_on_commit(session, *tags) -> None:
+        """Drop the entries stored under the tags once the session's transaction commits"""
+        session.info.setdefault('response_cache_tags', set()).update(tags)
+
+    def invalidate_tables(self, tables) -> None:
+        """Drop the entries whose content depends on the written tables"""
+        if CATALOG_TABLES & set(tables):
+            self.invalidate('catalog')
+
+    def cached(self, *tags):
+        """
+        Decorator caching the 200 responses of a GET endpoint under tags,
+        formatted with the view arguments (e.g. 'book:{id}'). Placed under
+        conditional_get, the key includes the versions it read.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                if request.method != 'GET':
+                    return f(*args, **kwargs)
+                response = None
+                computing = False
+
+                def compute():
+                    nonlocal response, computing
+                    computing = True
+                    response = make_response(f(*args, **kwargs))
+                    return _encode(response) if response.status_code == 200 else None
+
+                try:
+                    value = self.get_or_compute(
+                        self.request_key(), [tag.format(**kwargs) for tag in tags], compute
+                    )
+                except Exception as e:
+                    if computing and response is None:
+                        raise
+                    # Panne du stockage : la réponse est servie sans cache
+                    logger.error(f"Response cache unavailable: {str(e)}")
+                    return response if response is not None else f(*args, **kwargs)
+                if response is not None:
+                    response.headers['X-Cache'] = 'MISS'
+                    return response
+                cached_response = _decode(value)
+                cached_response.headers['X-Cache'] = 'HIT'
+                return cached_response
+            return decorated
+        return decorator
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "coalesced": self.coalesced,
+            "invalidated": self.invalidated,
+        }
+
+response_cache = ResponseCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tags(session):
+    tags = session.info.pop('response_cache_tags', None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_tags(session):
+    session.info.pop('response_cache_tags', None)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import re
+from functools import wraps
+from flask import current_app, g, make_response, request
+from sqlalchemy import event, insert
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models import TableVersion
+from app.utils.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Tables dont les lectures sont servies avec un ETag
+VERSIONED_TABLES = frozenset({'book_availability', 'books', 'borrows', 'samples', 'users'})
+# Table écrite par une requête text()
+RAW_WRITE_PATTERN = re.compile(
+    r'^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+IGNORE)?|DELETE\s+FROM)\s+`?(\w+)',
+    re.IGNORECASE
+)
+
+
+def current_versions(tables) -> dict:
+    """Write counters of the tables, 0 for a table never written"""
+    versions = dict(
+        db.session.query(TableVersion.table_name, TableVersion.version)
+        .filter(TableVersion.table_name.in_(tables))
+        .all()
+    )
+    return {table: versions.get(table, 0) for table in tables}
+
+
+def bump_versions(connection, tables) -> None:
+    """Increment the tables' counters on connection"""
+    rows = [{'table_name': table, 'version': 1} for table in sorted(tables)]
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(TableVersion).on_duplicate_key_update(version=TableVersion.version + 1)
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(TableVersion).on_conflict_do_update(
+            index_elements=['table_name'], set_={'version': TableVersion.version + 1}
+        )
+    else:
+        statement = insert(TableVersion)
+    connection.execute(statement, rows)
+
+
+def mark_changed(session, *tables) -> None:
+    """
+    Record writes the session cannot see (e.g. on another connection), so
+    the tables' counters are bumped when it commits
+    """
+    _changed_tables(session).update(tables)
+
+
+def _weak_etag(tables, versions) -> str:
+    key = json.dumps(
+        [request.path, sorted(request.args.items(multi=True)), [versions[table] for table in tables]]
+    )
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_get(*tables):
+    """
+    Decorator serving a GET endpoint with a weak ETag built from the write
+    counters of the tables it reads and the query string. When the client's
+    If-None-Match matches, a 304 is returned without calling the endpoint.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                # Lu avant les données : une écriture concurrente change l'ETag suivant
+                versions = current_versions(tables)
+                etag = _weak_etag(tables, versions)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error reading table versions: {str(e)}")
+                return f(*args, **kwargs)
+
+            # Clé du cache de réponses : un corps en cache correspond toujours à son ETag
+            g.table_versions = versions
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+def _changed_tables(session) -> set:
+    return session.info.setdefault('versioned_tables_changed', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    changed = _changed_tables(session)
+    for instance in list(session.new) + list(session.deleted):
+        changed.add(instance.__table__.name)
+    for instance in session.dirty:
+        if session.is_modified(instance):
+            changed.add(instance.__table__.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_tables(orm_execute_state):
+    # Écritures en masse (update(), insert(), delete()) qui ne passent pas par le flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _changed_tables(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+    elif isinstance(orm_execute_state.statement, TextClause):
+        match = RAW_WRITE_PATTERN.match(orm_execute_state.statement.text)
+        if match:
+            _changed_tables(orm_execute_state.session).add(match.group(1).lower())
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_changed_tables(session):
+    changed = session.info.pop('versioned_tables_changed', None)
+    if not changed:
+        return
+    tables = changed & VERSIONED_TABLES
+    if tables:
+        try:
+            # Transaction courte, après le commit : les lignes de compteurs ne sont
+            # verrouillées que le temps de l'upsert, pas pendant toute l'écriture
+            with session.get_bind().begin() as connection:
+                bump_versions(connection, tables)
+        except Exception as e:
+            logger.error(f"Error bumping table versions {sorted(tables)}: {str(e)}")
+    response_cache.invalidate_tables(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('versioned_tables_changed', None)
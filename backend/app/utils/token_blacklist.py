@@ -1,17 +1,292 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import jwt
+from app import db
+from app.models import RevokedToken
+from config import (
+    REDIS_URL,
+    TOKEN_REVOCATION_BACKEND,
+    TOKEN_REVOCATION_CACHE_SIZE,
+    TOKEN_REVOCATION_REBUILD_INTERVAL,
+    TOKEN_REVOCATION_SYNC_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Recouvrement des synchros incrémentales : décalage d'horloge entre workers
+# et transactions commitées après leur revoked_at
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def token_key(token, payload):
+    """Revocation key of a token: its jti, or a digest for tokens issued without one"""
+    return payload.get('jti') or hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter: no false negatives, ~error_rate false positives"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, key):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(key))
+
+
+class RevocationBackend:
+    """Shared storage of revoked token ids, each kept until the token expires"""
+
+    def revoke(self, jti: str, expires_at: datetime) -> None:
+        raise NotImplementedError
+
+    def is_revoked(self, jti: str) -> bool:
+        raise NotImplementedError
+
+    def active_jtis(self) -> list:
+        """All token ids currently revoked and not yet expired"""
+        raise NotImplementedError
+
+    def revoked_since(self, since: datetime) -> list:
+        """Token ids revoked at or after since (UTC) and not yet expired"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Delete expired entries, returning how many were removed"""
+        return 0
+
+
+class SQLRevocationBackend(RevocationBackend):
+    """Stores revocations in the revoked_tokens table"""
+    PURGE_INTERVAL = 300
+
+    def __init__(self):
+        self._last_purge = 0.0
+
+    def revoke(self, jti, expires_at):
+        if not db.session.get(RevokedToken, jti):
+            db.session.add(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=_utcnow()))
+        db.session.commit()
+
+        if time.monotonic() - self._last_purge > self.PURGE_INTERVAL:
+            self.purge_expired()
+
+    def is_revoked(self, jti):
+        return db.session.query(
+            RevokedToken.query.filter(
+                RevokedToken.jti == jti,
+                RevokedToken.expires_at > _utcnow(),
+            ).exists()
+        ).scalar()
+
+    def active_jtis(self):
+        rows = db.session.query(RevokedToken.jti).filter(RevokedToken.expires_at > _utcnow()).all()
+        return [jti for jti, in rows]
+
+    def revoked_since(self, since):
+        rows = db.session.query(RevokedToken.jti).filter(
+            RevokedToken.revoked_at >= since,
+            RevokedToken.expires_at > _utcnow(),
+        ).all()
+        return [jti for jti, in rows]
+
+    def purge_expired(self):
+        self._last_purge = time.monotonic()
+        try:
+            deleted = RevokedToken.query.filter(
+                RevokedToken.expires_at <= _utcnow()
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error purging revoked tokens: {str(e)}")
+            return 0
+        if deleted:
+            logger.info(f"Purged {deleted} expired revoked tokens")
+        return deleted
+
+
+class RedisRevocationBackend(RevocationBackend):
+    """
+    Stores revocations as Redis keys expiring with the token, plus a sorted
+    set of recent revocations scored by time for incremental syncs. Works
+    with any client exposing set(name, value, ex=...), exists(),
+    scan_iter(match=...), zadd(), zrangebyscore() and zremrangebyscore()
+    """
+
+    def __init__(self, client, prefix='revoked_token:', log_retention=2 * TOKEN_REVOCATION_REBUILD_INTERVAL):
+        self.client = client
+        self.prefix = prefix
+        # Hors du préfixe : scan_iter ne le prend pas pour une révocation
+        self.log_key = f"{prefix.rstrip(':')}_log"
+        self.log_retention = log_retention
+
+    def revoke(self, jti, expires_at):
+        ttl = int((expires_at - _utcnow()).total_seconds())
+        if ttl > 0:
+            now = time.time()
+            self.client.set(f'{self.prefix}{jti}', 1, ex=ttl)
+            self.client.zadd(self.log_key, {jti: now})
+            # Le journal ne sert qu'entre deux reconstructions complètes
+            self.client.zremrangebyscore(self.log_key, 0, now - self.log_retention)
+
+    def is_revoked(self, jti):
+        return bool(self.client.exists(f'{self.prefix}{jti}'))
+
+    def active_jtis(self):
+        jtis = []
+        for key in self.client.scan_iter(match=f'{self.prefix}*'):
+            if isinstance(key, bytes):
+                key = key.decode('utf-8')
+            jtis.append(key[len(self.prefix):])
+        return jtis
+
+    def revoked_since(self, since):
+        members = self.client.zrangebyscore(self.log_key, since.replace(tzinfo=timezone.utc).timestamp(), '+inf')
+        return [jti.decode('utf-8') if isinstance(jti, bytes) else jti for jti in members]
+
+
 class TokenBlacklist:
     """
-    Simple in-memory token blacklist
-    Note: In production, use a persistent storage like Redis
+    Token revocation list shared by all workers through a RevocationBackend
+
+    A local Bloom filter answers the common "not revoked" case without a
+    network hop; tokens it may contain are confirmed through an LRU of known
+    revocations, then the backend. Every sync_interval seconds the filter
+    only reads the revocations made since the previous sync, so a revocation
+    made on another worker is seen locally within sync_interval. It is
+    rebuilt from all active revocations every rebuild_interval seconds, or
+    sooner when it fills up, to drop expired tokens.
     """
-    def __init__(self):
-        self.blacklisted_tokens = set()
+
+    def __init__(self, backend=None, sync_interval=TOKEN_REVOCATION_SYNC_INTERVAL,
+                 cache_size=TOKEN_REVOCATION_CACHE_SIZE, rebuild_interval=TOKEN_REVOCATION_REBUILD_INTERVAL):
+        self._backend = backend
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._revoked_cache = OrderedDict()
+        self._bloom = None
+        self._bloom_capacity = 0
+        self._bloom_count = 0
+        self._bloom_built_at = 0.0
+        self._bloom_synced_at = 0.0
+        self._synced_until = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._create_backend()
+        return self._backend
+
+    @staticmethod
+    def _create_backend():
+        if TOKEN_REVOCATION_BACKEND == 'redis':
+            import redis
+            return RedisRevocationBackend(redis.Redis.from_url(REDIS_URL))
+        return SQLRevocationBackend()
+
+    def _remember(self, jti, expires_at):
+        self._revoked_cache[jti] = expires_at
+        self._revoked_cache.move_to_end(jti)
+        while len(self._revoked_cache) > self.cache_size:
+            self._revoked_cache.popitem(last=False)
+
+    def _rebuild_bloom(self):
+        synced_until = _utcnow()
+        jtis = self.backend.active_jtis()
+        capacity = max(len(jtis) * 2, 1024)
+        bloom = BloomFilter(capacity=capacity)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            for jti in self._revoked_cache:
+                bloom.add(jti)
+            self._bloom = bloom
+            self._bloom_capacity = capacity
+            self._bloom_count = len(jtis)
+            self._bloom_built_at = self._bloom_synced_at = time.monotonic()
+            self._synced_until = synced_until
+
+    def _sync_bloom(self):
+        now = time.monotonic()
+        if self._bloom is not None and now - self._bloom_synced_at < self.sync_interval:
+            return
+        if (self._bloom is None or now - self._bloom_built_at >= self.rebuild_interval
+                or self._bloom_count >= self._bloom_capacity):
+            self._rebuild_bloom()
+            return
+
+        synced_until = _utcnow()
+        jtis = self.backend.revoked_since(self._synced_until - SYNC_OVERLAP)
+        with self._lock:
+            for jti in jtis:
+                if jti not in self._bloom:
+                    self._bloom.add(jti)
+                    self._bloom_count += 1
+            self._bloom_synced_at = time.monotonic()
+            self._synced_until = synced_until
+
+    def revoke(self, jti, expires_at: datetime):
+        self.backend.revoke(jti, expires_at)
+        with self._lock:
+            self._remember(jti, expires_at)
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def is_revoked(self, jti) -> bool:
+        try:
+            self._sync_bloom()
+        except Exception as e:
+            logger.error(f"Error syncing token revocations: {str(e)}")
+            return self.backend.is_revoked(jti)
+
+        with self._lock:
+            if jti not in self._bloom:
+                return False
+            expires_at = self._revoked_cache.get(jti)
+            if expires_at is not None:
+                if expires_at > _utcnow():
+                    self._revoked_cache.move_to_end(jti)
+                    return True
+                del self._revoked_cache[jti]
+
+        return self.backend.is_revoked(jti)
 
     def blacklist_token(self, token):
-        """Add token to blacklist"""
-        self.blacklisted_tokens.add(token)
+        """Revoke a token until its expiration"""
+        payload = jwt.decode(token, options={'verify_signature': False, 'verify_exp': False})
+        expires_at = datetime.fromtimestamp(payload['exp'], timezone.utc).replace(tzinfo=None)
+        self.revoke(token_key(token, payload), expires_at)
 
     def is_blacklisted(self, token):
         """Check if token is blacklisted"""
-        return token in self.blacklisted_tokens
+        try:
+            payload = jwt.decode(token, options={'verify_signature': False, 'verify_exp': False})
+        except jwt.InvalidTokenError:
+            return False
+        return self.is_revoked(token_key(token, payload))
 
-token_blacklist = TokenBlacklist()
\ No newline at end of file
+token_blacklist = TokenBlacklist()
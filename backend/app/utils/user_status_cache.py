@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+from app.models import User
+from config import USER_STATUS_CACHE_SIZE, USER_STATUS_CACHE_TTL
+
+_MISSING = object()
+
+
+class UserStatusCache:
+    """
+    Short-lived cache of users.user_status, used by require_auth
+
+    Entries expire after `ttl` seconds and are dropped explicitly when a status
+    changes or a user is deleted in this process; other workers see the change
+    once their entry expires.
+    """
+    def __init__(self, ttl=USER_STATUS_CACHE_TTL, max_size=USER_STATUS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_status(self, user_id):
+        """Return the user's status, or None if the user does not exist"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id, _MISSING)
+            if entry is not _MISSING and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        row = User.query.with_entities(User.user_status).filter_by(user_id=user_id).first()
+        status = row.user_status if row else None
+
+        with self._lock:
+            self._entries[user_id] = (status, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return status
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "size": len(self._entries),
+                "ttl": self.ttl,
+            }
+
+user_status_cache = UserStatusCache()
@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from urllib.parse import quote_plus
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,10 +15,105 @@ MYSQL_HOST = os.getenv('MYSQL_HOST')
 MYSQL_PORT = os.getenv('MYSQL_PORT', '3306')
 MYSQL_DATABASE = os.getenv('MYSQL_DATABASE')
 
-SQLALCHEMY_DATABASE_URI = f'mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}'
+SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or (
+    f'mysql+pymysql://{quote_plus(MYSQL_USER or "")}:{quote_plus(MYSQL_PASSWORD or "")}'
+    f'@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}'
+)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Pool de connexions ; DB_POOL_RECYCLE doit rester inférieur au wait_timeout de MySQL
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_pre_ping': DB_POOL_PRE_PING,
+    'pool_recycle': DB_POOL_RECYCLE,
+}
+if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS.update({
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+    })
+
 PORT = int(os.getenv('FLASK_PORT', 5000))
 
 JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
-JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=7)
\ No newline at end of file
+JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=7)
+
+COVER_STORE_DIR = os.getenv('COVER_STORE_DIR', os.path.join(basedir, 'storage', 'covers'))
+COVER_CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Révocation des tokens : 'sql' (table revoked_tokens) ou 'redis'
+TOKEN_REVOCATION_BACKEND = os.getenv('TOKEN_REVOCATION_BACKEND', 'sql')
+TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', 5))
+TOKEN_REVOCATION_CACHE_SIZE = int(os.getenv('TOKEN_REVOCATION_CACHE_SIZE', 10000))
+# Reconstruction complète du filtre de Bloom (les synchros intermédiaires ne lisent que les nouvelles révocations)
+TOKEN_REVOCATION_REBUILD_INTERVAL = float(os.getenv('TOKEN_REVOCATION_REBUILD_INTERVAL', 3600))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+USER_STATUS_CACHE_TTL = float(os.getenv('USER_STATUS_CACHE_TTL', 30))
+USER_STATUS_CACHE_SIZE = int(os.getenv('USER_STATUS_CACHE_SIZE', 10000))
+
+# Flux SSE des notifications : 'local' (un seul processus) ou 'redis'
+NOTIFICATION_HUB_BACKEND = os.getenv('NOTIFICATION_HUB_BACKEND', 'local')
+NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', 100))
+NOTIFICATION_HEARTBEAT_INTERVAL = float(os.getenv('NOTIFICATION_HEARTBEAT_INTERVAL', 15))
+# Serveur asyncio des flux (flask serve-notifications)
+NOTIFICATION_SERVER_PORT = int(os.getenv('NOTIFICATION_SERVER_PORT', 5001))
+# Avec le backend 'local', intervalle de lecture des nouvelles notifications en base
+NOTIFICATION_POLL_INTERVAL = float(os.getenv('NOTIFICATION_POLL_INTERVAL', 2))
+
+# Planificateur : un seul processus (le détenteur du bail en base) exécute les tâches
+SCHEDULER_EMBEDDED = os.getenv('SCHEDULER_EMBEDDED', '1') == '1'
+SCHEDULER_LEASE_TTL = float(os.getenv('SCHEDULER_LEASE_TTL', 60))
+SCHEDULER_RENEW_INTERVAL = float(os.getenv('SCHEDULER_RENEW_INTERVAL', 20))
+# Retard maximal (secondes) d'une exécution manquée pour qu'elle soit rattrapée, vide = sans limite
+SCHEDULER_MISFIRE_GRACE_TIME = int(os.getenv('SCHEDULER_MISFIRE_GRACE_TIME')) if os.getenv('SCHEDULER_MISFIRE_GRACE_TIME') else None
+
+# Mode digest : une seule notification par membre et par exécution des rappels
+NOTIFICATION_DIGEST = os.getenv('NOTIFICATION_DIGEST', '0') == '1'
+
+# Rétention : âge (jours) au-delà duquel les notifications lues sont archivées
+NOTIFICATION_RETENTION_DAYS = {
+    'date_echeance': int(os.getenv('NOTIFICATION_RETENTION_DAYS_DATE_ECHEANCE', 30)),
+    'rappel_emprunt': int(os.getenv('NOTIFICATION_RETENTION_DAYS_RAPPEL_EMPRUNT', 90)),
+    'nouvelle_reservation': int(os.getenv('NOTIFICATION_RETENTION_DAYS_NOUVELLE_RESERVATION', 30)),
+}
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 365))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 1000))
+# Partitions mensuelles de logs créées à l'avance (si la table est partitionnée)
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv('LOG_PARTITION_MONTHS_AHEAD', 3))
+
+# Journal d'audit (table logs) : écrit par lots depuis un thread dédié
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv('AUDIT_LOG_QUEUE_SIZE', 10000))
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', 200))
+AUDIT_LOG_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_LOG_FLUSH_INTERVAL_MS', 500))
+# Attente maximale d'une requête quand la file est pleine, avant abandon de l'entrée
+AUDIT_LOG_ENQUEUE_TIMEOUT_MS = int(os.getenv('AUDIT_LOG_ENQUEUE_TIMEOUT_MS', 50))
+
+# Durée (jours) d'un emprunt enregistré au guichet sans date de fin
+BORROW_DEFAULT_DAYS = int(os.getenv('BORROW_DEFAULT_DAYS', 21))
+
+# Durée (jours) pendant laquelle un exemplaire reste réservé au membre en tête de file
+RESERVATION_HOLD_DAYS = int(os.getenv('RESERVATION_HOLD_DAYS', 3))
+
+# Moteur de disponibilités : arbres d'intervalles des livres les plus consultés
+AVAILABILITY_CACHE_TTL = float(os.getenv('AVAILABILITY_CACHE_TTL', 30))
+AVAILABILITY_CACHE_SIZE = int(os.getenv('AVAILABILITY_CACHE_SIZE', 1000))
+# Fenêtre par défaut et fenêtre maximale (jours) de GET /livres/<id>/disponibilites
+AVAILABILITY_DEFAULT_WINDOW_DAYS = int(os.getenv('AVAILABILITY_DEFAULT_WINDOW_DAYS', 30))
+AVAILABILITY_MAX_WINDOW_DAYS = int(os.getenv('AVAILABILITY_MAX_WINDOW_DAYS', 366))
+
+# Inventaire : exemplaires lus, comparés et mis à jour par lot
+INVENTORY_BATCH_SIZE = int(os.getenv('INVENTORY_BATCH_SIZE', 1000))
+
+# Cache des réponses GET du catalogue et des exemplaires : 'local' (LRU par processus) ou 'redis'
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'local')
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 60))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Attente maximale (secondes) d'une requête pendant qu'une autre calcule la même réponse
+RESPONSE_CACHE_LOCK_TIMEOUT = float(os.getenv('RESPONSE_CACHE_LOCK_TIMEOUT', 5))
@@ -21,8 +21,40 @@ CREATE TABLE IF NOT EXISTS books (
     release_date DATE,
     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     cover_image MEDIUMTEXT,
+    cover_hash CHAR(64),
     INDEX index_books_title (title),
-    INDEX index_books_author (author)
+    INDEX index_books_author (author),
+    INDEX index_books_genre (genre),
+    INDEX index_books_category (category),
+    FULLTEXT INDEX ft_books_search (title, author, genre, category, book_description)
+);
+
+CREATE TABLE IF NOT EXISTS cover_variants (
+    book_id BIGINT NOT NULL,
+    size_name VARCHAR(20) NOT NULL,
+    image_format VARCHAR(10) NOT NULL,
+    source_hash CHAR(64) NOT NULL,
+    blob_hash CHAR(64) NOT NULL,
+    width INT NOT NULL,
+    height INT NOT NULL,
+    PRIMARY KEY (book_id, size_name, image_format),
+    CONSTRAINT fk_cover_variants_books
+        FOREIGN KEY (book_id)
+        REFERENCES books(book_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS book_availability (
+    book_id BIGINT PRIMARY KEY,
+    total_samples INT NOT NULL DEFAULT 0,
+    available_samples INT NOT NULL DEFAULT 0,
+    INDEX index_book_availability_available (available_samples),
+    CONSTRAINT fk_book_availability_books
+        FOREIGN KEY (book_id)
+        REFERENCES books(book_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS samples (
@@ -33,6 +65,8 @@ CREATE TABLE IF NOT EXISTS samples (
     procurement_date DATE,
     localization VARCHAR(100),
     INDEX index_sample_status (sample_status),
+    INDEX index_samples_book_status (book_id, sample_status),
+    INDEX index_samples_localization (localization),
     CONSTRAINT fk_samples_books 
         FOREIGN KEY (book_id) 
         REFERENCES books(book_id)
@@ -52,6 +86,7 @@ CREATE TABLE IF NOT EXISTS borrows (
     approved_by BIGINT,
     INDEX index_user_borrows (user_id),
     INDEX index_borrow_status (borrow_status),
+    INDEX index_borrows_sample_dates (sample_id, begin_date, end_date),
     CONSTRAINT fk_borrows_users
         FOREIGN KEY (user_id)
         REFERENCES users(user_id)
@@ -73,9 +108,12 @@ CREATE TABLE IF NOT EXISTS reservations (
     reservation_id BIGINT AUTO_INCREMENT PRIMARY KEY,
     user_id BIGINT,
     book_id BIGINT,
+    sample_id BIGINT NULL,
     borrowed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    reservation_status ENUM('active', 'confirmée', 'annulée', 'expirée') NOT NULL,
-    expiration_date TIMESTAMP,
+    reservation_status ENUM('active', 'confirmée', 'annulée', 'expirée', 'honorée') NOT NULL,
+    expiration_date TIMESTAMP NULL,
+    INDEX index_reservations_queue (book_id, reservation_status, reservation_id),
+    INDEX index_reservations_expiration (reservation_status, expiration_date),
     CONSTRAINT fk_reservations_users
         FOREIGN KEY (user_id)
         REFERENCES users(user_id)
@@ -85,20 +123,57 @@ CREATE TABLE IF NOT EXISTS reservations (
         FOREIGN KEY (book_id)
         REFERENCES books(book_id)
         ON DELETE RESTRICT
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_reservations_samples
+        FOREIGN KEY (sample_id)
+        REFERENCES samples(sample_id)
+        ON DELETE SET NULL
         ON UPDATE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS notifications (
     notification_id BIGINT AUTO_INCREMENT PRIMARY KEY,
     user_id BIGINT,
+    borrow_id BIGINT NULL,
+    reservation_id BIGINT NULL,
     notification_type ENUM('rappel_emprunt', 'nouvelle_reservation', 'date_echeance') NOT NULL,
     notification_message TEXT NOT NULL,
     creation_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    notification_day DATE NULL,
     viewed BOOLEAN DEFAULT FALSE,
     CONSTRAINT fk_notifications_users
         FOREIGN KEY (user_id)
         REFERENCES users(user_id)
         ON DELETE RESTRICT
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_notifications_borrows
+        FOREIGN KEY (borrow_id)
+        REFERENCES borrows(borrow_id)
+        ON DELETE SET NULL
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_notifications_reservations
+        FOREIGN KEY (reservation_id)
+        REFERENCES reservations(reservation_id)
+        ON DELETE SET NULL
+        ON UPDATE CASCADE,
+    UNIQUE KEY uq_notifications_type_borrow_day (notification_type, borrow_id, notification_day),
+    INDEX index_notifications_user_viewed_date (user_id, viewed, creation_date)
+);
+
+CREATE TABLE IF NOT EXISTS notification_borrows (
+    notification_id BIGINT NOT NULL,
+    borrow_id BIGINT NOT NULL,
+    PRIMARY KEY (notification_id, borrow_id),
+    INDEX index_notification_borrows_borrow (borrow_id),
+    CONSTRAINT fk_notification_borrows_notifications
+        FOREIGN KEY (notification_id)
+        REFERENCES notifications(notification_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE,
+    CONSTRAINT fk_notification_borrows_borrows
+        FOREIGN KEY (borrow_id)
+        REFERENCES borrows(borrow_id)
+        ON DELETE CASCADE
         ON UPDATE CASCADE
 );
 
@@ -111,6 +186,48 @@ CREATE TABLE IF NOT EXISTS logs (
     CONSTRAINT fk_logs_users
         FOREIGN KEY (user_id)
         REFERENCES users(user_id)
-        ON DELETE RESTRICT
+        ON DELETE SET NULL
         ON UPDATE CASCADE
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at DATETIME NOT NULL,
+    revoked_at DATETIME NOT NULL,
+    INDEX index_revoked_tokens_expires_at (expires_at),
+    INDEX index_revoked_tokens_revoked_at (revoked_at)
+);
+
+CREATE TABLE IF NOT EXISTS archive_batches (
+    batch_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    source_table VARCHAR(64) NOT NULL,
+    first_id BIGINT NOT NULL,
+    last_id BIGINT NOT NULL,
+    row_count INT NOT NULL,
+    archived_at DATETIME NOT NULL,
+    payload LONGBLOB NOT NULL,
+    INDEX index_archive_batches_source (source_table, last_id)
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    lease_name VARCHAR(100) PRIMARY KEY,
+    holder VARCHAR(255) NOT NULL,
+    expires_at DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_job_runs (
+    run_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    job_name VARCHAR(100) NOT NULL,
+    holder VARCHAR(255) NOT NULL,
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    duration_ms INT NULL,
+    run_status ENUM('running', 'success', 'failed') NOT NULL,
+    error TEXT,
+    INDEX index_job_runs_name_started (job_name, started_at)
+);
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL
+);
@@ -1,4 +1,5 @@
-from app import app
+from app import app, init_scheduler
+import config
 import os
 from dotenv import load_dotenv
 
@@ -6,4 +7,6 @@ load_dotenv()
 
 if __name__ == "__main__":
     port = int(os.getenv('FLASK_PORT', 5000))
+    if config.SCHEDULER_EMBEDDED:
+        init_scheduler()
     app.run(debug=True, port=port)
\ No newline at end of file
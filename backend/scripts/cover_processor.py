@@ -1,12 +1,75 @@
+import hashlib
+import io
 import os
-import base64
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from flask import current_app
+from PIL import Image
+from sqlalchemy import func
 from app import db
-from app.models import Book
+from app.models import Book, CoverVariant
+from app.services.cover_service import COVER_FORMATS, COVER_SIZES, CoverService
 
-def process_book_covers():
+MAX_COVER_SIZE = 16 * 1024 * 1024
+VARIANT_QUALITY = {
+    'webp': 80,
+    'jpeg': 85,
+}
+
+
+def build_cover_variants(book_id, image_path, known_hash):
+    """
+    Worker: hash a cover file and render its resized variants
+
+    Runs in a separate process, without app context. The variants are skipped
+    when the source hash equals `known_hash` (already processed on a previous run).
+    """
+    with open(image_path, 'rb') as image_file:
+        binary_data = image_file.read()
+
+    source_hash = hashlib.sha256(binary_data).hexdigest()
+    if source_hash == known_hash:
+        return {'book_id': book_id, 'source_hash': source_hash, 'skipped': True, 'variants': []}
+
+    variants = []
+    with Image.open(io.BytesIO(binary_data)) as image:
+        image.load()
+        for size_name, max_width in COVER_SIZES.items():
+            resized = image.copy()
+            # Les couvertures sont au format portrait, on borne la hauteur à 1.5x la largeur
+            resized.thumbnail((max_width, int(max_width * 1.5)), Image.LANCZOS)
+            for image_format in COVER_FORMATS:
+                output = io.BytesIO()
+                if image_format == 'jpeg':
+                    resized.convert('RGB').save(
+                        output, 'JPEG', quality=VARIANT_QUALITY['jpeg'], optimize=True, progressive=True
+                    )
+                else:
+                    resized.save(output, 'WEBP', quality=VARIANT_QUALITY['webp'], method=4)
+                variants.append((size_name, image_format, output.getvalue(), resized.width, resized.height))
+
+    return {'book_id': book_id, 'source_hash': source_hash, 'skipped': False, 'variants': variants}
+
+
+def _processed_hashes(book_ids):
+    """Map book_id -> cover_hash for books whose variants are all up to date"""
+    expected = len(COVER_SIZES) * len(COVER_FORMATS)
+    rows = (
+        db.session.query(Book.book_id, Book.cover_hash)
+        .join(CoverVariant, db.and_(
+            CoverVariant.book_id == Book.book_id,
+            CoverVariant.source_hash == Book.cover_hash,
+        ))
+        .filter(Book.book_id.in_(book_ids))
+        .group_by(Book.book_id, Book.cover_hash)
+        .having(func.count() == expected)
+        .all()
+    )
+    return {book_id: cover_hash for book_id, cover_hash in rows}
+
+
+def process_book_covers(max_workers=None):
     """Process and update book covers from PNG and JPEG/JPG files"""
-    
+
     basedir = os.path.dirname(current_app.root_path)
     covers_dir = os.path.join(basedir, 'covers')
 
@@ -25,7 +88,7 @@ def process_book_covers():
 
     valid_extensions = ('.png', '.jpg', '.jpeg')
     files = [f for f in os.listdir(covers_dir) if f.lower().endswith(valid_extensions)]
-    
+
     if not files:
         print(f"\nNo image files found in covers directory: {covers_dir}")
         print("\nPlease add your book cover images using the format:")
@@ -37,48 +100,58 @@ def process_book_covers():
         print("\nProcessing book covers...")
         print("-" * 40)
 
+        paths = {}
         for filename in files:
             try:
                 book_id = int(os.path.splitext(filename)[0])
-                image_path = os.path.join(covers_dir, filename)
-                
-                print(f"Processing {filename} for book ID {book_id}")
-                
-                file_size = os.path.getsize(image_path)
-                if file_size > 16 * 1024 * 1024:
-                    print(f"Image {filename} is too large (max 16MB), skipping...")
-                    continue
-
-                try:
-                    with open(image_path, 'rb') as image_file:
-                        binary_data = image_file.read()
-                        base64_data = base64.b64encode(binary_data).decode('utf-8')
-                except IOError as e:
-                    print(f"Error reading file {filename}: {str(e)}")
-                    continue
-
-                book = Book.query.get(book_id)
-                if not book:
-                    print(f"Book with ID {book_id} not found, skipping...")
-                    continue
-
-                book.cover_image = base64_data
-                db.session.commit()
-                print(f"Successfully updated cover for book: {book.title}")
-
             except ValueError as e:
                 print(f"Error processing {filename}: {str(e)}")
                 continue
-            except Exception as e:
-                print(f"Error updating cover for {filename}: {str(e)}")
-                db.session.rollback()
+
+            image_path = os.path.join(covers_dir, filename)
+            if os.path.getsize(image_path) > MAX_COVER_SIZE:
+                print(f"Image {filename} is too large (max 16MB), skipping...")
                 continue
+            paths[book_id] = image_path
+
+        books = {book.book_id: book for book in Book.query.filter(Book.book_id.in_(paths)).all()}
+        for book_id in sorted(set(paths) - set(books)):
+            print(f"Book with ID {book_id} not found, skipping...")
+
+        known_hashes = _processed_hashes(list(books))
+        updated = 0
+        skipped = 0
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(build_cover_variants, book_id, paths[book_id], known_hashes.get(book_id)): book_id
+                for book_id in books
+            }
+
+            for future in as_completed(futures):
+                book = books[futures[future]]
+                filename = os.path.basename(paths[book.book_id])
+                try:
+                    result = future.result()
+                    if result['skipped']:
+                        skipped += 1
+                        continue
+
+                    with open(paths[book.book_id], 'rb') as image_file:
+                        CoverService.save_cover(book, image_file.read())
+                    CoverService.replace_variants(book, result['source_hash'], result['variants'])
+                    db.session.commit()
+                    updated += 1
+                    print(f"Successfully updated cover for book: {book.title}")
+
+                except Exception as e:
+                    print(f"Error updating cover for {filename}: {str(e)}")
+                    db.session.rollback()
+                    continue
 
-        if not files:
-            print("\nNo image files were processed.")
-        else:
-            print("\nBook cover update process completed!")
+        print(f"\n{updated} covers updated, {skipped} unchanged since last run")
+        print("\nBook cover update process completed!")
 
     except Exception as e:
         print(f"\nError: {str(e)}")
-        db.session.rollback()
\ No newline at end of file
+        db.session.rollback()
@@ -1,9 +1,8 @@
-import os
-from dotenv import load_dotenv
 import subprocess
 import sys
 from pathlib import Path
 import click
+import config
 
 
 @click.command()
@@ -11,15 +10,8 @@ import click
 @click.option("--overwrite", is_flag=True, help="Overwrite existing file")
 def generate_models(output, overwrite):
     """Generate Flask-SQLAlchemy models from database schema"""
-    load_dotenv()
-
-    db_user = os.getenv("MYSQL_USER")
-    db_pass = os.getenv("MYSQL_PASSWORD")
-    db_host = os.getenv("MYSQL_HOST")
-    db_port = os.getenv("MYSQL_PORT", "3306")
-    db_name = os.getenv("MYSQL_DATABASE")
-
-    db_url = f"mysql+pymysql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+    db_name = config.MYSQL_DATABASE
+    db_url = config.SQLALCHEMY_DATABASE_URI
 
     output_path = Path(output)
     if output_path.exists() and not overwrite:
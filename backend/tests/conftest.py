@@ -0,0 +1,91 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# La base doit être choisie avant l'import de l'application : un fichier
+# SQLite, partagé par les threads des tests de concurrence
+_db_dir = tempfile.mkdtemp(prefix='libma-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'libma.db')}?timeout=30"
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+
+import pytest
+from sqlalchemy import BigInteger, event
+from sqlalchemy.ext.compiler import compiles
+from app import app as flask_app, db
+from app.models import Book, Borrow, Sample, User
+from app.services.facet_service import FacetService
+from app.utils.interval_cache import interval_cache
+from app.utils.response_cache import response_cache
+
+
+@compiles(BigInteger, 'sqlite')
+def _bigint_as_integer(type_, compiler, **kw):
+    # Seul INTEGER PRIMARY KEY est auto-incrémenté par SQLite
+    return 'INTEGER'
+
+
+def _register_collation(dbapi_connection, connection_record):
+    dbapi_connection.create_collation(
+        'utf8mb4_unicode_ci', lambda left, right: (left.lower() > right.lower()) - (left.lower() < right.lower())
+    )
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        if not event.contains(db.engine, 'connect', _register_collation):
+            event.listen(db.engine, 'connect', _register_collation)
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+    interval_cache.clear()
+    response_cache._backend = None
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(index, role='membre'):
+    user = User(
+        lastname=f'Nom{index}',
+        firstname=f'Prénom{index}',
+        mail=f'user{index}@example.com',
+        user_password='not-a-hash',
+        user_role=role,
+        user_status='actif',
+    )
+    db.session.add(user)
+    return user
+
+
+def make_sample(index, book=None, status='disponible'):
+    if book is None:
+        book = Book(title=f'Livre {index}', author=f'Auteur {index}', genre='Roman', category='Fiction')
+        db.session.add(book)
+    sample = Sample(book=book, unique_code=f'EX-{index:05d}', sample_status=status, localization='A1')
+    db.session.add(sample)
+    return sample
+
+
+def make_borrow(user, sample, approved_by=None, days_ago=1, days=14):
+    begin_date = datetime.now() - timedelta(days=days_ago)
+    borrow = Borrow(
+        user_id=user.user_id,
+        sample_id=sample.sample_id,
+        begin_date=begin_date,
+        end_date=begin_date + timedelta(days=days),
+        borrowed_at=begin_date,
+        borrow_status='en cours',
+        approved_by=approved_by.user_id if approved_by is not None else None,
+    )
+    db.session.add(borrow)
+    return borrow
+
+
+def rebuild_counters():
+    FacetService.rebuild_counters()
+    db.session.commit()
@@ -0,0 +1,129 @@
+import fnmatch
+import queue
+import threading
+import time
+
+
+def _bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
+
+class FakePubSub:
+    def __init__(self, server, ignore_subscribe_messages=False):
+        self.server = server
+        self.messages = queue.Queue()
+
+    def subscribe(self, *channels):
+        with self.server.lock:
+            for channel in channels:
+                self.server.subscribers.setdefault(channel, []).append(self)
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the redis.Redis commands the shared backends use.
+    Values come back as bytes like with redis-py; clients sharing a FakeRedis
+    behave as workers connected to the same server.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.expires = {}
+        self.sets = {}
+        self.sorted_sets = {}
+        self.subscribers = {}
+
+    def _alive(self, name):
+        deadline = self.expires.get(name)
+        if deadline is not None and deadline <= time.monotonic():
+            self.values.pop(name, None)
+            self.sets.pop(name, None)
+            del self.expires[name]
+        return name in self.values or name in self.sets
+
+    def get(self, name):
+        with self.lock:
+            return self.values.get(name) if self._alive(name) else None
+
+    def set(self, name, value, ex=None, nx=False):
+        with self.lock:
+            if nx and self._alive(name):
+                return None
+            self.values[name] = _bytes(value)
+            self.expires.pop(name, None)
+            if ex is not None:
+                self.expires[name] = time.monotonic() + ex
+            return True
+
+    def exists(self, *names):
+        with self.lock:
+            return sum(1 for name in names if self._alive(name))
+
+    def delete(self, *names):
+        with self.lock:
+            deleted = 0
+            for name in names:
+                if self._alive(name):
+                    deleted += 1
+                for store in (self.values, self.sets, self.sorted_sets, self.expires):
+                    store.pop(name, None)
+            return deleted
+
+    def expire(self, name, seconds):
+        with self.lock:
+            if not self._alive(name):
+                return False
+            self.expires[name] = time.monotonic() + seconds
+            return True
+
+    def scan_iter(self, match='*'):
+        with self.lock:
+            names = [name for name in list(self.values) if self._alive(name) and fnmatch.fnmatchcase(name, match)]
+        return iter([_bytes(name) for name in names])
+
+    def sadd(self, name, *members):
+        with self.lock:
+            self._alive(name)
+            self.sets.setdefault(name, set()).update(_bytes(member) for member in members)
+
+    def smembers(self, name):
+        with self.lock:
+            return set(self.sets.get(name, ())) if self._alive(name) else set()
+
+    def zadd(self, name, mapping):
+        with self.lock:
+            self.sorted_sets.setdefault(name, {}).update(
+                {_bytes(member): float(score) for member, score in mapping.items()}
+            )
+
+    def zrangebyscore(self, name, min, max):
+        low, high = float(min), float(max)
+        with self.lock:
+            members = self.sorted_sets.get(name, {}).items()
+            return [member for member, score in sorted(members, key=lambda item: item[1]) if low <= score <= high]
+
+    def zremrangebyscore(self, name, min, max):
+        low, high = float(min), float(max)
+        with self.lock:
+            members = self.sorted_sets.get(name, {})
+            removed = [member for member, score in members.items() if low <= score <= high]
+            for member in removed:
+                del members[member]
+            return len(removed)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self, ignore_subscribe_messages)
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.messages.put({'type': 'message', 'channel': _bytes(channel), 'data': _bytes(message)})
+        return len(subscribers)
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_borrow, make_sample, make_user, rebuild_counters
+
+
+def test_stale_pending_request_does_not_block_the_sample(client):
+    librarian = make_user(0, role='bibliothecaire')
+    requester, member = make_user(1), make_user(2)
+    sample = make_sample(1)
+    db.session.flush()
+    # Demande jamais traitée dont la période s'est terminée il y a 16 jours
+    make_borrow(requester, sample, days_ago=30, days=14)
+    db.session.commit()
+    rebuild_counters()
+    book_id, sample_id, unique_code = sample.book_id, sample.sample_id, sample.unique_code
+    member_id, librarian_id = member.user_id, librarian.user_id
+
+    schedule = client.get(f'/livres/{book_id}/disponibilites').get_json()
+    assert schedule['available'] is True
+    assert schedule['samples'][0]['busy'] == []
+
+    begin_date = datetime.now() + timedelta(days=60)
+    response = client.post('/emprunts/', json={
+        'user_id': member_id,
+        'sample_id': sample_id,
+        'begin_date': begin_date.isoformat(),
+        'end_date': (begin_date + timedelta(days=14)).isoformat(),
+    })
+    assert response.status_code == 201
+
+    response = client.post('/emprunts/checkout', json={
+        'user_id': member_id, 'approved_by': librarian_id, 'unique_codes': [unique_code],
+    })
+    assert response.get_json()['results'][0]['result'] == 'checked_out'
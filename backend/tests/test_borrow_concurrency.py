@@ -0,0 +1,166 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, func
+from app import db
+from app.models import BookAvailability, Borrow, Reservation, Sample
+from conftest import make_borrow, make_sample, make_user, rebuild_counters
+
+THREADS = 8
+
+
+def run_concurrently(app, requests, method='patch'):
+    """Send each (path, body) request from its own thread at once; returns the status codes"""
+    barrier = threading.Barrier(len(requests))
+    statuses = [None] * len(requests)
+
+    def send(index, path, body):
+        client = app.test_client()
+        barrier.wait()
+        statuses[index] = getattr(client, method)(path, json=body).status_code
+
+    threads = [
+        threading.Thread(target=send, args=(index, path, body))
+        for index, (path, body) in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+@pytest.fixture
+def immediate_transactions(app):
+    """
+    SQLite ignores FOR UPDATE: each transaction takes the database write lock
+    when it begins instead, standing in for the row locks taken on MySQL
+    """
+    def driver_autocommit(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    def begin_immediate(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    db.engine.dispose()
+    event.listen(db.engine, 'connect', driver_autocommit)
+    event.listen(db.engine, 'begin', begin_immediate)
+    yield
+    event.remove(db.engine, 'connect', driver_autocommit)
+    event.remove(db.engine, 'begin', begin_immediate)
+    db.engine.dispose()
+
+
+def assert_counters_consistent(book_id):
+    db.session.expire_all()
+    available = db.session.query(func.count(Sample.sample_id)).filter(
+        Sample.book_id == book_id, Sample.sample_status == 'disponible'
+    ).scalar()
+    assert db.session.get(BookAvailability, book_id).available_samples == available
+
+
+def test_one_approval_of_the_same_request_wins(app):
+    librarians = [make_user(index, role='bibliothecaire') for index in range(THREADS)]
+    member = make_user(THREADS)
+    sample = make_sample(1)
+    db.session.flush()
+    borrow = make_borrow(member, sample)
+    db.session.commit()
+    rebuild_counters()
+    borrow_id, sample_id, book_id = borrow.borrow_id, sample.sample_id, sample.book_id
+    librarian_ids = [librarian.user_id for librarian in librarians]
+    db.session.remove()
+
+    statuses = run_concurrently(
+        app, [(f'/emprunts/{borrow_id}/approve', {'approved_by': user_id}) for user_id in librarian_ids]
+    )
+
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == THREADS - 1
+    assert db.session.get(Borrow, borrow_id).approved_by == librarian_ids[statuses.index(200)]
+    assert db.session.get(Sample, sample_id).sample_status == 'emprunté'
+    assert_counters_consistent(book_id)
+
+
+def test_one_approval_of_competing_requests_takes_the_sample(app):
+    librarian = make_user(0, role='bibliothecaire')
+    members = [make_user(index) for index in range(1, THREADS + 1)]
+    sample = make_sample(1)
+    db.session.flush()
+    borrows = [make_borrow(member, sample) for member in members]
+    db.session.commit()
+    rebuild_counters()
+    borrow_ids = [borrow.borrow_id for borrow in borrows]
+    sample_id, book_id, librarian_id = sample.sample_id, sample.book_id, librarian.user_id
+    db.session.remove()
+
+    statuses = run_concurrently(
+        app, [(f'/emprunts/{borrow_id}/approve', {'approved_by': librarian_id}) for borrow_id in borrow_ids]
+    )
+
+    assert statuses.count(200) == 1
+    approved = Borrow.query.filter(Borrow.borrow_id.in_(borrow_ids), Borrow.approved_by.isnot(None)).all()
+    # Les décisions perdantes sont annulées avec leur transaction
+    assert [borrow.borrow_id for borrow in approved] == [borrow_ids[statuses.index(200)]]
+    assert db.session.get(Sample, sample_id).sample_status == 'emprunté'
+    assert_counters_consistent(book_id)
+
+
+def test_one_claim_of_a_held_sample_wins(app):
+    librarian = make_user(0, role='bibliothecaire')
+    holder = make_user(1)
+    others = [make_user(index) for index in range(2, THREADS + 1)]
+    sample = make_sample(1, status='réservé')
+    db.session.flush()
+    reservation = Reservation(
+        user_id=holder.user_id,
+        book_id=sample.book_id,
+        sample_id=sample.sample_id,
+        reservation_status='confirmée',
+        expiration_date=datetime.now() + timedelta(days=3),
+    )
+    db.session.add(reservation)
+    borrows = [make_borrow(member, sample) for member in [holder] + others]
+    db.session.commit()
+    rebuild_counters()
+    borrow_ids = [borrow.borrow_id for borrow in borrows]
+    reservation_id, sample_id, book_id, librarian_id = (
+        reservation.reservation_id, sample.sample_id, sample.book_id, librarian.user_id
+    )
+    db.session.remove()
+
+    statuses = run_concurrently(
+        app, [(f'/emprunts/{borrow_id}/approve', {'approved_by': librarian_id}) for borrow_id in borrow_ids]
+    )
+
+    # Seul le membre pour qui l'exemplaire est mis de côté peut le prendre
+    assert statuses.count(200) == 1
+    assert statuses[0] == 200
+    assert db.session.get(Reservation, reservation_id).reservation_status == 'honorée'
+    assert db.session.get(Sample, sample_id).sample_status == 'emprunté'
+    assert_counters_consistent(book_id)
+
+
+def test_one_of_overlapping_borrow_requests_is_created(app, immediate_transactions):
+    members = [make_user(index) for index in range(THREADS)]
+    sample = make_sample(1)
+    db.session.commit()
+    member_ids, sample_id = [member.user_id for member in members], sample.sample_id
+    db.session.remove()
+    begin_date = datetime.now() + timedelta(days=1)
+
+    statuses = run_concurrently(app, [
+        ('/emprunts/', {
+            'user_id': user_id,
+            'sample_id': sample_id,
+            # Périodes décalées qui se chevauchent toutes
+            'begin_date': (begin_date + timedelta(hours=index)).isoformat(),
+            'end_date': (begin_date + timedelta(days=7, hours=index)).isoformat(),
+        })
+        for index, user_id in enumerate(member_ids)
+    ], method='post')
+
+    assert statuses.count(201) == 1
+    assert statuses.count(400) == THREADS - 1
+    [borrow] = Borrow.query.filter_by(sample_id=sample_id).all()
+    assert borrow.user_id == member_ids[statuses.index(201)]
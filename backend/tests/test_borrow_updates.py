@@ -0,0 +1,47 @@
+from app import db
+from app.models import Reservation, Sample
+from conftest import make_borrow, make_sample, make_user, rebuild_counters
+
+
+def test_returning_a_borrow_twice_holds_the_sample_once(client):
+    librarian = make_user(0, role='bibliothecaire')
+    borrower, first, second = make_user(1), make_user(2), make_user(3)
+    sample = make_sample(1, status='emprunté')
+    db.session.flush()
+    borrow = make_borrow(borrower, sample, approved_by=librarian)
+    db.session.commit()
+    rebuild_counters()
+    borrow_id, sample_id, book_id = borrow.borrow_id, sample.sample_id, sample.book_id
+    for member in (first, second):
+        assert client.post('/reservations/', json={'user_id': member.user_id, 'book_id': book_id}).status_code == 201
+
+    for _ in range(2):
+        response = client.put(f'/emprunts/{borrow_id}', json={'return_date': '2026-01-01T10:00:00'})
+        assert response.status_code == 200
+
+    db.session.expire_all()
+    statuses = {
+        reservation.user_id: (reservation.reservation_status, reservation.sample_id)
+        for reservation in Reservation.query.all()
+    }
+    assert statuses == {first.user_id: ('confirmée', sample_id), second.user_id: ('active', None)}
+    assert db.session.get(Sample, sample_id).sample_status == 'réservé'
+
+
+def test_cancelling_a_future_booking_keeps_the_sample_lent(client):
+    librarian = make_user(0, role='bibliothecaire')
+    borrower, booker, requester = make_user(1), make_user(2), make_user(3)
+    sample = make_sample(1, status='emprunté')
+    db.session.flush()
+    make_borrow(borrower, sample, approved_by=librarian)
+    booking = make_borrow(booker, sample, approved_by=librarian, days_ago=-30)
+    request = make_borrow(requester, sample)
+    db.session.commit()
+    rebuild_counters()
+    sample_id, borrow_ids = sample.sample_id, [booking.borrow_id, request.borrow_id]
+
+    for borrow_id in borrow_ids:
+        assert client.put(f'/emprunts/{borrow_id}', json={'status': 'annulé'}).status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(Sample, sample_id).sample_status == 'emprunté'
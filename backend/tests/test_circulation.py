@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import BookAvailability, Reservation, Sample
+from conftest import make_borrow, make_sample, make_user, rebuild_counters
+
+
+def test_checkout_and_return_of_a_cart(client):
+    librarian = make_user(0, role='bibliothecaire')
+    member, other, waiting = make_user(1), make_user(2), make_user(3)
+    held = make_sample(1, status='réservé')
+    free = make_sample(2, book=held.book)
+    lent = make_sample(3, book=held.book, status='emprunté')
+    db.session.flush()
+    hold = Reservation(
+        user_id=member.user_id,
+        book_id=held.book_id,
+        sample_id=held.sample_id,
+        reservation_status='confirmée',
+        expiration_date=datetime.now() + timedelta(days=3),
+    )
+    db.session.add(hold)
+    make_borrow(other, lent, approved_by=librarian)
+    db.session.commit()
+    rebuild_counters()
+    book_id, hold_id, member_id, librarian_id = held.book_id, hold.reservation_id, member.user_id, librarian.user_id
+    codes = [held.unique_code, free.unique_code, lent.unique_code]
+
+    response = client.post('/emprunts/checkout', json={
+        'user_id': member_id, 'approved_by': librarian_id, 'unique_codes': codes + ['EX-99999'],
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item['result'] for item in body['results']] == ['checked_out', 'checked_out', 'unavailable', 'not_found']
+    assert (body['succeeded'], body['failed']) == (2, 2)
+    db.session.expire_all()
+    assert db.session.get(Reservation, hold_id).reservation_status == 'honorée'
+    assert db.session.get(BookAvailability, book_id).available_samples == 0
+
+    response = client.post('/reservations/', json={'user_id': waiting.user_id, 'book_id': book_id})
+    queued_id = response.get_json()['id']
+    response = client.post('/emprunts/return', json={'user_id': member_id, 'unique_codes': codes})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [item['result'] for item in results] == ['returned', 'returned', 'borrowed_by_another_member']
+    # Le premier exemplaire rendu va au membre en file, le second redevient disponible
+    assert [item['held_for_reservation'] for item in results[:2]] == [queued_id, None]
+    db.session.expire_all()
+    assert [sample.sample_status for sample in Sample.query.order_by(Sample.sample_id)] == [
+        'réservé', 'disponible', 'emprunté'
+    ]
+    assert db.session.get(Reservation, queued_id).reservation_status == 'confirmée'
+    assert db.session.get(BookAvailability, book_id).available_samples == 1
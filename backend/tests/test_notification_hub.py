@@ -0,0 +1,22 @@
+from app.services.notification_hub import NotificationHub, RedisHubBackend
+from fake_redis import FakeRedis
+
+
+def make_hub(client):
+    # Contourne le singleton : une instance par processus simulé
+    return type.__call__(NotificationHub, backend=RedisHubBackend(client))
+
+
+def test_event_published_on_one_worker_reaches_another():
+    client = FakeRedis()
+    publisher, listener = make_hub(client), make_hub(client)
+    subscription = listener.subscribe(7)
+    other_member = listener.subscribe(8)
+    local = publisher.subscribe(7)
+
+    publisher.publish(7, {'id': 1, 'message': 'Retour prévu demain'})
+
+    assert subscription.get(timeout=2) == {'id': 1, 'message': 'Retour prévu demain'}
+    assert local.get(timeout=2) == {'id': 1, 'message': 'Retour prévu demain'}
+    assert other_member.get(timeout=0.1) is None
+
@@ -0,0 +1,77 @@
+import pytest
+from app import db
+from app.models import Borrow, Notification, NotificationBorrow
+from app.services.notification_service import NotificationService
+from conftest import make_borrow, make_sample, make_user
+
+
+def make_loans(days_ago, days=14, count=2):
+    """count approved loans of one member, started days_ago for days days; returns their ids"""
+    librarian = make_user(0, role='bibliothecaire')
+    member = make_user(1)
+    samples = [make_sample(index, status='emprunté') for index in range(1, count + 1)]
+    db.session.flush()
+    borrows = [make_borrow(member, sample, approved_by=librarian, days_ago=days_ago, days=days) for sample in samples]
+    db.session.commit()
+    return [borrow.borrow_id for borrow in borrows]
+
+
+def notifications(notification_type):
+    db.session.expire_all()
+    return Notification.query.filter_by(notification_type=notification_type).order_by(Notification.notification_id).all()
+
+
+def test_upcoming_reminders_are_created_once_per_borrow(app):
+    borrow_ids = make_loans(days_ago=12)
+
+    NotificationService.check_upcoming_returns(digest=False)
+    NotificationService.check_upcoming_returns(digest=False)
+
+    assert [notification.borrow_id for notification in notifications('date_echeance')] == borrow_ids
+
+
+def test_upcoming_digest_covers_each_borrow_once(app):
+    borrow_ids = make_loans(days_ago=12)
+
+    NotificationService.check_upcoming_returns(digest=True)
+    NotificationService.check_upcoming_returns(digest=True)
+
+    [digest] = notifications('date_echeance')
+    assert digest.borrow_id is None
+    assert sorted(
+        link.borrow_id for link in NotificationBorrow.query.filter_by(notification_id=digest.notification_id)
+    ) == borrow_ids
+
+
+def test_overdue_reminders_are_created_once(app):
+    borrow_ids = make_loans(days_ago=20)
+
+    NotificationService.check_overdue_returns(digest=False)
+    NotificationService.check_overdue_returns(digest=False)
+
+    assert [notification.borrow_id for notification in notifications('rappel_emprunt')] == borrow_ids
+    assert {borrow.borrow_status for borrow in Borrow.query.all()} == {'en retard'}
+
+
+def test_overdue_digest_sends_one_reminder_per_member(app):
+    make_loans(days_ago=20)
+
+    NotificationService.check_overdue_returns(digest=True)
+    NotificationService.check_overdue_returns(digest=True)
+
+    [digest] = notifications('rappel_emprunt')
+    assert digest.borrow_id is None
+    assert digest.notification_message.startswith('2 livres empruntés sont en retard')
+
+
+def test_failing_overdue_run_raises(app, monkeypatch):
+    make_loans(days_ago=20)
+
+    def fail(rows):
+        raise RuntimeError('insert failed')
+
+    monkeypatch.setattr(NotificationService, 'insert_notifications', staticmethod(fail))
+    with pytest.raises(RuntimeError):
+        NotificationService.check_overdue_returns(digest=False)
+    # Le lot est annulé : les emprunts seront repris au prochain passage
+    assert {borrow.borrow_status for borrow in Borrow.query.all()} == {'en cours'}
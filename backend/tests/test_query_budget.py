@@ -0,0 +1,82 @@
+import pytest
+from app import db
+from app.models import Borrow
+from app.utils.query_counter import QueryBudgetExceeded, query_budget
+from conftest import make_borrow, make_sample, make_user
+
+BORROW_COUNT = 20
+
+
+@pytest.fixture
+def borrows(app):
+    """
+    (borrow_id, user_id, book_id) of BORROW_COUNT borrows, each of another
+    member, sample and book; the session is emptied so that nothing the
+    endpoints read is already in its identity map
+    """
+    librarian = make_user(0, role='bibliothecaire')
+    members = [make_user(index) for index in range(1, BORROW_COUNT + 1)]
+    samples = [make_sample(index, status='emprunté') for index in range(1, BORROW_COUNT + 1)]
+    db.session.flush()
+    rows = [
+        make_borrow(member, sample, approved_by=librarian, days_ago=index)
+        for index, (member, sample) in enumerate(zip(members, samples), start=1)
+    ]
+    db.session.commit()
+    keys = [(borrow.borrow_id, borrow.user_id, borrow.sample.book_id) for borrow in rows]
+    db.session.expunge_all()
+    return keys
+
+
+def test_borrow_list_stays_within_budget(client, borrows):
+    response = client.get(f'/emprunts/?limit={BORROW_COUNT}')
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == BORROW_COUNT
+    assert {item['user']['id'] for item in response.get_json()} == {user_id for _, user_id, _ in borrows}
+
+
+def test_borrow_detail_stays_within_budget(client, borrows):
+    borrow_id, _, book_id = borrows[0]
+    response = client.get(f'/emprunts/{borrow_id}')
+
+    assert response.status_code == 200
+    assert response.get_json()['sample']['book']['id'] == book_id
+
+
+def test_sample_borrows_stay_within_budget(client, app):
+    librarian = make_user(0, role='bibliothecaire')
+    members = [make_user(index) for index in range(1, BORROW_COUNT + 1)]
+    sample = make_sample(1)
+    db.session.flush()
+    for index, member in enumerate(members, start=1):
+        borrow = make_borrow(member, sample, approved_by=librarian, days_ago=30 * index)
+        borrow.borrow_status = 'terminé'
+    db.session.commit()
+    sample_id = sample.sample_id
+    db.session.expunge_all()
+
+    response = client.get(f'/exemplaires/{sample_id}/emprunts')
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == BORROW_COUNT
+
+
+def test_exceeded_budget_raises_in_testing(app):
+    @query_budget(1)
+    def lazy_view():
+        # Une requête pour les emprunts, puis des chargements paresseux par emprunt : un N+1
+        return [borrow.sample.book.title for borrow in Borrow.query.all()]
+
+    librarian = make_user(0, role='bibliothecaire')
+    members = [make_user(index) for index in range(1, 3)]
+    samples = [make_sample(index) for index in range(1, 3)]
+    db.session.flush()
+    for member, sample in zip(members, samples):
+        make_borrow(member, sample, approved_by=librarian)
+    db.session.commit()
+    db.session.expunge_all()
+
+    with app.test_request_context():
+        with pytest.raises(QueryBudgetExceeded):
+            lazy_view()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import Borrow, Reservation, Sample
+from app.services.circulation_service import CirculationService
+from app.services.reservation_service import ReservationService
+from conftest import make_borrow, make_sample, make_user, rebuild_counters
+
+
+def test_returned_sample_booked_within_the_hold_goes_to_the_booking(client):
+    librarian = make_user(0, role='bibliothecaire')
+    borrower, waiting, booker = make_user(1), make_user(2), make_user(3)
+    sample = make_sample(1, status='emprunté')
+    db.session.flush()
+    borrow = make_borrow(borrower, sample, approved_by=librarian)
+    booking = make_borrow(booker, sample, approved_by=librarian, days_ago=-1)
+    db.session.commit()
+    rebuild_counters()
+    borrow_id, booking_id, sample_id, book_id = borrow.borrow_id, booking.borrow_id, sample.sample_id, sample.book_id
+    response = client.post('/reservations/', json={'user_id': waiting.user_id, 'book_id': book_id})
+    reservation_id = response.get_json()['id']
+
+    response = client.put(f'/emprunts/{borrow_id}', json={'return_date': datetime.now().isoformat()})
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(Reservation, reservation_id).reservation_status == 'active'
+    assert db.session.get(Sample, sample_id).sample_status == 'disponible'
+
+    db.session.get(Borrow, booking_id).begin_date = datetime.now() - timedelta(minutes=1)
+    db.session.commit()
+    assert CirculationService.start_booked_borrows() == {"started": 1, "blocked": 0}
+    assert db.session.get(Sample, sample_id).sample_status == 'emprunté'
+
+
+def test_new_reservation_skips_a_booked_sample(client):
+    librarian = make_user(0, role='bibliothecaire')
+    member, booker = make_user(1), make_user(2)
+    booked = make_sample(1)
+    free = make_sample(2, book=booked.book)
+    db.session.flush()
+    make_borrow(booker, booked, approved_by=librarian, days_ago=-2)
+    db.session.commit()
+    rebuild_counters()
+    booked_id, free_id = booked.sample_id, free.sample_id
+
+    response = client.post('/reservations/', json={'user_id': member.user_id, 'book_id': booked.book_id})
+
+    assert response.status_code == 201
+    db.session.expire_all()
+    reservation = db.session.get(Reservation, response.get_json()['id'])
+    assert (reservation.reservation_status, reservation.sample_id) == ('confirmée', free_id)
+    assert db.session.get(Sample, booked_id).sample_status == 'disponible'
+
+
+def test_expired_hold_is_not_passed_on_when_the_sample_is_booked(app):
+    librarian = make_user(0, role='bibliothecaire')
+    holder, waiting, booker = make_user(1), make_user(2), make_user(3)
+    sample = make_sample(1, status='réservé')
+    db.session.flush()
+    expired = Reservation(
+        user_id=holder.user_id,
+        book_id=sample.book_id,
+        sample_id=sample.sample_id,
+        reservation_status='confirmée',
+        expiration_date=datetime.now() - timedelta(minutes=1),
+    )
+    queued = Reservation(user_id=waiting.user_id, book_id=sample.book_id, reservation_status='active')
+    db.session.add_all([expired, queued])
+    make_borrow(booker, sample, approved_by=librarian, days_ago=-1)
+    db.session.commit()
+    rebuild_counters()
+    queued_id, sample_id = queued.reservation_id, sample.sample_id
+
+    assert ReservationService.expire_reservations() == {"expired": 1, "promoted": 0, "released": 1}
+    assert db.session.get(Reservation, queued_id).reservation_status == 'active'
+    assert db.session.get(Sample, sample_id).sample_status == 'disponible'
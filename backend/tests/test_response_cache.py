@@ -0,0 +1,119 @@
+import threading
+from app.utils.response_cache import LocalResponseCacheBackend, RedisResponseCacheBackend, ResponseCache
+from fake_redis import FakeRedis
+
+THREADS = 5
+
+
+class BlockingCompute:
+    """compute() for get_or_compute that waits for release() and counts its calls"""
+
+    def __init__(self, value=b'body'):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.released.wait(5)
+        return self.value
+
+    def release(self):
+        self.released.set()
+
+
+def run_in_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_redis_backend_stores_and_invalidates_by_tag():
+    backend = RedisResponseCacheBackend(FakeRedis())
+    backend.set('a', b'one', 60, ['book:1', 'catalog'])
+    backend.set('b', b'two', 60, ['book:2', 'catalog'])
+
+    assert backend.get('a') == b'one'
+    assert backend.add('lock:a', b'1', 5)
+    assert not backend.add('lock:a', b'1', 5)
+    backend.delete('lock:a')
+    assert backend.add('lock:a', b'1', 5)
+
+    assert backend.invalidate(['book:1']) == 1
+    assert backend.get('a') is None
+    assert backend.get('b') == b'two'
+    assert backend.invalidate(['catalog']) == 1
+    assert backend.get('b') is None
+
+
+def test_local_backend_evicts_least_recently_used_bytes():
+    backend = LocalResponseCacheBackend(max_bytes=10)
+    backend.set('a', b'aaaa', 60, ['catalog'])
+    backend.set('b', b'bbbb', 60, ['catalog'])
+    backend.get('a')
+    backend.set('c', b'cccc', 60, ['catalog'])
+
+    assert backend.get('a') == b'aaaa'
+    assert backend.get('b') is None
+    assert backend.get('c') == b'cccc'
+    backend.set('big', b'x' * 11, 60, [])
+    assert backend.get('big') is None
+    assert backend.invalidate(['catalog']) == 2
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResponseCache(LocalResponseCacheBackend(), lock_timeout=5)
+    compute = BlockingCompute()
+    values = []
+
+    threads = run_in_threads(THREADS, lambda: values.append(cache.get_or_compute('key', ['catalog'], compute)))
+    compute.started.wait(5)
+    compute.release()
+    for thread in threads:
+        thread.join()
+
+    assert values == [b'body'] * THREADS
+    assert compute.calls == 1
+    assert cache.coalesced == THREADS - 1
+    assert cache.get_or_compute('key', ['catalog'], compute) == b'body'
+    assert cache.hits == 1
+
+
+def test_misses_are_coalesced_across_workers():
+    client = FakeRedis()
+    worker = ResponseCache(RedisResponseCacheBackend(client), lock_timeout=5)
+    other_worker = ResponseCache(RedisResponseCacheBackend(client), lock_timeout=5)
+    compute = BlockingCompute()
+    other_compute = BlockingCompute(b'other body')
+    other_compute.release()
+    values = []
+
+    [thread] = run_in_threads(1, lambda: values.append(worker.get_or_compute('key', [], compute)))
+    compute.started.wait(5)
+    [other_thread] = run_in_threads(1, lambda: values.append(other_worker.get_or_compute('key', [], other_compute)))
+    compute.release()
+    thread.join()
+    other_thread.join()
+
+    assert values == [b'body', b'body']
+    assert other_compute.calls == 0
+    assert other_worker.coalesced == 1
+    assert client.get('response_cache:lock:key') is None
+
+
+def test_value_computed_across_an_invalidation_is_not_stored():
+    cache = ResponseCache(LocalResponseCacheBackend())
+    compute = BlockingCompute(b'stale')
+    values = []
+
+    [thread] = run_in_threads(1, lambda: values.append(cache.get_or_compute('key', ['book:1'], compute)))
+    compute.started.wait(5)
+    cache.invalidate('book:1')
+    compute.release()
+    thread.join()
+
+    assert values == [b'stale']
+    assert cache.backend.get('key') is None
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from app.utils.token_blacklist import (
+    BloomFilter,
+    RedisRevocationBackend,
+    SQLRevocationBackend,
+    TokenBlacklist,
+)
+from fake_redis import FakeRedis
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CountingBackend(RedisRevocationBackend):
+    """Redis backend counting the full reads a blacklist makes"""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.full_reads = 0
+
+    def active_jtis(self):
+        self.full_reads += 1
+        return super().active_jtis()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    for index in range(1000):
+        bloom.add(f'revoked-{index}')
+
+    assert all(f'revoked-{index}' in bloom for index in range(1000))
+    false_positives = sum(f'valid-{index}' in bloom for index in range(1000))
+    assert false_positives < 30
+
+
+def test_redis_backend_keeps_revocations_until_expiry():
+    backend = RedisRevocationBackend(FakeRedis())
+    backend.revoke('live', utcnow() + timedelta(hours=1))
+    backend.revoke('expired', utcnow() - timedelta(seconds=1))
+
+    assert backend.is_revoked('live')
+    assert not backend.is_revoked('expired')
+    assert backend.active_jtis() == ['live']
+    assert backend.revoked_since(utcnow() - timedelta(minutes=1)) == ['live']
+    assert backend.revoked_since(utcnow() + timedelta(minutes=1)) == []
+
+
+def test_revocation_on_another_worker_is_synced_incrementally():
+    client = FakeRedis()
+    backend = CountingBackend(client)
+    worker = TokenBlacklist(backend, sync_interval=0, rebuild_interval=3600)
+    other_worker = TokenBlacklist(RedisRevocationBackend(client), sync_interval=0)
+
+    assert not worker.is_revoked('token')
+    other_worker.revoke('token', utcnow() + timedelta(hours=1))
+
+    assert worker.is_revoked('token')
+    # Seule la première vérification reconstruit le filtre
+    assert backend.full_reads == 1
+
+
+def test_bloom_filter_is_rebuilt_when_full():
+    client = FakeRedis()
+    backend = CountingBackend(client)
+    worker = TokenBlacklist(backend, sync_interval=0, rebuild_interval=3600)
+    other_worker = TokenBlacklist(RedisRevocationBackend(client), sync_interval=0)
+    worker.is_revoked('token')
+    expires_at = utcnow() + timedelta(hours=1)
+    # Les faux positifs ne sont pas comptés : quelques révocations de plus remplissent le filtre
+    for index in range(worker._bloom_capacity + 100):
+        other_worker.revoke(f'token-{index}', expires_at)
+
+    worker.is_revoked('token')
+    assert backend.full_reads == 1
+    worker.is_revoked('token')
+    assert backend.full_reads == 2
+    assert worker._bloom_capacity >= 2 * worker._bloom_count
+
+
+def test_lru_keeps_the_most_recent_revocations():
+    backend = CountingBackend(FakeRedis())
+    blacklist = TokenBlacklist(backend, sync_interval=3600, cache_size=2)
+    expires_at = utcnow() + timedelta(hours=1)
+    for jti in ('first', 'second', 'third'):
+        blacklist.revoke(jti, expires_at)
+
+    assert list(blacklist._revoked_cache) == ['second', 'third']
+    # Sorti du LRU, le jeton reste révoqué : la vérification passe par le backend
+    assert blacklist.is_revoked('first')
+    assert not blacklist.is_revoked('valid')
+
+
+def test_sql_backend_syncs_revocations_incrementally(app):
+    worker = TokenBlacklist(SQLRevocationBackend(), sync_interval=0)
+    other_worker = TokenBlacklist(SQLRevocationBackend(), sync_interval=0)
+
+    assert not worker.is_revoked('token')
+    other_worker.revoke('token', utcnow() + timedelta(hours=1))
+
+    assert worker.is_revoked('token')
+    assert worker._bloom_count == 1
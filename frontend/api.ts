@@ -2,23 +2,47 @@ import { IBorrow, IBook, ISample, IUser } from "@/types";
 
 const BASE_URL = "http://localhost:5000";
 
+export async function fetchAllPages<T>(
+  url: string,
+  errorMessage: string
+): Promise<T[]> {
+  const items: T[] = [];
+  const separator = url.includes("?") ? "&" : "?";
+  let cursor: string | null = null;
+
+  do {
+    const pageUrl: string = cursor
+      ? `${url}${separator}cursor=${encodeURIComponent(cursor)}`
+      : url;
+    // Revalide chaque page avec son ETag : une page inchangée revient en 304
+    const res = await fetch(pageUrl, { cache: "no-cache" });
+    if (!res.ok) throw new Error(errorMessage);
+    items.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+
+  return items;
+}
+
 export async function fetchBorrows(): Promise<IBorrow[]> {
-  const res = await fetch(`${BASE_URL}/emprunts`);
-  if (!res.ok) throw new Error("Erreur lors de la récupération des emprunts");
-  return res.json();
+  return fetchAllPages<IBorrow>(
+    `${BASE_URL}/emprunts/`,
+    "Erreur lors de la récupération des emprunts"
+  );
 }
 
 export async function fetchBooks(): Promise<IBook[]> {
-  const res = await fetch(`${BASE_URL}/livres`);
-  if (!res.ok) throw new Error("Erreur lors de la récupération des livres");
-  return res.json();
+  return fetchAllPages<IBook>(
+    `${BASE_URL}/livres/`,
+    "Erreur lors de la récupération des livres"
+  );
 }
 
 export async function fetchSamples(): Promise<ISample[]> {
-  const res = await fetch(`${BASE_URL}/exemplaires`);
-  if (!res.ok)
-    throw new Error("Erreur lors de la récupération des exemplaires (samples)");
-  return res.json();
+  return fetchAllPages<ISample>(
+    `${BASE_URL}/exemplaires/`,
+    "Erreur lors de la récupération des exemplaires (samples)"
+  );
 }
 
 export async function fetchUserByEmail(email: string): Promise<IUser | null> {
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 
 interface BookCoverProps {
-  cover: string | null;  // Changed from cover_image to match the usage
+  cover: string | null;  // URL served by GET /livres/<id>/cover
   title: string;
   className?: string;
 }
@@ -11,19 +11,7 @@ const BookCover: React.FC<BookCoverProps> = ({ cover, title, className }) => {
 
   useEffect(() => {
     if (cover) {
-      try {
-        // Check if the cover already includes the data URI prefix
-        if (cover.startsWith('data:')) {
-          setImgSrc(cover);
-        } else {
-          // If it's just the base64 data, detect type and add prefix
-          const imageType = cover.startsWith('/9j/') ? 'jpeg' : 'png';
-          setImgSrc(`data:image/${imageType};base64,${cover}`);
-        }
-      } catch (error) {
-        console.error('Error setting image:', error);
-        setImgSrc("/images/placeholder.png");
-      }
+      setImgSrc(cover);
     }
   }, [cover]);
 
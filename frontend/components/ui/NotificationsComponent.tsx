@@ -14,6 +14,8 @@ interface Notification {
   viewed: boolean;
 }
 
+const STREAM_URL = process.env.NEXT_PUBLIC_NOTIFICATIONS_URL || "http://localhost:5000";
+
 const NotificationComponent = ({ userId }: { userId: number }) => {
   const [notifications, setNotifications] = useState<Notification[]>([]);
   const [showNotifications, setShowNotifications] = useState(false);
@@ -34,7 +36,7 @@ const NotificationComponent = ({ userId }: { userId: number }) => {
     fetchExistingNotifications();
 
 
-    const eventSource = new EventSource(`http://localhost:5000/notifications/stream/${userId}`);
+    const eventSource = new EventSource(`${STREAM_URL}/notifications/stream/${userId}`);
 
     eventSource.addEventListener('notification', (event) => {
       const newNotifications = JSON.parse(event.data);
@@ -64,6 +66,20 @@ const NotificationComponent = ({ userId }: { userId: number }) => {
     }
   };
 
+  const markAllAsRead = async () => {
+    const upToId = Math.max(...notifications.map(n => n.id));
+    try {
+      await fetch(`http://localhost:5000/notifications/${userId}/mark-all-read`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ up_to_id: upToId })
+      });
+      setNotifications(current => current.filter(n => n.id > upToId));
+    } catch (error) {
+      console.error('Error marking notifications as read:', error);
+    }
+  };
+
   return (
     <div className="relative">
       <button
@@ -86,6 +102,12 @@ const NotificationComponent = ({ userId }: { userId: number }) => {
             </div>
           ) : (
             <div className="p-2 space-y-2">
+              <button
+                onClick={markAllAsRead}
+                className="w-full text-right text-xs text-zinc-400 hover:text-zinc-200"
+              >
+                Tout marquer comme lu
+              </button>
               {notifications.map((notification) => (
                 <Alert
                   key={notification.id}
@@ -5,6 +5,7 @@ import { useRouter } from "next/router";
 import { useUser } from "@/hooks/UseUser";
 import { DoorOpen, UserPlus, User, Book, BookCopy } from "lucide-react";
 import { IBook } from "@/types";
+import { fetchAllPages } from "@/api";
 import { motion, AnimatePresence } from "framer-motion";
 
 export default function Home() {
@@ -21,13 +22,10 @@ export default function Home() {
 
   useEffect(() => {
     setLoading(true);
-    fetch("http://localhost:5000/livres")
-      .then((res) => {
-        if (!res.ok) {
-          throw new Error(`HTTP error! status: ${res.status}`);
-        }
-        return res.json();
-      })
+    fetchAllPages<IBook>(
+      "http://localhost:5000/livres/?fields=id,title,author,genre,category,release_date,description",
+      "Erreur lors de la récupération des livres"
+    )
       .then((data) => {
         if (Array.isArray(data)) {
           setBooks(data);
@@ -187,7 +187,7 @@ export default function BookDetails() {
               transition={{ duration: 0.7, ease: "easeOut" }}
             >
               <BookCover
-                cover={book?.cover_image || ""}
+                cover={book?.cover_url || null}
                 title={book?.title || ""}
                 className="w-full h-[300px] object-cover rounded-md"
               />
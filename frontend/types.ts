@@ -21,7 +21,7 @@ export interface IBook {
   category: string;
   release_date: string;
   description: string;
-  cover_image: string | null;
+  cover_url: string | null;
 }
 
 export interface ISample {